@@ -0,0 +1,77 @@
+import argparse
+import random
+import tracemalloc
+from pathlib import Path
+import numpy as np
+from config.compiled_config import load_config
+from run import create_ecosystem
+from stakeholders.consumer import create_consumer
+
+def measure(create, n: int) -> float:
+    """
+    生成処理で確保され、生存しているメモリを1オブジェクトあたりのバイト数で計測
+
+    Args:
+        create: n個のオブジェクトを生成してリストで返す関数
+        n: 生成するオブジェクト数
+    Returns:
+        float: 1オブジェクトあたりのバイト数
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = create(n)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(objects) == n
+    return (after - before) / n
+
+def main(config_file: str, n: int) -> None:
+    """
+    設定ファイルのエコシステムで、生存している製品と消費者の1つあたりのメモリを計測して表示
+
+    製品は生成・イベントログへの登録・1回の消費者への割当（使用履歴1件）まで、消費者は
+    選好と計画使用期間のサンプリングまでを含む。
+
+    Args:
+        config_file: 設定ファイルのパス
+        n: 計測に生成する製品数と消費者数
+    """
+    config = load_config(config_file)
+    random.seed(1)
+    np.random.seed(1)
+    ecosystem = create_ecosystem(config)
+    product_attributes = dict(list(config.product_attributes.items())[:1])
+    segment, consumer_attribute = next(iter(config.consumer_attributes.items()))
+
+    def create_products(n: int) -> list:
+        products = ecosystem.manufacturer.create_products(product_attributes, 0, n)
+        ecosystem._register_products(products, 0)
+        for consumer_id, product in enumerate(products):
+            product.add_consumer(0, consumer_id)
+        return products
+
+    def create_consumers(n: int) -> list:
+        return [
+            create_consumer(
+                consumer_type=consumer_attribute.consumer_type,
+                consumer_id=i,
+                segment=segment,
+                year=0,
+                index=i,
+                attributes=consumer_attribute,
+                clock=ecosystem.clock
+            )
+            for i in range(n)
+        ]
+
+    print(f"products : {measure(create_products, n):8.1f} bytes/object")
+    print(f"consumers: {measure(create_consumers, n):8.1f} bytes/object")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="製品と消費者の1つあたりのメモリ使用量を計測")
+    parser.add_argument("config_file", nargs="?",
+                        default=str(Path("config") / "revenue_share" / "config_paas_0.8_manu_1.8_proc_2.0_rev_0.2.json"),
+                        help="設定ファイルのパス")
+    parser.add_argument("-n", type=int, default=100000, help="計測に生成する製品数と消費者数")
+    args = parser.parse_args()
+    main(args.config_file, args.n)
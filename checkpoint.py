@@ -0,0 +1,529 @@
+import os
+import json
+import random
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from logger import logger
+from enablers.product import StandardProduct
+from enablers.metric_ledger import MetricLedger
+from preference import Preference, PART_WORTH_KEYS
+from event_engine import EventType
+from stakeholders.consumer import StandardConsumer
+from stakeholders.consumer_cohort import ConsumerCohort
+
+# チェックポイント形式のバージョン（形式を変更した場合は更新する）
+CHECKPOINT_VERSION = 18
+
+PROVIDER_KEYS = ["manufacturer", "paas_provider", "reuse_provider", "remanufacturer", "recycler"]
+_PRODUCT_CLASSES = {cls.__name__: cls for cls in [StandardProduct]}
+_CONSUMER_CLASSES = {cls.__name__: cls for cls in [StandardConsumer, ConsumerCohort]}
+
+def _str_array(values: List[Any]) -> np.ndarray:
+    """文字列の配列（pickle不要のUnicode配列）を作成"""
+    return np.array(["" if value is None else str(value) for value in values], dtype=str)
+
+def _index_of(obj: Any, index: Dict[int, int]) -> int:
+    """オブジェクトのインデックスを取得（存在しない場合は-1）"""
+    return -1 if obj is None else index[id(obj)]
+
+# ---------------------------------------------------------------------------
+# 乱数状態
+# ---------------------------------------------------------------------------
+
+def capture_rng_state() -> Dict[str, np.ndarray]:
+    """numpyとrandomの乱数状態を配列として取得"""
+    name, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    version, internal_state, gauss_next = random.getstate()
+    return {
+        "rng/np_keys": np.asarray(keys, dtype=np.uint32),
+        "rng/np_params": np.array([pos, has_gauss], dtype=np.int64),
+        "rng/np_gauss": np.array([cached_gaussian], dtype=np.float64),
+        "rng/py_state": np.asarray(internal_state, dtype=np.int64),
+        "rng/py_params": np.array([version, gauss_next is not None], dtype=np.int64),
+        "rng/py_gauss": np.array([gauss_next or 0.0], dtype=np.float64),
+    }
+
+def restore_rng_state(arrays: Dict[str, np.ndarray]) -> None:
+    """配列から乱数状態を復元"""
+    pos, has_gauss = arrays["rng/np_params"]
+    np.random.set_state(("MT19937", arrays["rng/np_keys"], int(pos), int(has_gauss), float(arrays["rng/np_gauss"][0])))
+    version, has_gauss_next = arrays["rng/py_params"]
+    gauss_next = float(arrays["rng/py_gauss"][0]) if has_gauss_next else None
+    random.setstate((int(version), tuple(int(v) for v in arrays["rng/py_state"]), gauss_next))
+
+# ---------------------------------------------------------------------------
+# エコシステムの状態
+# ---------------------------------------------------------------------------
+
+def capture_ecosystem_state(ecosystem) -> Dict[str, np.ndarray]:
+    """
+    エコシステムの動的な状態を配列の辞書として取得
+
+    設定から再構築できる静的な情報（プロバイダーの属性など）は含めない。
+    オブジェクト間の参照は、エコシステムの製品・消費者リスト内のインデックスで表す。
+
+    Args:
+        ecosystem: 状態を取得するエコシステム
+    Returns:
+        Dict[str, np.ndarray]: 状態を表す配列の辞書
+    """
+    products = ecosystem.products
+    consumers = ecosystem.consumers
+    providers = [getattr(ecosystem, key, None) for key in PROVIDER_KEYS]
+    categories = getattr(ecosystem, "product_categories", [])
+    product_index = {id(product): i for i, product in enumerate(products)}
+    consumer_index = {id(consumer): i for i, consumer in enumerate(consumers)}
+    provider_index = {id(provider): i for i, provider in enumerate(providers) if provider is not None}
+    category_index = {id(category): i for i, category in enumerate(categories)}
+
+    arrays = {}
+
+    # 製品
+    arrays["product/class"] = _str_array([type(product).__name__ for product in products])
+    arrays["product/kind"] = _str_array([product.kind for product in products])
+    arrays["product/origin"] = _str_array([product.origin for product in products])
+    arrays["product/float"] = np.array(
+        [[product.lifetime, product.price, product.weibull_alpha, product.weibull_beta, product.failure_probability]
+         for product in products],
+        dtype=np.float64
+    ).reshape(-1, 5)
+    arrays["product/int"] = np.array(
+        [[product._age, product.use_period, product._matched, product._malfunction, product._disposed,
+          _index_of(product.provider, provider_index), _index_of(product.product_category, category_index),
+          0 if product._synced_step is None else product._synced_step, product.created_step, product.index]
+         for product in products],
+        dtype=np.int64
+    ).reshape(-1, 10)
+    arrays["product/next_provider"] = _str_array([product.next_provider for product in products])
+    # 遅延評価中かどうか（ステップ0から評価を開始した製品の反映済みステップは-1になるため、値とは別に保存する）
+    arrays["product/tracked"] = np.array([product._synced_step is not None for product in products], dtype=bool)
+    arrays["product/count"] = np.array([product.count for product in products], dtype=np.int64)
+
+    arrays["product/id"] = np.array(
+        [-1 if product.product_id is None else product.product_id for product in products], dtype=np.int64
+    )
+
+    # マテリアルフローのイベントログ
+    material_flow_log = ecosystem.material_flow_log
+    arrays["material_flow_log/num_of_products"] = np.array([material_flow_log.num_of_products], dtype=np.int64)
+    for key, column in material_flow_log.columns.items():
+        arrays[f"material_flow_log/{key}"] = column.copy()
+    for key, column in material_flow_log.history.columns.items():
+        arrays[f"product_history_log/{key}"] = column.copy()
+
+    # 消費者
+    arrays["consumer/class"] = _str_array([type(consumer).__name__ for consumer in consumers])
+    arrays["consumer/segment"] = _str_array([consumer.segment for consumer in consumers])
+    arrays["consumer/num_of_consumers"] = np.array([ecosystem.num_of_consumers], dtype=np.int64)
+    arrays["consumer/float"] = np.array(
+        [[consumer.churn_rate, consumer.reuse_probability,
+          np.nan if consumer.matched_price is None else consumer.matched_price]
+         + [getattr(consumer.preference, key) for key in PART_WORTH_KEYS]
+         for consumer in consumers],
+        dtype=np.float64
+    ).reshape(-1, 3 + len(PART_WORTH_KEYS))
+    arrays["consumer/int"] = np.array(
+        [[consumer.num_of_products, consumer.use_period, consumer._plan_of_use_period,
+          -1 if consumer.start_step is None else consumer.start_step,
+          _index_of(consumer.matched_product, product_index),
+          _index_of(getattr(consumer, "matched_product_category", None), category_index),
+          consumer.consumer_id, consumer.year, consumer.index]
+         for consumer in consumers],
+        dtype=np.int64
+    ).reshape(-1, 9)
+    arrays["consumer/count"] = np.array([consumer.count for consumer in consumers], dtype=np.int64)
+    # コホートのメンバーが使用中の製品（コホートのインデックスと製品のインデックスの組）
+    arrays["cohort/products"] = np.array(
+        [(i, product_index[id(product)])
+         for i, consumer in enumerate(consumers) if isinstance(consumer, ConsumerCohort)
+         for product in consumer.products],
+        dtype=np.int64
+    ).reshape(-1, 2)
+
+    # 解放キュー（枠の順序が解放の処理順になるため、枠ごとの消費者と再利用待ちの枠を保存）
+    arrays["release_queue/slots"] = np.array(
+        [_index_of(consumer, consumer_index) for consumer in ecosystem.release_queue.slots()], dtype=np.int64
+    )
+    arrays["release_queue/free_slots"] = np.array(ecosystem.release_queue.free_slots, dtype=np.int64)
+
+    # イベントエンジン（対象はRELEASEの場合は消費者、それ以外は製品のインデックス）
+    event_engine = getattr(ecosystem, "event_engine", None)
+    if event_engine is not None:
+        arrays["event_engine/events"] = np.array(
+            [(year, event_type, seq,
+              consumer_index[id(target)] if event_type == EventType.RELEASE.value else product_index[id(target)],
+              until)
+             for year, event_type, seq, target, until in event_engine.events()],
+            dtype=np.int64
+        ).reshape(-1, 5)
+        arrays["event_engine/seq"] = np.array([event_engine.seq], dtype=np.int64)
+
+    # プロバイダー
+    arrays["provider/price"] = np.array(
+        [np.nan if provider is None else provider.price for provider in providers], dtype=np.float64
+    )
+    provider_products = [(i, product_index[id(product)])
+                         for i, provider in enumerate(providers) if provider is not None
+                         for product in provider.products]
+    arrays["provider/products"] = np.array(provider_products, dtype=np.int64).reshape(-1, 2)
+    available_products = [(i, product_index[id(product)])
+                          for i, provider in enumerate(providers) if provider is not None
+                          for product in provider.available_products]
+    arrays["provider/available_products"] = np.array(available_products, dtype=np.int64).reshape(-1, 2)
+
+    # 製品カテゴリ
+    arrays["category/candidates"] = np.array(
+        [(i, consumer_index[id(consumer)]) for i, category in enumerate(categories) for consumer in category.candidates],
+        dtype=np.int64
+    ).reshape(-1, 2)
+
+    # ビジネスモデル
+    business_model = ecosystem.business_model
+    if business_model is not None:
+        arrays["business_model/metrics"] = business_model.metrics.values.copy()
+        ledger = business_model.financial_flow_ledger
+        arrays["business_model/flow_yearly"] = ledger.yearly.matrices.copy()
+        arrays["business_model/flow_cumulative"] = ledger.cumulative.copy()
+        transactions = list(ledger.transactions or [])
+        arrays["business_model/flow_transaction_years"] = np.array([row[0] for row in transactions], dtype=np.int64)
+        arrays["business_model/flow_transaction_source"] = _str_array([row[1] for row in transactions])
+        arrays["business_model/flow_transaction_target"] = _str_array([row[2] for row in transactions])
+        arrays["business_model/flow_transaction_value"] = np.array([row[3] for row in transactions], dtype=np.float64)
+        if hasattr(business_model, "subscriptions"):
+            contracts = business_model.subscriptions.contracts()
+            for key, column in contracts.items():
+                arrays[f"business_model/subscription_{key}"] = column
+
+    # マッチング履歴
+    matches = [(year, provider, count)
+               for year, counts in ecosystem.matching.matches_history.items()
+               for provider, count in counts.items()]
+    arrays["matching/years_counts"] = np.array([(row[0], row[2]) for row in matches], dtype=np.int64).reshape(-1, 2)
+    arrays["matching/providers"] = _str_array([row[1] for row in matches])
+    arrays["matching/sample_sizes"] = np.array(
+        list(ecosystem.matching.sample_sizes.items()), dtype=np.int64
+    ).reshape(-1, 2)
+
+    return arrays
+
+def restore_ecosystem_state(ecosystem, arrays: Dict[str, np.ndarray]) -> None:
+    """
+    初期化済みのエコシステムに、配列の辞書から動的な状態を復元
+
+    Args:
+        ecosystem: 設定から初期化済みのエコシステム
+        arrays: capture_ecosystem_stateで取得した配列の辞書
+    """
+    providers = [getattr(ecosystem, key, None) for key in PROVIDER_KEYS]
+    categories = getattr(ecosystem, "product_categories", [])
+
+    # 製品
+    products = []
+    for i, (class_name, kind, origin) in enumerate(zip(arrays["product/class"], arrays["product/kind"], arrays["product/origin"])):
+        lifetime, price, weibull_alpha, weibull_beta, failure_probability = arrays["product/float"][i]
+        age, use_period, matched, malfunction, disposed, provider_i, category_i, synced_step, created_step, index = arrays["product/int"][i]
+        product = _PRODUCT_CLASSES[str(class_name)]({
+            "kind": str(kind),
+            "origin": str(origin),
+            "created_step": int(created_step),
+            "index": int(index),
+            "price": float(price),
+            "lifetime": float(lifetime),
+            "weibull_alpha": float(weibull_alpha),
+            "weibull_beta": float(weibull_beta),
+        })
+        product.failure_probability = float(failure_probability)
+        product._age = int(age)
+        product.use_period = int(use_period)
+        product._matched = bool(matched)
+        product._malfunction = bool(malfunction)
+        product._disposed = bool(disposed)
+        product._provider = providers[provider_i] if provider_i >= 0 else None
+        product.product_category = categories[category_i] if category_i >= 0 else None
+        product.next_provider = str(arrays["product/next_provider"][i]) or None
+        product._synced_step = int(synced_step) if arrays["product/tracked"][i] else None
+        product.count = int(arrays["product/count"][i])
+        products.append(product)
+
+    # マテリアルフローのイベントログ
+    material_flow_log = ecosystem.material_flow_log
+    material_flow_log.load(
+        {key: arrays[f"material_flow_log/{key}"] for key in material_flow_log.columns},
+        int(arrays["material_flow_log/num_of_products"][0])
+    )
+    material_flow_log.history.load(
+        {key: arrays[f"product_history_log/{key}"] for key in material_flow_log.history.columns}
+    )
+    for product, product_id in zip(products, arrays["product/id"]):
+        if product_id >= 0:
+            product.product_id = int(product_id)
+            product.material_flow_log = material_flow_log
+
+    # 消費者（生成時の乱数消費を避けるため__init__を経由しない）
+    consumers = []
+    for i, (class_name, segment) in enumerate(zip(arrays["consumer/class"], arrays["consumer/segment"])):
+        consumer = object.__new__(_CONSUMER_CLASSES[str(class_name)])
+        segment = str(segment)
+        churn_rate, reuse_probability, matched_price, *part_worths = arrays["consumer/float"][i]
+        (num_of_products, use_period, plan_of_use_period, start_step, product_i, category_i,
+         consumer_id, year, index) = arrays["consumer/int"][i]
+        consumer.consumer_id = int(consumer_id)
+        consumer.segment = segment
+        consumer.year = int(year)
+        consumer.index = int(index)
+        consumer.clock = ecosystem.clock
+        consumer.pref_dict = ecosystem.consumer_attributes[segment].pref_dict
+        consumer.churn_rate = float(churn_rate)
+        consumer.reuse_probability = float(reuse_probability)
+        consumer.num_of_products = int(num_of_products)
+        consumer.matched_product = products[product_i] if product_i >= 0 else None
+        consumer.matched_price = None if np.isnan(matched_price) else float(matched_price)
+        consumer.use_period = int(use_period)
+        consumer.start_step = int(start_step) if start_step >= 0 else None
+        consumer._plan_of_use_period = int(plan_of_use_period)
+        consumer.preference = Preference(
+            {key: float(value) for key, value in zip(PART_WORTH_KEYS, part_worths)}, consumer
+        )
+        if category_i >= 0:
+            consumer.matched_product_category = categories[category_i]
+        if isinstance(consumer, ConsumerCohort):
+            consumer.count = int(arrays["consumer/count"][i])
+            consumer.products = []
+        consumers.append(consumer)
+    for consumer_i, product_i in arrays["cohort/products"]:
+        consumers[consumer_i].products.append(products[product_i])
+
+    ecosystem.products = products
+    ecosystem.consumers = consumers
+    ecosystem.num_of_consumers = int(arrays["consumer/num_of_consumers"][0])
+    # コホートの使用中のメンバー数は製品から求めるため、コホートの復元後に読み込む
+    ecosystem.release_queue.load(
+        [consumers[i] if i >= 0 else None for i in arrays["release_queue/slots"]],
+        arrays["release_queue/free_slots"].tolist()
+    )
+    event_engine = getattr(ecosystem, "event_engine", None)
+    if event_engine is not None:
+        event_engine.load(
+            [(int(year), int(event_type), int(seq),
+              consumers[target] if event_type == EventType.RELEASE.value else products[target], int(until))
+             for year, event_type, seq, target, until in arrays["event_engine/events"]],
+            int(arrays["event_engine/seq"][0])
+        )
+
+    # プロバイダー
+    for provider, price in zip(providers, arrays["provider/price"]):
+        if provider is not None:
+            provider.set_price(float(price))
+            provider.products.clear()
+    for provider_i, product_i in arrays["provider/products"]:
+        providers[provider_i].add_product(products[product_i])
+    available_products = {i: [] for i, provider in enumerate(providers) if provider is not None}
+    for provider_i, product_i in arrays["provider/available_products"]:
+        available_products[provider_i].append(products[product_i])
+    for provider_i, inventory in available_products.items():
+        providers[provider_i].available_products.load(inventory)
+    # 在庫の外にある製品（年次方式で毎ステップ走査する製品）
+    active_products = getattr(ecosystem, "active_products", None)
+    if active_products is not None:
+        idle = {id(product) for inventory in available_products.values() for product in inventory}
+        active_products.load([product for product in products if id(product) not in idle])
+
+    # 製品カテゴリ
+    for category in categories:
+        category.clear_candidates()
+    for category_i, consumer_i in arrays["category/candidates"]:
+        categories[category_i].candidates.append(consumers[consumer_i])
+
+    # ビジネスモデル
+    business_model = ecosystem.business_model
+    if business_model is not None:
+        business_model.metrics = MetricLedger.from_values(
+            arrays["business_model/metrics"], business_model.PROVIDER_TYPES
+        )
+        ledger = business_model.financial_flow_ledger
+        ledger.yearly.matrices = arrays["business_model/flow_yearly"].copy()
+        ledger.cumulative = arrays["business_model/flow_cumulative"].copy()
+        if ledger.transactions is not None:
+            ledger.transactions.clear()
+            ledger.transactions.extend(
+                (int(year), str(source), str(target), float(value))
+                for year, source, target, value in zip(
+                    arrays["business_model/flow_transaction_years"],
+                    arrays["business_model/flow_transaction_source"],
+                    arrays["business_model/flow_transaction_target"],
+                    arrays["business_model/flow_transaction_value"]
+                )
+            )
+        if hasattr(business_model, "subscriptions"):
+            business_model.subscriptions.load({
+                key: arrays[f"business_model/subscription_{key}"]
+                for key in ("prices", "expiry_steps", "active", "free_slots", "bucket_slots")
+            })
+
+    # マッチング履歴
+    matches_history = ecosystem.matching.matches_history
+    matches_history.clear()
+    for (year, count), provider in zip(arrays["matching/years_counts"], arrays["matching/providers"]):
+        matches_history.setdefault(int(year), defaultdict(int))[str(provider)] = int(count)
+    sample_sizes = ecosystem.matching.sample_sizes
+    sample_sizes.clear()
+    for year, size in arrays["matching/sample_sizes"]:
+        sample_sizes[int(year)] = int(size)
+
+# ---------------------------------------------------------------------------
+# チェックポイントファイル
+# ---------------------------------------------------------------------------
+
+def write_checkpoint(path: Path, arrays: Dict[str, np.ndarray], metadata: Dict[str, Any]) -> None:
+    """
+    チェックポイントを書き込む（一時ファイルへの書き込み後に置き換え）
+
+    Args:
+        path: 書き込み先のパス
+        arrays: 状態を表す配列の辞書
+        metadata: JSONで保存するメタデータ
+    """
+    metadata = dict(metadata, version=CHECKPOINT_VERSION)
+    meta = np.frombuffer(json.dumps(metadata).encode("utf-8"), dtype=np.uint8)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as f:
+        np.savez_compressed(f, meta=meta, **arrays)
+    os.replace(tmp_path, path)
+
+def read_checkpoint(path: Path) -> tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """
+    チェックポイントを読み込む
+
+    Args:
+        path: チェックポイントのパス
+    Returns:
+        tuple: 状態を表す配列の辞書とメタデータ
+    """
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {key: data[key] for key in data.files}
+    metadata = json.loads(arrays.pop("meta").tobytes().decode("utf-8"))
+    if metadata.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(
+            f"チェックポイントのバージョンが一致しません: {path} "
+            f"(file={metadata.get('version')}, expected={CHECKPOINT_VERSION})"
+        )
+    return arrays, metadata
+
+@dataclass
+class ResumePoint:
+    """再開位置"""
+    run_id: int
+    year: int
+    ecosystem: Any = None
+
+class CheckpointManager:
+    """
+    実行ごとのチェックポイントを管理するクラス
+
+    実行中は一定の年数ごとにエコシステムと乱数の状態を保存する。
+    実行の完了時には、次の実行の再開に必要な乱数の状態のみを保存する。
+    年次結果は結果の出力先に書き込まれるため、チェックポイントには含めない。
+    """
+
+    def __init__(self, directory: Path, setting_name: str, num_of_simulation: int, interval: int = 1):
+        """
+        Args:
+            directory: チェックポイントの保存先ディレクトリ
+            setting_name: 設定ファイル名
+            num_of_simulation: シミュレーション年数
+            interval: 保存間隔（年数）
+        """
+        if interval < 1:
+            raise ValueError(f"チェックポイントの保存間隔は1以上を指定してください: {interval}")
+        self.directory = directory
+        self.setting_name = setting_name
+        self.num_of_simulation = num_of_simulation
+        self.interval = interval
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, run_id: int) -> Path:
+        return self.directory / f"run_{run_id:04d}.npz"
+
+    def _metadata(self, run_id: int, year: int, completed: bool) -> Dict[str, Any]:
+        return {
+            "setting_name": self.setting_name,
+            "num_of_simulation": self.num_of_simulation,
+            "run_id": run_id,
+            "year": year,
+            "completed": completed,
+        }
+
+    def save_year(self, ecosystem, run_id: int, year: int) -> None:
+        """
+        年次サイクル完了後のチェックポイントを保存（保存間隔に達した年のみ）
+
+        Args:
+            ecosystem: エコシステム
+            run_id: 実行番号
+            year: 完了した年
+        """
+        if (year + 1) % self.interval != 0:
+            return
+        arrays = capture_ecosystem_state(ecosystem)
+        arrays.update(capture_rng_state())
+        write_checkpoint(self._path(run_id), arrays, self._metadata(run_id, year, False))
+        logger.debug(f"Saved checkpoint: {self.setting_name} run {run_id} year {year}")
+
+    def save_run(self, run_id: int) -> None:
+        """
+        実行完了時のチェックポイントを保存
+
+        Args:
+            run_id: 実行番号
+        """
+        write_checkpoint(
+            self._path(run_id),
+            capture_rng_state(),
+            self._metadata(run_id, self.num_of_simulation - 1, True)
+        )
+        logger.info(f"Saved checkpoint: {self.setting_name} run {run_id} completed")
+
+    def clear(self) -> None:
+        """保存済みのチェックポイントを削除"""
+        for path in self.directory.glob("run_*.npz"):
+            path.unlink()
+
+    def resume(self, ecosystem_factory: Callable[[], Any]) -> Optional[ResumePoint]:
+        """
+        最後に完了した（実行, 年）から再開するための状態を復元
+
+        乱数の状態はチェックポイント保存時の状態に復元される。
+
+        Args:
+            ecosystem_factory: 設定から初期化済みのエコシステムを生成する関数
+        Returns:
+            Optional[ResumePoint]: 再開位置。チェックポイントがない場合はNone
+        """
+        paths = sorted(self.directory.glob("run_*.npz"))
+        if not paths:
+            return None
+
+        for run_id, path in enumerate(paths):
+            if path != self._path(run_id):
+                raise ValueError(f"チェックポイントが連続していません: {path}")
+            if run_id < len(paths) - 1:
+                continue
+            arrays, metadata = read_checkpoint(path)
+            if (metadata["setting_name"] != self.setting_name or
+                    metadata["num_of_simulation"] != self.num_of_simulation):
+                raise ValueError(f"チェックポイントの設定が一致しません: {path}")
+            restore_rng_state(arrays)
+
+            if metadata["completed"]:
+                # 全ての保存済み実行が完了している場合は次の実行から再開
+                logger.info(f"Resuming {self.setting_name} from run {run_id + 1}")
+                return ResumePoint(run_id=run_id + 1, year=0)
+
+            # 実行途中から再開
+            ecosystem = ecosystem_factory()
+            restore_ecosystem_state(ecosystem, arrays)
+            logger.info(f"Resuming {self.setting_name} from run {run_id} year {metadata['year'] + 1}")
+            return ResumePoint(run_id=run_id, year=metadata["year"] + 1, ecosystem=ecosystem)
@@ -1,3 +1,4 @@
+import logging
 from enum import Enum
 from stakeholders.manufacturer import create_manufacturer, ManufacturerType
 from stakeholders.remanufacturer import create_remanufacturer, RemanufacturerType
@@ -5,43 +6,235 @@ from stakeholders.recycler import create_recycler, RecyclerType
 from stakeholders.paas_provider import create_paas_provider, PaasProviderType
 from stakeholders.reuse_provider import create_reuse_provider, ReuseProviderType
 from stakeholders.provider import Provider
-from typing import Dict
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+import numpy as np
 import pandas as pd
-from stakeholders.consumer import Consumer, ConsumerType, create_consumer
+from stakeholders.consumer_cohort import ConsumerMode, ConsumerCohort
 from enablers.policy import Policy, PolicyType, PolicyParameter
 from enablers.product import Product, ProductType
+from enablers.material_flow_log import MaterialFlowLog
+from enablers.release_queue import ReleaseQueue, CohortReleaseQueue
+from enablers.idle_inventory import ActiveProducts
+from event_engine import EngineMode, create_event_engine
+from enablers.time_resolution import StepClock, TimeResolution
 from logger import logger
-from enablers.business_model import create_business_model, BusinessModelType
+from enablers.business_model import create_business_model
 from matching import Matching
 from product_category import ProductCategory
+from result_sink import YearlyResult
+from instrumentation import Instrumentation
+from phase_pipeline import (
+    Phase, PhasePipeline, StepContext, YearContext,
+    ConsumerGenerationPhase, ProductGenerationPhase, ProviderSupplyPhase, MatchingPhase, ProductMatchingPhase,
+    AllocationPhase, ProductCostPhase, BillingPhase, StatusUpdatePhase, ConsumerReleasePhase, ProductScanPhase,
+    RepairCostPhase, CandidateClearPhase, ProfitPhase, FlowAggregationPhase, ResultPhase
+)
+if TYPE_CHECKING:
+    from config.compiled_config import (
+        ConsumerSettings, ProductSettings, EcosystemSettings, PolicySettings, BusinessModelSettings
+    )
+
 class CircularEcosystemType(Enum):
     ALL = "all"
     REVENUE_SHARE = "revenue_share"
 
-class CircularEcosystem:
+class CircularEcosystemBase:
     """
-    メーカとサードパーティがリユースを行うシミュレーション
+    フェーズのパイプラインで年次サイクルを実行するエコシステムの共通部分
+
+    各エコシステムは1ステップに実行するフェーズ（STEP_PHASES）と、年末に実行するフェーズ
+    （YEAR_PHASES）を宣言する。フェーズはインスタンスごとのパイプラインに登録されるため、
+    名前を指定して別の実装に差し替えたり、フェーズごとの経過時間を計測したりできる。
     """
 
+    STEP_PHASES: Tuple[Phase, ...] = ()
+    YEAR_PHASES: Tuple[Phase, ...] = ()
+
     def __init__(self):
         """
-        CircularEcosystemの初期化
+        エコシステムの共通の状態と、宣言したフェーズのパイプラインの初期化
         """
         self.products = []
         self.consumers = []
+        self.num_of_consumers = 0  # 生成した消費者数（次に割り当てる消費者ID）
+        self.product_categories = []
+        self.material_flow_log = MaterialFlowLog()
+        self.release_queue = ReleaseQueue()
+        self.active_products = None  # 在庫の外にある製品（年次方式のみ）
+        self.step_pipeline = PhasePipeline(self.STEP_PHASES)
+        self.year_pipeline = PhasePipeline(self.YEAR_PHASES)
+        self.event_engine = None
+        self.instrumentation: Optional[Instrumentation] = None
+        # 処理件数の累積のカウンタ（計測用、work_countsで参照する）
+        self.products_scanned = 0
+        self.failures_sampled = 0
+        self.dataframes_built = 0
+
+    def instrument(self, instrumentation: Optional[Instrumentation]) -> None:
+        """
+        年次サイクルのフェーズごとの計測を設定
+
+        Args:
+            instrumentation: 計測値の集計先（Noneの場合は計測しない）
+        """
+        self.instrumentation = instrumentation
+        self.step_pipeline.instrumentation = instrumentation
+        self.year_pipeline.instrumentation = instrumentation
+
+    def work_counts(self) -> Tuple[int, ...]:
+        """
+        処理件数の累積値（instrumentation.COUNTERSの順）
+
+        Returns:
+            Tuple[int, ...]: 生成した消費者エージェント数、計算した効用の数、走査した製品数、
+                故障の判定回数、記録したフロー数、作成したDataFrameの数
+        """
+        products_scanned = self.products_scanned
+        failures_sampled = self.failures_sampled
+        if self.event_engine is not None:
+            products_scanned += self.event_engine.events_processed
+            failures_sampled += self.event_engine.failures_sampled
+        return (
+            self.num_of_consumers,
+            self.matching.utility_evaluations,
+            products_scanned,
+            failures_sampled,
+            len(self.material_flow_log) + self.business_model.financial_flow_ledger.num_of_records,
+            self.dataframes_built,
+        )
+
+    def set_equilibrium_prices(self, prices: dict[str, float]):
+        """
+        各プロバイダーの均衡価格を設定
+        
+        Args:
+            prices: プロバイダーごとの価格を含む辞書
+                   例: {
+                       'manufacturer': 100.0,
+                       'paas_provider': 50.0,
+                       'reuse_provider': 30.0,
+                       'remanufacturer': 40.0,
+                       'recycler': 20.0
+                   }
+        """
+        # 各プロバイダーに価格を設定
+        if 'manufacturer' in prices and self.manufacturer:
+            self.manufacturer.set_price(prices['manufacturer'])
+            
+        if 'paas_provider' in prices and self.paas_provider:
+            self.paas_provider.set_price(prices['paas_provider'])
+            
+        if 'reuse_provider' in prices and self.reuse_provider:
+            self.reuse_provider.set_price(prices['reuse_provider'])
+            
+        if 'remanufacturer' in prices and self.remanufacturer:
+            self.remanufacturer.set_price(prices['remanufacturer'])
+            
+        if 'recycler' in prices and self.recycler:
+            self.recycler.set_price(prices['recycler'])
+
+
+    def execute_yearly_cycle(self, year: int) -> YearlyResult:
+        """
+        年次サイクルの実行（年内の各ステップを実行し、年単位の結果にまとめる）
+
+        指標、マッチング数、フローは各ステップで年ごとの台帳や行列に加算されるため、
+        結果の生成は年末のフェーズで年に1回だけ行う。
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"##### Starting yearly cycle for year {year} #####")
+        if self.instrumentation is not None:
+            self.instrumentation.begin_year(year)
+        self.business_model.metrics.reset(year)
+        for step in self.clock.steps_of(year):
+            self.execute_step(step)
+        context = YearContext(year=year)
+        self.year_pipeline.run(self, context)
+        return context.result
+
+    def execute_step(self, step: int) -> None:
+        """
+        1ステップの実行（1年1ステップの場合は従来の年次サイクルと同じ）
+
+        消費者や製品の時間はステップ単位、指標とフローはステップが属する年に集計する。
+
+        Args:
+            step: ステップ
+        """
+        year = self.clock.year_of(step)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"--- Starting step {step} (year {year}) ---")
+        self.material_flow_log.year = year
+        if self.active_products is not None:
+            self.active_products.step = step
+        self.step_pipeline.run(self, StepContext(step=step, year=year))
+
+    def _sample_size(self, num: int) -> int:
+        """
+        実際の人数・生産量を表すのに必要なエージェント数（重みで割り切れない場合は実際の規模を表せないため拒否する）
+
+        Args:
+            num: 実際の人数または生産量
+        Returns:
+            int: 生成するエージェント数
+        """
+        if self.agent_weight == 1:
+            return num
+        size, residual = divmod(num, self.agent_weight)
+        if residual:
+            raise ValueError(f"人数・生産量 {num} がエージェントの重み {self.agent_weight} で割り切れません")
+        return size
+
+    def collect_yearly_flows(self, year: int) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        指定年のマテリアルフローと財務フローをフロー行列から取得
+
+        Args:
+            year: 年
+        Returns:
+            Tuple[pd.DataFrame, pd.DataFrame]: 当年のマテリアルフローと財務フロー（source, target, value）
+        """
+        self.dataframes_built += 2
+        return (
+            self.material_flow_log.matrices.to_frame(year),
+            self.business_model.financial_flow_ledger.year_frame(year)
+        )
+
+class CircularEcosystem(CircularEcosystemBase):
+    """
+    メーカとサードパーティがリユースを行うシミュレーション
+    """
+
+    STEP_PHASES = (
+        ConsumerGenerationPhase(),
+        ProviderSupplyPhase(),
+        ProductCostPhase(),
+        ProductMatchingPhase(),
+        BillingPhase(),
+        ConsumerReleasePhase(),
+        ProductScanPhase(),
+    )
+    YEAR_PHASES = (
+        FlowAggregationPhase(),
+        ResultPhase(('revenue', 'product_cost', 'repair_cost')),
+    )
 
     def initialize(
         self,
         name: str,
         entity: str,
         group: str,
-        consumer_attributes: Dict,
-        product_attributes: Dict,
+        consumer_attributes: Dict[str, 'ConsumerSettings'],
+        product_attributes: Dict[str, 'ProductSettings'],
         num_of_simulation: int,
-        ecosystem_settings: Dict[str, str],
-        policy_settings: Dict,
-        business_model_settings: Dict,
-        product_type: str = "STANDARD"
+        ecosystem_settings: 'EcosystemSettings',
+        policy_settings: Optional['PolicySettings'],
+        business_model_settings: 'BusinessModelSettings',
+        product_type: str = "STANDARD",
+        engine_mode: str = "yearly",
+        time_resolution: str = "yearly",
+        consumer_mode: str = "individual",
+        agent_weight: int = 1
     ) -> None:
         """
         エコシステムの初期化を行う
@@ -50,36 +243,53 @@ class CircularEcosystem:
             name: プロジェクト名
             entity: エンティティ名
             group: グループ名
-            consumer_attributes: 消費者の属性設定
-            product_attributes: 製品の属性設定
+            consumer_attributes: 消費者の種類名をキーとした検証済みの属性設定
+            product_attributes: 製品の種類名をキーとした検証済みの属性設定
             num_of_simulation: シミュレーション回数
             ecosystem_settings: エコシステムコンポーネントの設定
             policy_settings: 制度の設定（オプション）
+            business_model_settings: ビジネスモデルの設定
             product_type: PaaSプロバイダーの製品タイプ
             paas_provider_type: PaaSプロバイダーのタイプ
             business_model_type: ビジネスモデルのタイプ
+            engine_mode: 年次サイクルの状態更新の方式（yearly または event）
+            time_resolution: 時間の刻み（yearly、quarterly または monthly）
+            consumer_mode: 消費者の表現方式（individual または cohort）
+            agent_weight: 1エージェントが表す実際の消費者数・製品数（重み付きエージェント方式）
         """
         # 基本設定の初期化
         self.name = name
         self.entity = entity
         self.group = group
-        self.consumer_attributes = consumer_attributes
-        self.product_attributes = product_attributes
+        # 設定は変更できないため、パラメータ変更時は辞書の要素ごと置き換える
+        self.consumer_attributes = dict(consumer_attributes)
+        self.product_attributes = dict(product_attributes)
         self.num_of_simulation = num_of_simulation
+        if EngineMode(engine_mode) != EngineMode.YEARLY:
+            raise ValueError(f"このエコシステムはイベント方式の状態更新に対応していません: {engine_mode}")
+        if TimeResolution(time_resolution) != TimeResolution.YEARLY:
+            raise ValueError(f"このエコシステムは1年未満の時間の刻みに対応していません: {time_resolution}")
+        if ConsumerMode(consumer_mode) != ConsumerMode.INDIVIDUAL:
+            raise ValueError(f"このエコシステムはコホート方式の消費者に対応していません: {consumer_mode}")
+        if agent_weight != 1:
+            raise ValueError(f"このエコシステムは重み付きエージェントに対応していません: {agent_weight}")
+        self.consumer_mode = ConsumerMode.INDIVIDUAL
+        self.agent_weight = agent_weight
+        self.clock = StepClock()
 
         # エコシステム設定の初期化
-        self.paas_provider_type = ecosystem_settings["paas_provider"]["type"]
-        self.reuse_provider_type = ecosystem_settings["reuse_provider"]["type"]
-        self.manufacturer_type = ecosystem_settings["manufacturer"]["type"]
-        self.remanufacturer_type = ecosystem_settings["remanufacturer"]["type"]
-        self.recycler_type = ecosystem_settings["recycler"]["type"]
+        self.paas_provider_type = ecosystem_settings.paas_provider.type
+        self.reuse_provider_type = ecosystem_settings.reuse_provider.type
+        self.manufacturer_type = ecosystem_settings.manufacturer.type
+        self.remanufacturer_type = ecosystem_settings.remanufacturer.type
+        self.recycler_type = ecosystem_settings.recycler.type
         
         # プロバイダー属性の設定
-        self.paas_provider_attributes = ecosystem_settings["paas_provider"]["attributes"]
-        self.reuse_provider_attributes = ecosystem_settings["reuse_provider"]["attributes"]
-        self.manufacturer_attributes = ecosystem_settings["manufacturer"]["attributes"]
-        self.remanufacturer_attributes = ecosystem_settings["remanufacturer"]["attributes"]
-        self.recycler_attributes = ecosystem_settings["recycler"]["attributes"]
+        self.paas_provider_attributes = ecosystem_settings.paas_provider.attributes
+        self.reuse_provider_attributes = ecosystem_settings.reuse_provider.attributes
+        self.manufacturer_attributes = ecosystem_settings.manufacturer.attributes
+        self.remanufacturer_attributes = ecosystem_settings.remanufacturer.attributes
+        self.recycler_attributes = ecosystem_settings.recycler.attributes
 
         # シコシステムコンポーネントの初期化
         self.paas_provider = create_paas_provider(
@@ -110,201 +320,57 @@ class CircularEcosystem:
 
         # 制度の初期化（policy_settingsがある場合のみ）
         if policy_settings:
-            self.policy = Policy(
-                parameters=PolicyParameter(
-                    carbon_tax_rate=policy_settings["carbon_tax_rate"],
-                    subsidy_rate=policy_settings["subsidy_rate"],
-                    deposit_amount=policy_settings["deposit_amount"],
-                    epr_fee=policy_settings["epr_fee"],
-                    repair_cost_reduction=policy_settings["repair_cost_reduction"]
-                )
-            )
+            self.policy = Policy(parameters=PolicyParameter(**policy_settings.model_dump()))
         else:
             self.policy = None  # policy_settingsが指定されていない場合はNoneを設定
         
         # ビジネスモデルの初期化
-        if business_model_settings:
-            # アンダースコアを削除して大文字に変換
-            model_type = business_model_settings["business_model_type"].replace("_", "").upper()
-            self.business_model = create_business_model(
-                business_model_type=BusinessModelType[model_type],
-                attributes=business_model_settings["attributes"]
-            )
-        else:
-            self.business_model = None
+        self.business_model = create_business_model(
+            business_model_type=business_model_settings.business_model_type,
+            attributes=business_model_settings.attributes.model_dump(exclude_none=True)
+        )
 
         # マッチングの初期化
         self.matching = Matching()
 
-    def set_equilibrium_prices(self, prices: dict[str, float]):
-        """
-        各プロバイダーの均衡価格を設定
-        
-        Args:
-            prices: プロバイダーごとの価格を含む辞書
-                   例: {
-                       'manufacturer': 100.0,
-                       'paas_provider': 50.0,
-                       'reuse_provider': 30.0,
-                       'remanufacturer': 40.0,
-                       'recycler': 20.0
-                   }
-        """
-        # 各プロバイダーに価格を設定
-        if 'manufacturer' in prices and self.manufacturer:
-            self.manufacturer.set_price(prices['manufacturer'])
-            
-        if 'paas_provider' in prices and self.paas_provider:
-            self.paas_provider.set_price(prices['paas_provider'])
-            
-        if 'reuse_provider' in prices and self.reuse_provider:
-            self.reuse_provider.set_price(prices['reuse_provider'])
-            
-        if 'remanufacturer' in prices and self.remanufacturer:
-            self.remanufacturer.set_price(prices['remanufacturer'])
-            
-        if 'recycler' in prices and self.recycler:
-            self.recycler.set_price(prices['recycler'])
-
-    def execute_yearly_cycle(self, year: int) -> pd.DataFrame:
-        """年次サイクルの実行"""
-        logger.debug(f"##### Starting yearly cycle for year {year} #####")
-        new_consumers = []
-        
-        # 消費者の生成
-        for name, attribute in self.consumer_attributes.items():
-            logger.debug(f"--- Creating {attribute['num_of_players']} consumers of type {name} ---")
-            logger.debug("part_worth_values: [ownership,subscription,reuse,remanufacture,price,spec]")
-            for i in range(attribute["num_of_players"]):
-                consumer_name = f"{name}_{year}_{i}"
-                consumer = create_consumer(
-                    consumer_type=ConsumerType[attribute.get("type", "STANDARD")],
-                    name=consumer_name,
-                    attributes=attribute
-                )
-                logger.debug(f"Created consumer {consumer.name}, "
-                           f"part_worth_values: {[round(v, 3) for v in consumer.preference.part_worth_values.values()]}, "
-                           f"plan_of_use_period: {consumer.plan_of_use_period}")
-                new_consumers.append(consumer)
-        self.consumers.extend(new_consumers)
-
-        # 製品の生成
-        new_products = []
-        new_products.extend(self.manufacturer.create_products(self.product_attributes, year))
-        new_products.extend(self.paas_provider.provide_products(self.product_attributes, year))
-        new_products.extend(self.reuse_provider.provide_products(self.product_attributes, year))
-        self.products.extend(new_products)
-
-        # ビジネスモデルのコスト計算
-        self.business_model.calculate_product_costs(new_products, year)
-
-        # # 消費者に制度を適用
-        # for consumer in consumers:
-        #     self.policy.apply_to_consumer(consumer)
-
-        # # 製品に制度を適用
-        # for product in products:
-        #     self.policy.apply_to_product(product)
-
-        # マッチング実行
-        logger.debug("---Starting matching process---")
-        matches = self.matching.match(year, new_consumers, self.products)
-        
-        # ビジネスモデルの売上計算
-        if self.business_model:
-            self.business_model.calculate_revenues(matches, year)
-                
-        # 消費者の使用年数更新
-        logger.debug("---Updating consumer status---")
-        for consumer in self.consumers:
-            consumer.update_use_period()
-        
-        # 製品の状態更新、移管、返却処理
-        logger.debug("---Updating product status---")
-        for product in self.products:
-            # 年次の状態更新（年齢と使用期間）
-            product.update_yearly_status()
-            
-            # マッチしている製品の故障判定と修理
-            if product.matched:
-                product.determine_malfunction()
-                if product.malfunction:
-                    logger.debug(f"Product {product.name} malfunctioned")
-                    if product.provider is not None:
-                        # 修理コストを計算
-                        self.business_model.calculate_repair_costs(product, year)
-                        product.provider.repair_product(product)
-                        logger.debug(f"Product {product.name} repaired by {product.provider.name}")
-            else:
-                # 未マッチ製品の移管処理
-                if product.next_provider == "paas_provider":
-                    product.add_provider(year+1, self.paas_provider)
-                    logger.debug(f"Product {product.name} is transferred to {self.paas_provider.name}")
-                elif product.next_provider == "reuse_provider":
-                    product.add_provider(year+1, self.reuse_provider)
-                    logger.debug(f"Product {product.name} is transferred to {self.reuse_provider.name}")
-                elif product.next_provider == "recycler":
-                    product.add_provider(year+1, self.recycler)
-                    logger.debug(f"Product {product.name} is transferred to {self.recycler.name}")
-        logger.debug("---Calculating business model revenues---")
-        logger.debug(f"Revenue: {self.business_model.revenue_history[year]}")
-        logger.debug(f"Product cost: {self.business_model.product_cost_history[year]}")
-        logger.debug(f"Repair cost: {self.business_model.repair_cost_history[year]}")
-        
-        # ビジネスモデルから履歴データを取得
-        revenue_history = dict(self.business_model.revenue_history[year])
-        product_cost_history = dict(self.business_model.product_cost_history[year])
-        repair_cost_history = dict(self.business_model.repair_cost_history[year])
-        
-        # マッチングの履歴データを取得
-        matches_history = dict(self.matching.get_matches_history())
-
-        # マテリアフローの履歴データを取得
-        material_flow_all = pd.DataFrame(columns=["source", "target", "value"])
-        for product in self.products:
-            material_flow_all = pd.concat([material_flow_all, product.get_material_flow_history()], ignore_index=True)
-        material_flow_all = material_flow_all.groupby(["source", "target"]).sum().reset_index()
-        
-        # 財務フローの履歴データを取得
-        financial_flow_all = self.business_model.get_financial_flow_history().groupby(["source", "target"]).sum().reset_index()
-
-        # 結果の生成
-        result = {
-            'revenue_history': revenue_history,
-            'product_cost_history': product_cost_history,
-            'repair_cost_history': repair_cost_history,
-            'matches_history': matches_history,
-            'material_flow_history': material_flow_all,
-            'financial_flow_history': financial_flow_all
-        }
-        
-        return pd.DataFrame([result])
-
-class CircularEcosystem_RevenueShare:
+class CircularEcosystem_RevenueShare(CircularEcosystemBase):
     """
     メーカとPaaSプロバイダーがレベニューシェアを行うシミュレーション
     """
 
-    def __init__(self):
-        """
-        CircularEcosystem_RevenueShareの初期化
-        """
-        self.products = []
-        self.consumers = []
-        self.product_categories = []
+    STEP_PHASES = (
+        ConsumerGenerationPhase(),
+        ProductGenerationPhase(),
+        MatchingPhase(),
+        AllocationPhase(),
+        ProductCostPhase(),
+        BillingPhase(),
+        StatusUpdatePhase(),
+        RepairCostPhase(),
+        CandidateClearPhase(),
+    )
+    YEAR_PHASES = (
+        ProfitPhase(),
+        FlowAggregationPhase(),
+        ResultPhase(('revenue', 'product_cost', 'repair_cost', 'profit')),
+    )
 
     def initialize(
         self,
         name: str,
         entity: str,
         group: str,
-        consumer_attributes: Dict,
-        product_attributes: Dict,
+        consumer_attributes: Dict[str, 'ConsumerSettings'],
+        product_attributes: Dict[str, 'ProductSettings'],
         num_of_simulation: int,
-        ecosystem_settings: Dict[str, str],
-        policy_settings: Dict,
-        business_model_settings: Dict,
-        product_type: str = "STANDARD"
+        ecosystem_settings: 'EcosystemSettings',
+        policy_settings: Optional['PolicySettings'],
+        business_model_settings: 'BusinessModelSettings',
+        product_type: str = "STANDARD",
+        engine_mode: str = "yearly",
+        time_resolution: str = "yearly",
+        consumer_mode: str = "individual",
+        agent_weight: int = 1
     ) -> None:
         """
         エコシステムの初期化を行う
@@ -313,31 +379,50 @@ class CircularEcosystem_RevenueShare:
             name: プロジェクト名
             entity: エンティティ名
             group: グループ名
-            consumer_attributes: 消費者の属性設定
-            product_attributes: 製品の属性設定
+            consumer_attributes: 消費者の種類名をキーとした検証済みの属性設定
+            product_attributes: 製品の種類名をキーとした検証済みの属性設定
             num_of_simulation: シミュレーション回数
             ecosystem_settings: エコシステムコンポーネントの設定
             policy_settings: 制度の設定（オプション）
+            business_model_settings: ビジネスモデルの設定
             product_type: PaaSプロバイダーの製品タイプ
             paas_provider_type: PaaSプロバイダーのタイプ
             business_model_type: ビジネスモデルのタイプ
+            engine_mode: 年次サイクルの状態更新の方式（yearly または event）
+            time_resolution: 時間の刻み（yearly、quarterly または monthly）
+            consumer_mode: 消費者の表現方式（individual または cohort）
+            agent_weight: 1エージェントが表す実際の消費者数・製品数（重み付きエージェント方式）
         """
         # 基本設定の初期化
         self.name = name
         self.entity = entity
         self.group = group
-        self.consumer_attributes = consumer_attributes
-        self.product_attributes = product_attributes
+        # 設定は変更できないため、パラメータ変更時は辞書の要素ごと置き換える
+        self.consumer_attributes = dict(consumer_attributes)
+        self.product_attributes = dict(product_attributes)
         self.num_of_simulation = num_of_simulation
         self.ecosystem_settings = ecosystem_settings
+        self.consumer_mode = ConsumerMode(consumer_mode)
+        if not isinstance(agent_weight, int) or agent_weight < 1:
+            raise ValueError(f"エージェントの重みは1以上の整数で指定してください: {agent_weight}")
+        # 1エージェントが表す実際の消費者数・製品数（生成数を1/weightにし、集計時に重みを乗じる）
+        self.agent_weight = agent_weight
+        self.material_flow_log.weight = agent_weight
+        if self.consumer_mode == ConsumerMode.COHORT:
+            if EngineMode(engine_mode) != EngineMode.YEARLY:
+                raise ValueError(f"コホート方式の消費者はイベント方式の状態更新に対応していません: {engine_mode}")
+            # コホートごとに使用中のメンバー数を管理し、チャーンを二項分布で判定する
+            self.release_queue = CohortReleaseQueue()
+        self.event_engine = create_event_engine(EngineMode(engine_mode))
+        self.clock = StepClock(TimeResolution(time_resolution))
 
         # エコシステム設定の初期化
-        self.paas_provider_type = ecosystem_settings["paas_provider"]["type"]
-        self.manufacturer_type = ecosystem_settings["manufacturer"]["type"]
+        self.paas_provider_type = ecosystem_settings.paas_provider.type
+        self.manufacturer_type = ecosystem_settings.manufacturer.type
 
         # プロバイダー属性の設定
-        self.paas_provider_attributes = ecosystem_settings["paas_provider"]["attributes"]
-        self.manufacturer_attributes = ecosystem_settings["manufacturer"]["attributes"]
+        self.paas_provider_attributes = ecosystem_settings.paas_provider.attributes
+        self.manufacturer_attributes = ecosystem_settings.manufacturer.attributes
 
         # シコシステムコンポーネントの初期化
         self.paas_provider = create_paas_provider(
@@ -351,8 +436,14 @@ class CircularEcosystem_RevenueShare:
             product_type=ProductType[product_type],
         )
 
+        # 年次方式では在庫の製品を個別に走査せず、同値類ごとに状態を更新する
+        if self.event_engine is None:
+            self.active_products = ActiveProducts()
+            for provider in (self.paas_provider, self.manufacturer):
+                provider.available_products.active_products = self.active_products
+
         # 製品カテゴリの初期化
-        for provider_name, settings in ecosystem_settings.items():
+        for provider_name in ecosystem_settings.configured():
             if provider_name not in ["paas_provider", "manufacturer"]:
                 continue
                 
@@ -369,216 +460,224 @@ class CircularEcosystem_RevenueShare:
 
         # 制度の初期化（policy_settingsがある場合のみ）
         if policy_settings:
-            self.policy = Policy(
-                parameters=PolicyParameter(
-                    carbon_tax_rate=policy_settings["carbon_tax_rate"],
-                    subsidy_rate=policy_settings["subsidy_rate"],
-                    deposit_amount=policy_settings["deposit_amount"],
-                    epr_fee=policy_settings["epr_fee"],
-                    repair_cost_reduction=policy_settings["repair_cost_reduction"]
-                )
-            )
+            self.policy = Policy(parameters=PolicyParameter(**policy_settings.model_dump()))
         else:
             self.policy = None  # policy_settingsが指定されていない場合はNoneを設定
 
         # ビジネスモデルの初期化
-        if business_model_settings:
-            # アンダースコアを削除して大文字に変換
-            model_type = business_model_settings["business_model_type"].replace("_", "").upper()
-            self.business_model = create_business_model(
-                business_model_type=BusinessModelType[model_type],
-                attributes=business_model_settings["attributes"]
-            )
-        else:
-            self.business_model = None
+        self.business_model = create_business_model(
+            business_model_type=business_model_settings.business_model_type,
+            attributes=business_model_settings.attributes.model_dump(exclude_none=True),
+            clock=self.clock,
+            weight=self.agent_weight
+        )
 
         # マッチングの初期化
-        self.matching = Matching()
+        self.matching = Matching(self.agent_weight)
 
-    def set_equilibrium_prices(self, prices: dict[str, float]):
+    def _register_products(self, products: List[Product], step: int) -> None:
         """
-        各プロバイダーの均衡価格を設定
-        
+        生成した製品をイベントログに登録し、寿命と故障確率をステップ単位に換算
+
         Args:
-            prices: プロバイダーごとの価格を含む辞書
-                   例: {
-                       'manufacturer': 100.0,
-                       'paas_provider': 50.0,
-                       'reuse_provider': 30.0,
-                       'remanufacturer': 40.0,
-                       'recycler': 20.0
-                   }
+            products: 生成した製品
+            step: 生成したステップ
         """
-        # 各プロバイダーに価格を設定
-        if 'manufacturer' in prices and self.manufacturer:
-            self.manufacturer.set_price(prices['manufacturer'])
-            
-        if 'paas_provider' in prices and self.paas_provider:
-            self.paas_provider.set_price(prices['paas_provider'])
-            
-        if 'reuse_provider' in prices and self.reuse_provider:
-            self.reuse_provider.set_price(prices['reuse_provider'])
-            
-        if 'remanufacturer' in prices and self.remanufacturer:
-            self.remanufacturer.set_price(prices['remanufacturer'])
-            
-        if 'recycler' in prices and self.recycler:
-            self.recycler.set_price(prices['recycler'])
+        self.material_flow_log.register_batch(products)
+        for product in products:
+            product.to_step_resolution(self.clock)
+        if self.event_engine is not None:
+            self.event_engine.add_products(products, step)
+        if self.active_products is not None:
+            # 生成時に在庫に入らなかった製品は毎ステップ走査する
+            for product in products:
+                if product not in product.provider.available_products:
+                    self.active_products.add(product)
+
+    def _create_products(self, provider: Provider, step: int, n: int) -> List[Product]:
+        """
+        プロバイダーの製品を種類ごとにn個生成（コホート方式では種類ごとにn個をまとめた1つの製品）
 
-    def execute_yearly_cycle(self, year: int) -> pd.DataFrame:
-        """年次サイクルの実行"""
-        logger.debug(f"##### Starting yearly cycle for year {year} #####")
-        new_consumers = []
-        
-        # 消費者の生成
-        for name, attribute in self.consumer_attributes.items():
-            logger.debug(f"--- Creating {attribute['num_of_players']} consumers of type {name} ---")
-            logger.debug("part_worth_values: [ownership,subscription,reuse,remanufacture,price,spec]")
-            for i in range(attribute["num_of_players"]):
-                consumer_name = f"{name}_{year}_{i}"
-                consumer = create_consumer(
-                    consumer_type=ConsumerType[attribute.get("type", "STANDARD")],
-                    name=consumer_name,
-                    attributes=attribute
-                )
-                logger.debug(f"Created consumer {consumer.name}, "
-                           f"part_worth_values: {[round(v, 3) for v in consumer.preference.part_worth_values.values()]}, "
-                           f"plan_of_use_period: {consumer.plan_of_use_period}")
-                new_consumers.append(consumer)
-        self.consumers.extend(new_consumers)
-
-        # 製品の生成
-        new_products = []
-        new_products.extend(self.manufacturer.create_products(self.product_attributes, year, self.manufacturer_attributes["base_production_volume"]))
-        new_products.extend(self.paas_provider.create_products(self.product_attributes, year, self.paas_provider_attributes["base_production_volume"]))
-        self.products.extend(new_products)
-
-        # 利用可能な製品を取得
-        logger.debug("---Getting available products---")
-        available_products = []
-        for product in self.products:
-            if product.is_available():
-                available_products.append(product)
-                logger.debug(f"{product.name}")
-
-        # 製品カテゴリに製品を追加
-        for product_category in self.product_categories:
-            for product in available_products:
-                if product_category.provider == product.provider:
-                    product_category.add_products(product)
+        Args:
+            provider: 製品を生成するプロバイダー
+            step: 生成したステップ
+            n: 種類ごとの生成数
+        Returns:
+            List[Product]: 生成した製品
+        """
+        if self.consumer_mode != ConsumerMode.COHORT:
+            return provider.create_products(self.product_attributes, step, n)
+        if n <= 0:
+            return []
+        products = provider.create_products(self.product_attributes, step, 1)
+        for product in products:
+            product.count = n
+        return products
+
+    def _split_product(self, product: Product, count: int) -> Product:
+        """
+        在庫の外にあるまとめた製品からcount個を別の製品に分割し、エコシステムの製品に加える
 
-        # # 消費者に制度を適用
-        # for consumer in consumers:
-        #     self.policy.apply_to_consumer(consumer)
+        Args:
+            product: 分割する製品（在庫の外にある製品）
+            count: 分割する製品数
+        Returns:
+            Product: 分割した製品
+        """
+        piece = product.split(count)
+        self.products.append(piece)
+        self.active_products.add(piece)
+        return piece
 
-        # # 製品に制度を適用
-        # for product in products:
-        #     self.policy.apply_to_product(product)
+    def _update_status_yearly(self, step: int) -> List[Product]:
+        """
+        消費者と製品の状態を更新
 
-        # マッチング実行
-        logger.debug("---Starting matching process---")
-        matches = self.matching.match(year, new_consumers, self.product_categories)
+        在庫の外にある製品は個別に走査し、在庫の製品は同値類ごとに寿命による廃棄のみを判定する
+        （在庫の製品の年齢は在庫から出る際に反映する）。
 
-        # マッチング結果から製品の割当
-        for product_category in self.product_categories:
-            # 製品カテゴリに製品が足りない場合は新規生産/調達
-            if len(product_category.candidates) > len(product_category.product_list):
-                _new_products = product_category.provider.create_products(self.product_attributes, year, (len(product_category.candidates) - len(product_category.product_list)))
-                product_category.add_products(_new_products)
-                new_products.extend(_new_products)
-                self.products.extend(_new_products)
-            for consumer, product in zip(product_category.candidates, product_category.product_list):
-                consumer.set_possession(product)
-                product.add_consumer(year, consumer.name)
-
-        # ビジネスモデルのコスト計算
-        self.business_model.calculate_product_costs(new_products, year)
-
-        # ビジネスモデルの売上計算
-        if self.business_model:
-            self.business_model.calculate_revenues(matches, year)
-                        
-        # 消費者の使用年数更新
+        Args:
+            step: ステップ
+        Returns:
+            List[Product]: 修理した製品
+        """
+        debug = logger.isEnabledFor(logging.DEBUG)
+        # 計画使用期間の満了またはチャーンにより製品を解放する消費者のみを処理
         logger.debug("---Updating consumer status---")
-        for consumer in self.consumers:
-            consumer.update_use_period()
-        # 製品の状態更新、移管、返却処理
+        released_products = []
+        if self.consumer_mode == ConsumerMode.COHORT:
+            for cohort, n in self.release_queue.pop_releases(step):
+                released_products.extend(cohort.release(step, self._split_product, n))
+        else:
+            for consumer in self.release_queue.pop_releases(step):
+                if consumer.matched_product is not None:
+                    released_products.append(consumer.matched_product)
+                consumer.release(step)
+        # 製品の状態更新、移管、返却処理（乱数の消費順を揃えるため生成した順に走査）
         logger.debug("---Updating product status---")
         repaired_products = [] # 修理済みの製品リスト
-        for product in self.products:
+        cohort_mode = self.consumer_mode == ConsumerMode.COHORT
+        products = self.active_products.ordered()
+        failures_sampled = 0
+        for product in products:
             # 年次の状態更新（年齢と使用期間）
             product.update_yearly_status()
             
             # マッチしている製品の故障判定と修理
+            if product.matched and cohort_mode:
+                # コホートの製品の故障判定はコホートごとにまとめて行う
+                continue
             if product.matched:
                 product.determine_malfunction()
+                failures_sampled += 1
                 if product.malfunction:
-                    logger.debug(f"Product {product.name} malfunctioned")
+                    if debug:
+                        logger.debug(f"Product {product.name} malfunctioned")
                     if product.provider is not None:
                         # 修理コストを計算
                         product.provider.repair_product(product)
                         if not product.malfunction:
                             repaired_products.append(product)
-                        logger.debug(f"Product {product.name} repaired by {product.provider.name}")
+                        if debug:
+                            logger.debug(f"Product {product.name} repaired by {product.provider.name}")
             else:
                 # 未マッチ製品の移管処理
-                if product.next_provider == "paas_provider":
-                    product.add_provider(year+1, self.paas_provider)
-                    logger.debug(f"Product {product.name} is transferred to {self.paas_provider.name}")
-        
-        # 修理コストの計算
-        self.business_model.calculate_repair_costs(repaired_products, year)
+                self._transfer(product, step)
+        if cohort_mode:
+            for cohort in self.release_queue.slots():
+                if cohort is None:
+                    continue
+                for product in list(cohort.products):
+                    if product.matched:
+                        failures_sampled += 1
+                        repaired_products.extend(self._sample_cohort_failures(cohort, product))
+        self.products_scanned += len(products)
+        self.failures_sampled += failures_sampled
+
+        # 在庫の製品のうち、年齢が寿命に達した同値類の製品を廃棄
+        logger.debug("---Updating inventory status---")
+        for product_category in self.product_categories:
+            expired = product_category.inventory.expired(step)
+            self.products_scanned += len(expired)
+            for product in expired:
+                product.advance_to(step)
+                product.dispose()
+                if debug:
+                    logger.debug(f"Product {product.name}: disposed due to exceeding lifetime")
 
-        # 利益の計算
-        self.business_model.calculate_profit(year)
+        # 当ステップに解放されて在庫に入った製品の移管処理
+        for product in released_products:
+            self._transfer(product, step)
 
-        # 製品カテゴリの更新
-        for product_category in self.product_categories:
-            product_category.remove_all()
-
-        logger.debug("---Calculating business model revenues---")
-        logger.debug(f"Revenue: {self.business_model.revenue_history[year]}")
-        logger.debug(f"Product cost: {self.business_model.product_cost_history[year]}")
-        logger.debug(f"Repair cost: {self.business_model.repair_cost_history[year]}")
-        logger.debug(f"Profit: {self.business_model.profit_history[year]}")
-        # ビジネスモデルから履歴データを取得
-        revenue_history = dict(self.business_model.revenue_history[year])
-        product_cost_history = dict(self.business_model.product_cost_history[year])
-        repair_cost_history = dict(self.business_model.repair_cost_history[year])
-        profit_history = dict(self.business_model.profit_history[year])
-        # マッチングの履歴データを取得
-        matches_history = dict(self.matching.get_matches_history())
-
-        # マテリアフローの履歴データを取得
-        material_flow_all = pd.DataFrame(columns=["source", "target", "value"])
-        for product in self.products:
-            material_flow_all = pd.concat([material_flow_all, product.get_material_flow_history()], ignore_index=True)
-        material_flow_all = material_flow_all.groupby(["source", "target"]).sum().reset_index()
-        
-        # 財務フローの履歴データを取得
-        financial_flow_all = self.business_model.get_financial_flow_history().groupby(["source", "target"]).sum().reset_index()
-
-        # 結果の生成
-        result = {
-            'revenue_history': revenue_history,
-            'product_cost_history': product_cost_history,
-            'repair_cost_history': repair_cost_history,
-            'profit_history': profit_history,
-            'matches_history': matches_history,
-            'material_flow_history': material_flow_all,
-            'financial_flow_history': financial_flow_all
-        }
-        
-        return pd.DataFrame([result])
+        return repaired_products
+
+    def _sample_cohort_failures(self, cohort: ConsumerCohort, product: Product) -> List[Product]:
+        """
+        コホートが使用中のまとめた製品の故障を二項分布で判定し、修理または廃棄する
+
+        修理した製品は状態が元に戻るため、故障した数の一時的な製品（Product.portion）でフローと
+        コストのみを記録する。残存寿命がなく廃棄する製品は、故障した数を分割してコホートに残す。
+
+        Args:
+            cohort: 製品を使用中のコホート
+            product: まとめた製品
+        Returns:
+            List[Product]: 修理した製品（修理コストの計算用）
+        """
+        failures = np.random.binomial(product.count, product.failure_probability)
+        if failures == 0 or product.provider is None:
+            return []
+        if failures == product.count:
+            failed = product
+        elif product.calculate_remaining_lifetime() > 0:
+            failed = product.portion(failures)
+        else:
+            failed = self._split_product(product, failures)
+            cohort.products.append(failed)
+        failed.fail()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"{failures} of product {product.name} malfunctioned")
+        failed.provider.repair_product(failed)
+        return [] if failed.malfunction else [failed]
+
+    def _transfer(self, product: Product, step: int) -> None:
+        """
+        未マッチの製品を返却先のプロバイダーに移管
+
+        Args:
+            product: 製品
+            step: ステップ
+        """
+        if product.next_provider == "paas_provider":
+            product.add_provider(step+1, self.paas_provider)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Product {product.name} is transferred to {self.paas_provider.name}")
+
+    def _process_events(self, step: int) -> List[Product]:
+        """
+        イベント方式で当ステップの解放・廃棄・故障のイベントのみを処理
+
+        Args:
+            step: ステップ
+        Returns:
+            List[Product]: 修理した製品
+        """
+        logger.debug("---Processing events---")
+        repaired_products, released_products = self.event_engine.process(step)
+
+        # 解放された製品の移管処理
+        for product in released_products:
+            self._transfer(product, step)
+        return repaired_products
 
-def create_circular_ecosystem(circular_ecosystem_type: CircularEcosystemType) -> CircularEcosystem:
+def create_circular_ecosystem(circular_ecosystem_type: CircularEcosystemType) -> CircularEcosystemBase:
     """
     サーキュラーエコシステムファクトリー関数
     
     Args:
         circular_ecosystem_type: エコシステムの種類
     Returns:
-        CircularEcosystem: 指定された種類のエコシステムインスタンス
+        CircularEcosystemBase: 指定された種類のエコシステムインスタンス
     """
     circular_ecosystem_map = {
         CircularEcosystemType.ALL: CircularEcosystem,
@@ -0,0 +1,337 @@
+import json
+from dataclasses import asdict
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Dict, Generic, Optional, Sequence, Tuple, TypeVar
+import numpy as np
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator, model_validator
+from config.config import Config
+from circular_ecosystem import CircularEcosystemType
+from event_engine import EngineMode
+from enablers.time_resolution import TimeResolution
+from enablers.business_model import BusinessModelType
+from preference import PART_WORTH_KEYS
+from stakeholders.consumer import ConsumerType
+from stakeholders.consumer_cohort import ConsumerMode
+from stakeholders.manufacturer import ManufacturerType
+from stakeholders.paas_provider import PaasProviderType
+from stakeholders.reuse_provider import ReuseProviderType
+from stakeholders.remanufacturer import RemanufacturerType
+from stakeholders.recycler import RecyclerType
+from stakeholders.provider import PRODUCT_ATTRIBUTE_KEYS
+
+class _Frozen(BaseModel):
+    """
+    検証後に変更できない設定の基底クラス（未知のキーはエラーにする）
+
+    フィールドから導出する値はcached_propertyで初回の参照時に1度だけ計算する
+    （以降はインスタンス辞書の参照のみ）。
+    """
+    model_config = ConfigDict(frozen=True, extra="forbid", ignored_types=(cached_property,))
+
+class PreferenceSettings(_Frozen):
+    """消費者の部分効用値の分布（属性ごとの平均と標準偏差）"""
+    ownership_part_worth_mean: float
+    ownership_part_worth_sd: float = Field(ge=0)
+    subscription_part_worth_mean: float
+    subscription_part_worth_sd: float = Field(ge=0)
+    reuse_part_worth_mean: float
+    reuse_part_worth_sd: float = Field(ge=0)
+    remanufacture_part_worth_mean: float
+    remanufacture_part_worth_sd: float = Field(ge=0)
+    price_part_worth_mean: float
+    price_part_worth_sd: float = Field(ge=0)
+    spec_part_worth_mean: float
+    spec_part_worth_sd: float = Field(ge=0)
+    size_part_worth_mean: float = 0.0  # 効用値の計算には未使用
+    size_part_worth_sd: float = Field(default=0.0, ge=0)
+
+    @cached_property
+    def part_worth_params(self) -> Tuple[Tuple[float, float], ...]:
+        """部分効用値の平均と標準偏差の組（PART_WORTH_KEYSの順、消費者ごとのサンプリング用）"""
+        return tuple(
+            (getattr(self, f"{key}_part_worth_mean"), getattr(self, f"{key}_part_worth_sd"))
+            for key in PART_WORTH_KEYS
+        )
+
+    @cached_property
+    def means(self) -> np.ndarray:
+        """部分効用値の平均（PART_WORTH_KEYSの順、読み取り専用、まとめてサンプリングする場合に使用）"""
+        return _read_only(np.array([mean for mean, _ in self.part_worth_params]))
+
+    @cached_property
+    def sds(self) -> np.ndarray:
+        """部分効用値の標準偏差（PART_WORTH_KEYSの順、読み取り専用、まとめてサンプリングする場合に使用）"""
+        return _read_only(np.array([sd for _, sd in self.part_worth_params]))
+
+class ConsumerSettings(_Frozen):
+    """消費者の種類ごとの属性"""
+    type: str = "STANDARD"
+    plan_of_use_shape: float = Field(gt=0)
+    plan_of_use_scale: float = Field(gt=0)
+    num_of_players: int = Field(ge=0)
+    churn_rate: float = Field(ge=0, le=1)
+    reuse_probability: float = Field(ge=0, le=1)
+    num_of_products_mean: float
+    num_of_products_sd: float = Field(ge=0)
+    pref_dict: PreferenceSettings
+
+    @field_validator("type")
+    @classmethod
+    def _check_type(cls, value: str) -> str:
+        if value not in ConsumerType.__members__:
+            raise ValueError(f"不明な消費者の種類です: {value}")
+        return value
+
+    @cached_property
+    def consumer_type(self) -> ConsumerType:
+        """消費者の種類"""
+        return ConsumerType[self.type]
+
+class ProductSettings(_Frozen):
+    """製品の種類ごとの属性"""
+    size: float
+    price: float = Field(ge=0)
+    base_of_new_products: float
+    base_price: float
+    price_discout_rate_by_generation: float
+    lifetime: float = Field(gt=0)
+    base_production_cost: float
+    production_cost_discout_rate_by_generation: float
+    transport_cost: float
+    refurbish_cost: float
+    repair_cost: float
+    disporsal_cost: float
+    production_co2: float
+    transport_co2: float
+    use_co2: float
+    refurbish_co2: float
+    disporsal_co2: float
+    weibull_alpha: float = Field(gt=0)
+    weibull_beta: float = Field(gt=0)
+    repairable_year: float
+    price_dict: Dict[str, float]
+
+    @cached_property
+    def creation_attributes(self) -> Dict[str, float]:
+        """製品の生成に使用する属性（PRODUCT_ATTRIBUTE_KEYS、複製して使用し変更しない）"""
+        return {key: getattr(self, key) for key in PRODUCT_ATTRIBUTE_KEYS}
+
+class ManufacturerAttributes(_Frozen):
+    """メーカーの属性"""
+    base_price: float
+    production_volume: float
+    production_cost: float
+    repair_cost: float
+    base_production_volume: int = Field(default=0, ge=0)
+
+class PaasProviderAttributes(_Frozen):
+    """PaaSプロバイダーの属性"""
+    base_price: float
+    production_volume: float
+    procurement_cost: float
+    repair_cost: float
+    base_production_volume: int = Field(default=0, ge=0)
+
+class ReuseProviderAttributes(_Frozen):
+    """リユースプロバイダーの属性"""
+    base_price: float
+    reuse_cost: float
+    repair_cost: float
+
+class RemanufacturerAttributes(_Frozen):
+    """リマニュファクチャラーの属性"""
+    base_price: float
+    remanufacturing_cost: float
+
+class RecyclerAttributes(_Frozen):
+    """リサイクラーの属性"""
+    base_price: float
+    recycling_cost: float
+    repair_cost: float
+
+A = TypeVar("A", bound=_Frozen)
+S = TypeVar("S", bound=BaseModel)
+
+class ProviderSettings(_Frozen, Generic[A]):
+    """プロバイダーの種類と属性"""
+    type: str = "STANDARD"
+    attributes: A
+
+# プロバイダー名と種類の列挙型の対応
+PROVIDER_TYPE_MAP = {
+    "paas_provider": PaasProviderType,
+    "reuse_provider": ReuseProviderType,
+    "manufacturer": ManufacturerType,
+    "remanufacturer": RemanufacturerType,
+    "recycler": RecyclerType,
+}
+
+class EcosystemSettings(_Frozen):
+    """エコシステムを構成するプロバイダーの設定（フィールドの順が製品カテゴリの順）"""
+    paas_provider: Optional[ProviderSettings[PaasProviderAttributes]] = None
+    reuse_provider: Optional[ProviderSettings[ReuseProviderAttributes]] = None
+    manufacturer: Optional[ProviderSettings[ManufacturerAttributes]] = None
+    remanufacturer: Optional[ProviderSettings[RemanufacturerAttributes]] = None
+    recycler: Optional[ProviderSettings[RecyclerAttributes]] = None
+
+    @model_validator(mode="after")
+    def _check_types(self) -> 'EcosystemSettings':
+        for name, settings in self.configured().items():
+            if settings.type not in PROVIDER_TYPE_MAP[name].__members__:
+                raise ValueError(f"不明なプロバイダーの種類です: {name}.type={settings.type}")
+        return self
+
+    def configured(self) -> Dict[str, ProviderSettings]:
+        """設定されているプロバイダー名をキーとした設定"""
+        return {
+            name: getattr(self, name) for name in PROVIDER_TYPE_MAP if getattr(self, name) is not None
+        }
+
+    def __contains__(self, name: str) -> bool:
+        """プロバイダーが設定されているか"""
+        return name in PROVIDER_TYPE_MAP and getattr(self, name) is not None
+
+class PolicySettings(_Frozen):
+    """制度のパラメータ"""
+    carbon_tax_rate: float = 0.0
+    subsidy_rate: float = 0.0
+    deposit_amount: float = 0.0
+    epr_fee: float = 0.0
+    repair_cost_reduction: float = 0.0
+
+class BusinessModelAttributes(_Frozen):
+    """ビジネスモデルの属性"""
+    revenue_share: Optional[float] = Field(default=None, ge=0, le=1)
+    financial_flow_retention: Optional[int] = Field(default=None, ge=0)
+
+class BusinessModelSettings(_Frozen):
+    """ビジネスモデルの種類と属性"""
+    business_model_type: BusinessModelType
+    attributes: BusinessModelAttributes = BusinessModelAttributes()
+
+    @field_validator("business_model_type", mode="before")
+    @classmethod
+    def _parse_type(cls, value: Any) -> Any:
+        if isinstance(value, str):
+            # アンダースコアを削除して大文字に変換（revenue_sharing -> REVENUESHARING）
+            key = value.replace("_", "").upper()
+            if key not in BusinessModelType.__members__:
+                raise ValueError(f"不明なビジネスモデルの種類です: {value}")
+            return BusinessModelType[key]
+        return value
+
+    @model_validator(mode="after")
+    def _check_attributes(self) -> 'BusinessModelSettings':
+        if self.business_model_type == BusinessModelType.REVENUESHARING and self.attributes.revenue_share is None:
+            raise ValueError("収益分配型のビジネスモデルには revenue_share を指定してください")
+        return self
+
+# エコシステムの種類ごとに必要なプロバイダー
+REQUIRED_PROVIDERS = {
+    CircularEcosystemType.ALL: tuple(PROVIDER_TYPE_MAP),
+    CircularEcosystemType.REVENUE_SHARE: ("paas_provider", "manufacturer"),
+}
+
+class CompiledConfig(_Frozen):
+    """
+    検証済みの変更できない実行設定
+
+    設定ファイルの読み込み時に1度だけ検証し、種類名を列挙型に変換する。部分効用値の分布は
+    サンプリング用の平均と標準偏差の組・NumPy配列として参照できる。エコシステムは文字列キーの
+    辞書の代わりにこの設定の型付きの属性を参照する。
+    """
+    name: str
+    entity: CircularEcosystemType
+    group: str
+    num_of_simulation: int = Field(ge=1)
+    num_of_run: int = Field(ge=1)
+    consumer_attributes: Dict[str, ConsumerSettings]
+    product_attributes: Dict[str, ProductSettings]
+    ecosystem_settings: EcosystemSettings
+    policy_settings: Optional[PolicySettings] = None
+    business_model_settings: BusinessModelSettings
+    engine_mode: EngineMode = EngineMode.YEARLY
+    time_resolution: TimeResolution = TimeResolution.YEARLY
+    consumer_mode: ConsumerMode = ConsumerMode.INDIVIDUAL
+    agent_weight: int = Field(default=1, ge=1)
+
+    @model_validator(mode="after")
+    def _check_providers(self) -> 'CompiledConfig':
+        missing = [name for name in REQUIRED_PROVIDERS[self.entity] if name not in self.ecosystem_settings]
+        if missing:
+            raise ValueError(f"エコシステム {self.entity.value} に必要なプロバイダーの設定がありません: {missing}")
+        return self
+
+    @model_validator(mode="after")
+    def _check_agent_weight(self) -> 'CompiledConfig':
+        # 重みで割り切れない人数・生産量は、エージェント数に丸めると実際の規模からずれるため拒否する
+        volumes = {f"consumer_attributes.{name}.num_of_players": attribute.num_of_players
+                   for name, attribute in self.consumer_attributes.items()}
+        volumes.update({
+            f"ecosystem_settings.{name}.attributes.base_production_volume": settings.attributes.base_production_volume
+            for name, settings in self.ecosystem_settings.configured().items()
+            if hasattr(settings.attributes, "base_production_volume")
+        })
+        indivisible = [f"{key}={volume}" for key, volume in volumes.items() if volume % self.agent_weight != 0]
+        if indivisible:
+            raise ValueError(f"人数・生産量がエージェントの重み {self.agent_weight} で割り切れません: {indivisible}")
+        return self
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    """配列を読み取り専用にする"""
+    array.flags.writeable = False
+    return array
+
+def compile_config(config: Config) -> CompiledConfig:
+    """
+    設定を検証し、変更できない型付きの設定に変換
+
+    Args:
+        config: 設定ファイルの内容
+    Returns:
+        CompiledConfig: 検証済みの設定
+    Raises:
+        ValueError: 設定が不正な場合（pydantic.ValidationErrorを含む）
+    """
+    return CompiledConfig.model_validate(asdict(config))
+
+def load_config(config_file: Path) -> CompiledConfig:
+    """
+    設定ファイルを読み込んで検証
+
+    Args:
+        config_file: 設定ファイルのパス
+    Returns:
+        CompiledConfig: 検証済みの設定
+    Raises:
+        ValueError: 設定が不正な場合
+    """
+    with open(config_file, encoding="utf-8") as f:
+        setting_json = json.load(f)
+    try:
+        return compile_config(Config(**setting_json))
+    except (TypeError, ValidationError) as e:
+        raise ValueError(f"設定ファイルが不正です: {config_file}\n{e}") from e
+
+def replace_setting(settings: S, path: Sequence[str], value: Any) -> S:
+    """
+    設定の1つの値を変更した新しい設定を生成（変更後の設定も検証する）
+
+    Args:
+        settings: 変更前の設定
+        path: 変更する値のキーのパス（例: ("pref_dict", "price_part_worth_mean")）
+        value: 変更後の値
+    Returns:
+        変更後の設定（変更前の設定は変更しない）
+    """
+    data = settings.model_dump()
+    target = data
+    for key in path[:-1]:
+        if not isinstance(target, dict) or key not in target:
+            raise ValueError(f"不明なパラメータです: {'.'.join(path)}")
+        target = target[key]
+    if not isinstance(target, dict) or path[-1] not in target:
+        raise ValueError(f"不明なパラメータです: {'.'.join(path)}")
+    target[path[-1]] = value
+    return type(settings).model_validate(data)
@@ -12,4 +12,8 @@ class Config:
     product_attributes: Dict[str, Union[str, float, Dict]]
     ecosystem_settings: Dict[str, Dict[str, Union[str, Dict[str, Union[str, float]]]]]
     policy_settings: Dict[str, float]
-    business_model_settings: Dict[str, Dict]
\ No newline at end of file
+    business_model_settings: Dict[str, Dict]
+    engine_mode: str = "yearly"
+    time_resolution: str = "yearly"
+    consumer_mode: str = "individual"
+    agent_weight: int = 1
@@ -8,7 +8,10 @@ from stakeholders.paas_provider import PaasProvider
 from stakeholders.remanufacturer import Remanufacturer
 from stakeholders.recycler import Recycler
 from enablers.product import Product
-from collections import defaultdict
+from enablers.financial_flow_ledger import FinancialFlowLedger
+from enablers.subscription_ledger import SubscriptionLedger
+from enablers.metric_ledger import MetricLedger
+from enablers.time_resolution import StepClock
 import pandas as pd
 logger = logging.getLogger(__name__)
 
@@ -20,29 +23,28 @@ class BusinessModelType(Enum):
 class BusinessModel:
     """ビジネスモデル基底クラス"""
     
-    def __init__(self, attributes: Dict = None):
+    def __init__(self, attributes: Dict = None, clock: StepClock = None, weight: int = 1):
         """
         ビジネスモデルの初期化
         
         Args:
             attributes: ビジネスモデルの属性を含む辞書（オプション）
+                financial_flow_retention: 保持する直近の財務取引の件数（省略時は保持しない）
+            clock: ステップと年の換算（省略時は1年1ステップ）
+            weight: 1エージェントが表す実際の消費者数・製品数（台帳への記録時に乗じる）
         """
         self.attributes = attributes or {}
+        self.clock = clock or StepClock()
+        self.weight = weight
         self.PROVIDER_TYPES = ['manufacturer', 'paas_provider', 'reuse_provider', 'remanufacturer', 'recycler']
         self._reset_revenues()
         self._reset_product_costs()
         self._reset_repair_costs()
-        self._init_history()
-        self.financial_flow_data = []
+        # 年×プロバイダー×指標（収益、製品コスト、修理コスト、利益）の台帳
+        self.metrics = MetricLedger(self.PROVIDER_TYPES)
+        # 財務フローの台帳（financial_flow_retentionを指定した場合は直近の取引も保持）
+        self.financial_flow_ledger = FinancialFlowLedger(self.attributes.get("financial_flow_retention"))
     
-    def _init_history(self) -> None:
-        """履歴データの初期化"""
-        # defaultdictを使用して、年次データの自動初期化
-        self.revenue_history = defaultdict(lambda: {provider: 0.0 for provider in self.PROVIDER_TYPES})
-        self.product_cost_history = defaultdict(lambda: {provider: 0.0 for provider in self.PROVIDER_TYPES})
-        self.repair_cost_history = defaultdict(lambda: {provider: 0.0 for provider in self.PROVIDER_TYPES})
-        self.profit_history = defaultdict(lambda: {provider: 0.0 for provider in self.PROVIDER_TYPES})
-
     def calculate_revenues(self, matches: Dict) -> None:
         """収益計算（サブクラスで実装）"""
         raise NotImplementedError
@@ -59,86 +61,88 @@ class BusinessModel:
         """修理コストの初期化"""
         self.repair_costs = {provider: 0.0 for provider in self.PROVIDER_TYPES}
         
-    def record_financial_flow(self, source: str, target: str, value: float) -> None:
-        """財務フローの記録"""
-        self.financial_flow_data.append({'source': source, 'target': target, 'value': value})
+    def record_financial_flow(self, year: int, source: str, target: str, value: float) -> None:
+        """財務フローの記録（エージェントの重みを乗じて実際の規模に換算）"""
+        self.financial_flow_ledger.record(year, source, target, value * self.weight)
+
+    def record_metric(self, year: int, metric: str, values: Dict[str, float]) -> None:
+        """
+        プロバイダー別の指標を台帳に加算（エージェントの重みを乗じて実際の規模に換算）
+
+        Args:
+            year: 年
+            metric: 指標名
+            values: プロバイダーごとの値
+        """
+        self.metrics.add(year, metric, {provider: value * self.weight for provider, value in values.items()})
 
     def get_financial_flow_history(self) -> pd.DataFrame:
-        """財務フローの履歴データを取得"""
-        self.financial_flow = pd.DataFrame(self.financial_flow_data) 
-        return self.financial_flow
+        """財務フローの累積データを取得"""
+        return self.financial_flow_ledger.cumulative_frame()
 
 class StandardBusinessModel(BusinessModel):
     """従来型ビジネスモデル"""
     
-    def __init__(self, attributes: Dict = None):
+    def __init__(self, attributes: Dict = None, clock: StepClock = None, weight: int = 1):
         """
         標準的なビジネスモデルの初期化
         
         Args:
             attributes: ビジネスモデルの属性を含む辞書（オプション）
+            clock: ステップと年の換算
+            weight: 1エージェントが表す実際の消費者数・製品数
         """
-        super().__init__(attributes)
-        self.paas_customers = {}  # PaaSの顧客管理を追加
+        super().__init__(attributes, clock, weight)
+        self.subscriptions = SubscriptionLedger()  # PaaSの契約管理
 
-    def calculate_revenues(self, matches: Dict, year: int) -> None:
+    def calculate_revenues(self, matches: Dict, step: int) -> None:
         """
-        各ステークホルダーの売上を計算
+        各ステークホルダーの売上を計算し、ステップが属する年に加算
         """
+        year = self.clock.year_of(step)
         # 売上の初期化
         self._reset_revenues()
 
         # 各プロバイダーの収益を計算
         for consumer, product in matches.items():
-            price = consumer.matched_price
+            price = consumer.matched_price * consumer.count  # コホートはメンバー数分
             provider = product.provider
 
             if isinstance(provider, Manufacturer):
                 self.revenues['manufacturer'] += price
-                self.record_financial_flow('consumer', 'manufacturer', price)
+                self.record_financial_flow(year, 'consumer', 'manufacturer', price)
             elif isinstance(provider, ReuseProvider):
                 self.revenues['reuse_provider'] += price
-                self.record_financial_flow('consumer', 'reuse_provider', price)
+                self.record_financial_flow(year, 'consumer', 'reuse_provider', price)
             elif isinstance(provider, PaasProvider):
-                # PaaS顧客として登録
-                self.paas_customers[consumer] = {
-                    'remaining_period': consumer.plan_of_use_period,
-                    'price': consumer.matched_price
-                }          
+                # PaaS契約として登録
+                self.subscriptions.subscribe(step, self.clock.per_step_amount(consumer.matched_price) * consumer.count,
+                                             consumer.plan_of_use_period)
             elif isinstance(provider, Remanufacturer):
                 self.revenues['remanufacturer'] += price
-                self.record_financial_flow('consumer', 'remanufacturer', price)
+                self.record_financial_flow(year, 'consumer', 'remanufacturer', price)
             elif isinstance(provider, Recycler):
                 self.revenues['recycler'] += price
-                self.record_financial_flow('consumer', 'recycler', price)
+                self.record_financial_flow(year, 'consumer', 'recycler', price)
             else:
                 raise ValueError(f"不明なプロバイダータイプです: {type(provider)}")
             
-        # 既存PaaS顧客からの月額収益を計算
-        paas_customers_to_remove = []
-        
-        for consumer, info in self.paas_customers.items():
-            if info['remaining_period'] > 0:
-                self.revenues['paas_provider'] += info['price']
-                self.record_financial_flow('consumer', 'paas_provider', info['price'])
-                info['remaining_period'] -= 1
-            
-            if info['remaining_period'] <= 0:
-                paas_customers_to_remove.append(consumer)
-        
-        # 契約期間が終了した顧客を削除
-        for consumer in paas_customers_to_remove:
-            del self.paas_customers[consumer]
+        # 有効なPaaS契約からの収益を計算（満了した契約は解除される）
+        if len(self.subscriptions) > 0:
+            paas_revenue = self.subscriptions.bill(step)
+            self.revenues['paas_provider'] += paas_revenue
+            self.record_financial_flow(year, 'consumer', 'paas_provider', paas_revenue)
         
         # 履歴データの更新
-        for provider in self.PROVIDER_TYPES:
-            self.revenue_history[year][provider] = self.revenues[provider]
+        self.record_metric(year, 'revenue', self.revenues)
         
         # ログ出力
-        logger.debug(f"Revenue history: {self.revenue_history[year]}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Revenue history: {self.metrics.metric_values(year, 'revenue')}")
 
-    def calculate_product_costs(self, products: List[Product], year: int) -> None:
-        """製品のコスト計算"""
+    def calculate_product_costs(self, products: List[Product], step: int) -> None:
+        """製品のコスト計算（ステップが属する年に加算）"""
+        year = self.clock.year_of(step)
 
         # 製品のコストの初期化
         self._reset_product_costs()
@@ -146,20 +150,20 @@ class StandardBusinessModel(BusinessModel):
         for product in products:
             provider = product.provider
             if isinstance(product.provider, Manufacturer):
-                self.product_costs['manufacturer'] += provider.production_cost
+                self.product_costs['manufacturer'] += provider.production_cost * product.count
             elif isinstance(product.provider, ReuseProvider):
-                self.product_costs['reuse_provider'] += provider.reuse_cost
+                self.product_costs['reuse_provider'] += provider.reuse_cost * product.count
             elif isinstance(product.provider, PaasProvider):
-                self.product_costs['paas_provider'] += provider.procurement_cost
+                self.product_costs['paas_provider'] += provider.procurement_cost * product.count
             else:
                 raise ValueError(f"不明なプロバイダータイプです: {type(product.provider)}")
         
         # 履歴データの更新
-        for provider in self.PROVIDER_TYPES:
-            self.product_cost_history[year][provider] = self.product_costs[provider]
+        self.record_metric(year, 'product_cost', self.product_costs)
             
-    def calculate_repair_costs(self, products: List[Product], year: int) -> None:
-        """修理コストの計算"""
+    def calculate_repair_costs(self, products: List[Product], step: int) -> None:
+        """修理コストの計算（ステップが属する年に加算）"""
+        year = self.clock.year_of(step)
 
         # 修理コストの初期化
         self._reset_repair_costs()
@@ -167,89 +171,79 @@ class StandardBusinessModel(BusinessModel):
         for product in products:
             provider = product.provider
             if isinstance(provider, ReuseProvider):
-                self.repair_costs['reuse_provider'] += provider.repair_cost
+                self.repair_costs['reuse_provider'] += provider.repair_cost * product.count
             elif isinstance(provider, Manufacturer):
-                self.repair_costs['manufacturer'] += provider.repair_cost
+                self.repair_costs['manufacturer'] += provider.repair_cost * product.count
             elif isinstance(provider, PaasProvider):
-                self.repair_costs['paas_provider'] += provider.repair_cost
+                self.repair_costs['paas_provider'] += provider.repair_cost * product.count
             else:
                 raise ValueError(f"修理コストを計算できないプロバイダータイプです: {type(provider)}")
         
         # 履歴データの更新
-        for provider in self.PROVIDER_TYPES:
-            self.repair_cost_history[year][provider] = self.repair_costs[provider]
+        self.record_metric(year, 'repair_cost', self.repair_costs)
 
     def calculate_profit(self, year: int) -> None:
         """利益の計算"""
-        for provider in self.PROVIDER_TYPES:
-            self.profit_history[year][provider] = self.revenue_history[year][provider] - self.product_cost_history[year][provider] - self.repair_cost_history[year][provider]
+        self.metrics.calculate_profit(year)
     
 class RevenueSharingBusinessModel(BusinessModel):
     """収益分配型ビジネスモデル"""
     
-    def __init__(self, attributes: Dict):
+    def __init__(self, attributes: Dict, clock: StepClock = None, weight: int = 1):
         """
         収益共有ビジネスモデルの初期化
         
         Args:
             attributes: ビジネスモデルの属性を含む辞書
                 revenue_share: 収益共有率
+            clock: ステップと年の換算
+            weight: 1エージェントが表す実際の消費者数・製品数
         """
-        super().__init__(attributes)
-        self.paas_customers = {}  # PaaSの顧客管理を追加
+        super().__init__(attributes, clock, weight)
+        self.subscriptions = SubscriptionLedger()  # PaaSの契約管理
         self.revenue_share = float(attributes["revenue_share"])
     
-    def calculate_revenues(self, matches: Dict, year: int) -> None:
+    def calculate_revenues(self, matches: Dict, step: int) -> None:
         """
-        各ステークホルダーの売上を計算
+        各ステークホルダーの売上を計算し、ステップが属する年に加算
         """
+        year = self.clock.year_of(step)
         # 売上の初期化
         self._reset_revenues()
 
         # 各プロバイダーの収益を計算
         for consumer, product_category in matches.items():
-            price = consumer.matched_price
+            price = consumer.matched_price * consumer.count  # コホートはメンバー数分
             provider = product_category.provider
 
             if isinstance(provider, Manufacturer):
                 self.revenues['manufacturer'] += price
-                self.record_financial_flow('consumer', 'manufacturer', price)
+                self.record_financial_flow(year, 'consumer', 'manufacturer', price)
             elif isinstance(provider, PaasProvider):
-                # PaaS顧客として登録
-                self.paas_customers[consumer] = {
-                    'remaining_period': consumer.plan_of_use_period,
-                    'price': consumer.matched_price
-                }          
+                # PaaS契約として登録
+                self.subscriptions.subscribe(step, self.clock.per_step_amount(consumer.matched_price) * consumer.count,
+                                             consumer.plan_of_use_period)
             else:
                 raise ValueError(f"不明なプロバイダータイプです: {type(provider)}")
             
-        # 既存PaaS顧客からの月額収益を計算
-        paas_customers_to_remove = []
-        
-        for consumer, info in self.paas_customers.items():
-            if info['remaining_period'] > 0:
-                self.revenues['paas_provider'] += info['price'] * (1 - self.revenue_share)
-                self.revenues['manufacturer'] += info['price'] * self.revenue_share
-                self.record_financial_flow('consumer', 'paas_provider', info['price'] * (1 - self.revenue_share))
-                self.record_financial_flow('paas_provider', 'manufacturer', info['price'] * self.revenue_share)
-                info['remaining_period'] -= 1
-            
-            if info['remaining_period'] <= 0:
-                paas_customers_to_remove.append(consumer)
-        
-        # 契約期間が終了した顧客を削除
-        for consumer in paas_customers_to_remove:
-            del self.paas_customers[consumer]
+        # 有効なPaaS契約からの収益を計算し、メーカーと分配（満了した契約は解除される）
+        if len(self.subscriptions) > 0:
+            paas_revenue = self.subscriptions.bill(step)
+            self.revenues['paas_provider'] += paas_revenue * (1 - self.revenue_share)
+            self.revenues['manufacturer'] += paas_revenue * self.revenue_share
+            self.record_financial_flow(year, 'consumer', 'paas_provider', paas_revenue * (1 - self.revenue_share))
+            self.record_financial_flow(year, 'paas_provider', 'manufacturer', paas_revenue * self.revenue_share)
         
         # 履歴データの更新
-        for provider in self.PROVIDER_TYPES:
-            self.revenue_history[year][provider] = self.revenues[provider]
+        self.record_metric(year, 'revenue', self.revenues)
         
         # ログ出力
-        logger.debug(f"Revenue history: {self.revenue_history[year]}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Revenue history: {self.metrics.metric_values(year, 'revenue')}")
 
-    def calculate_product_costs(self, products: List[Product], year: int) -> None:
-        """製品のコスト計算"""
+    def calculate_product_costs(self, products: List[Product], step: int) -> None:
+        """製品のコスト計算（ステップが属する年に加算）"""
+        year = self.clock.year_of(step)
 
         # 製品のコストの初期化
         self._reset_product_costs()
@@ -257,18 +251,18 @@ class RevenueSharingBusinessModel(BusinessModel):
         for product in products:
             provider = product.provider
             if isinstance(product.provider, Manufacturer):
-                self.product_costs['manufacturer'] += provider.production_cost
+                self.product_costs['manufacturer'] += provider.production_cost * product.count
             elif isinstance(product.provider, PaasProvider):
-                self.product_costs['manufacturer'] += provider.procurement_cost # PaaSプロバイダーのコストを製造業者に分配
+                self.product_costs['manufacturer'] += provider.procurement_cost * product.count # PaaSプロバイダーのコストを製造業者に分配
             else:
                 raise ValueError(f"不明なプロバイダータイプです: {type(product.provider)}")
         
         # 履歴データの更新
-        for provider in self.PROVIDER_TYPES:
-            self.product_cost_history[year][provider] = self.product_costs[provider]
+        self.record_metric(year, 'product_cost', self.product_costs)
             
-    def calculate_repair_costs(self, products: List[Product], year: int) -> None:
-        """修理コストの計算"""
+    def calculate_repair_costs(self, products: List[Product], step: int) -> None:
+        """修理コストの計算（ステップが属する年に加算）"""
+        year = self.clock.year_of(step)
 
         # 修理コストの初期化
         self._reset_repair_costs()
@@ -276,28 +270,28 @@ class RevenueSharingBusinessModel(BusinessModel):
         for product in products:
             provider = product.provider
             if isinstance(provider, Manufacturer):
-                self.repair_costs['manufacturer'] += provider.repair_cost
+                self.repair_costs['manufacturer'] += provider.repair_cost * product.count
             elif isinstance(provider, PaasProvider):
-                self.repair_costs['manufacturer'] += provider.repair_cost # PaaSプロバイダーの修理コストを製造業者に分配
+                self.repair_costs['manufacturer'] += provider.repair_cost * product.count # PaaSプロバイダーの修理コストを製造業者に分配
             else:
                 raise ValueError(f"修理コストを計算できないプロバイダータイプです: {type(provider)}")
         
         # 履歴データの更新
-        for provider in self.PROVIDER_TYPES:
-            self.repair_cost_history[year][provider] = self.repair_costs[provider]
+        self.record_metric(year, 'repair_cost', self.repair_costs)
 
     def calculate_profit(self, year: int) -> None:
         """利益の計算"""
-        for provider in self.PROVIDER_TYPES:
-            self.profit_history[year][provider] = self.revenue_history[year][provider] - self.product_cost_history[year][provider] - self.repair_cost_history[year][provider]
+        self.metrics.calculate_profit(year)
 
 def create_business_model(
     business_model_type: BusinessModelType,
-    attributes: Dict
+    attributes: Dict,
+    clock: StepClock = None,
+    weight: int = 1
 ) -> BusinessModel:
     """ビジネスモデルファクトリー関数"""
     business_model_map = {
         BusinessModelType.STANDARD: StandardBusinessModel,
         BusinessModelType.REVENUESHARING: RevenueSharingBusinessModel
     }
-    return business_model_map[business_model_type](attributes)
\ No newline at end of file
+    return business_model_map[business_model_type](attributes, clock, weight)
\ No newline at end of file
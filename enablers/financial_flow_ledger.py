@@ -0,0 +1,60 @@
+from collections import deque
+from typing import Deque, Optional, Tuple
+import numpy as np
+import pandas as pd
+from enablers.flow_matrix import FlowMatrices, FINANCIAL_NODES, matrix_to_frame
+
+class FinancialFlowLedger:
+    """
+    財務フローを増分で集計する台帳
+
+    (source, target) の組ごとに年次の合計（年×ノード×ノードの行列）と累積の合計を保持する。
+    個々の取引は、保持件数を指定した場合のみ直近の件数分だけ保持する。
+    """
+
+    def __init__(self, retention: Optional[int] = None):
+        """
+        Args:
+            retention: 保持する直近の取引の件数（Noneの場合は取引を保持しない）
+        """
+        if retention is not None and retention < 0:
+            raise ValueError(f"取引の保持件数は0以上である必要があります: {retention}")
+        self.yearly = FlowMatrices(FINANCIAL_NODES)
+        self.cumulative = np.zeros((len(FINANCIAL_NODES), len(FINANCIAL_NODES)), dtype=np.float64)
+        self.transactions: Optional[Deque[Tuple[int, str, str, float]]] = (
+            deque(maxlen=retention) if retention is not None else None
+        )
+        self.num_of_records = 0  # 記録した取引の累積数（計測用）
+
+    @property
+    def nodes(self):
+        """ノード名のリスト（行列のインデックス順）"""
+        return self.yearly.nodes
+
+    def record(self, year: int, source: str, target: str, value: float) -> None:
+        """
+        取引を記録
+
+        Args:
+            year: 年
+            source: 支払元のノード名
+            target: 支払先のノード名
+            value: 金額
+        """
+        self.yearly.add(year, source, target, value)
+        self.cumulative[self.yearly.index(source), self.yearly.index(target)] += value
+        self.num_of_records += 1
+        if self.transactions is not None:
+            self.transactions.append((year, source, target, value))
+
+    def year_frame(self, year: int) -> pd.DataFrame:
+        """指定年の財務フローを (source, target, value) のDataFrameとして取得"""
+        return self.yearly.to_frame(year)
+
+    def cumulative_frame(self) -> pd.DataFrame:
+        """累積の財務フローを (source, target, value) のDataFrameとして取得"""
+        return matrix_to_frame(self.cumulative, self.nodes)
+
+    def transactions_frame(self) -> pd.DataFrame:
+        """保持している直近の取引を (year, source, target, value) のDataFrameとして取得"""
+        return pd.DataFrame(list(self.transactions or []), columns=["year", "source", "target", "value"])
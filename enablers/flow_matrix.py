@@ -0,0 +1,88 @@
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+
+# マテリアルフローのノード（固定のノード順）
+MATERIAL_NODES = ["man", "pas", "reu", "consumer", "repair", "rec", "disposal"]
+# 財務フローのノード（固定のノード順）
+FINANCIAL_NODES = ["consumer", "paas_provider", "manufacturer", "reuse_provider", "remanufacturer", "recycler", "disposal"]
+
+class FlowMatrices:
+    """
+    年ごとのフローを 年×ノード×ノード の密行列として累積する
+
+    matrices[year, i, j] はその年にノードiからノードjへ移動した量の合計。
+    記録は配列要素の加算のみで行われ、年次の集計は行列の参照で済む。
+    """
+
+    def __init__(self, nodes: List[str], num_of_years: int = 1):
+        """
+        Args:
+            nodes: ノード名のリスト（行列のインデックス順）
+            num_of_years: 初期に確保する年数（不足した場合は拡張する）
+        """
+        self.nodes = list(nodes)
+        self.node_index: Dict[str, int] = {node: i for i, node in enumerate(self.nodes)}
+        self.matrices = np.zeros((max(num_of_years, 1), len(self.nodes), len(self.nodes)), dtype=np.float64)
+
+    def index(self, node: str) -> int:
+        """ノード名を行列のインデックスに変換"""
+        try:
+            return self.node_index[node]
+        except KeyError:
+            raise ValueError(f"不明なノードです: {node}") from None
+
+    def add(self, year: int, source: str, target: str, value: float = 1.0) -> None:
+        """
+        フローを加算
+
+        Args:
+            year: 年
+            source: 移動元のノード名
+            target: 移動先のノード名
+            value: 量
+        """
+        if year >= len(self.matrices):
+            self._grow(year + 1)
+        self.matrices[year, self.index(source), self.index(target)] += value
+
+    def _grow(self, num_of_years: int) -> None:
+        """年数を倍以上に拡張"""
+        grown = np.zeros((max(num_of_years, 2 * len(self.matrices)),) + self.matrices.shape[1:], dtype=np.float64)
+        grown[:len(self.matrices)] = self.matrices
+        self.matrices = grown
+
+    def year_matrix(self, year: int) -> np.ndarray:
+        """指定年のフロー行列を取得"""
+        if year >= len(self.matrices):
+            return np.zeros(self.matrices.shape[1:], dtype=np.float64)
+        return self.matrices[year]
+
+    def to_frame(self, year: int) -> pd.DataFrame:
+        """
+        指定年のフローを (source, target, value) のDataFrameとして取得
+
+        Args:
+            year: 年
+        Returns:
+            pd.DataFrame: 値が0でないフローの一覧
+        """
+        return matrix_to_frame(self.year_matrix(year), self.nodes)
+
+def matrix_to_frame(matrix: np.ndarray, nodes: List[str]) -> pd.DataFrame:
+    """
+    フロー行列の0でない要素を (source, target, value) のDataFrameに変換
+
+    Args:
+        matrix: ノード×ノードのフロー行列
+        nodes: ノード名のリスト（行列のインデックス順）
+    Returns:
+        pd.DataFrame: source, target, valueの列を持つフローの一覧
+    """
+    sources, targets = np.nonzero(matrix)
+    names = np.array(nodes, dtype=object)
+    return pd.DataFrame({
+        "source": names[sources],
+        "target": names[targets],
+        "value": matrix[sources, targets],
+    })
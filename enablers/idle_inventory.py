@@ -0,0 +1,194 @@
+import heapq
+from operator import attrgetter
+from typing import Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
+if TYPE_CHECKING:
+    from enablers.product import Product
+
+# 在庫の同値類のキー（製品の種類, 生成したステップ）
+ClassKey = Tuple[str, int]
+
+class ActiveProducts:
+    """
+    在庫の外にある（毎ステップ個別に状態を更新する）製品の集合
+
+    年次方式のエコシステムで使用する。在庫（IdleInventory）に入った製品は集合から外し、年齢の
+    更新を在庫から出るまで遅延させる（Product.advance_toによる遅延評価）。在庫から出た製品は
+    その時点までの年齢を反映してから集合に戻す。
+    """
+
+    def __init__(self):
+        self.step = 0  # 現在のステップ（エコシステムがステップの開始時に設定）
+        self._products: Dict['Product', None] = {}  # 製品をキーとする（複製してもキーが対応する）
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def add(self, product: 'Product') -> None:
+        """製品を集合に追加"""
+        self._products[product] = None
+
+    def activate(self, product: 'Product') -> None:
+        """在庫から出た製品の前ステップまでの年齢を反映し、集合に戻す"""
+        product.advance_to(self.step - 1)
+        product.stop_tracking()
+        self._products[product] = None
+
+    def deactivate(self, product: 'Product') -> None:
+        """在庫に入った製品を集合から外し、前ステップまで反映済みとして年齢の更新を遅延させる"""
+        self._products.pop(product, None)
+        product.start_tracking(self.step)
+
+    def ordered(self) -> List['Product']:
+        """製品ID（生成した順）に並べた製品（乱数の消費順を全製品を走査した場合と揃える）"""
+        return sorted(self._products, key=attrgetter("product_id"))
+
+    def load(self, products: List['Product']) -> None:
+        """
+        保存済みの状態から集合を再構築する（チェックポイントからの復元用、製品の状態は変更しない）
+
+        Args:
+            products: 在庫の外にある製品
+        """
+        self._products = dict.fromkeys(products)
+
+class IdleInventory:
+    """
+    プロバイダーの利用可能な（未使用の）製品の在庫
+
+    製品ID（生成した順）のヒープで保持してIDの小さい順に割り当てるとともに、種類と生成した
+    ステップが同じ製品を同値類にまとめる。割り当ての順序は全製品を生成した順に走査していた場合と
+    同じであるため、シードを固定した実行の結果は変わらない。在庫の製品は使用期間が0で、年齢は
+    生成したステップで決まるため、同じ同値類の製品はマッチングに対して交換可能である。
+    ActiveProductsと組み合わせた場合、在庫の製品は個別には走査せず、年齢の更新は割り当てなどで
+    在庫から出る際に行い、寿命による廃棄の判定は同値類ごとに1回行う（1ステップあたりO(同値類の数)）。
+    """
+
+    def __init__(self, active_products: Optional[ActiveProducts] = None):
+        """
+        Args:
+            active_products: 在庫の外にある製品の集合（省略時は在庫の製品の状態更新を遅延させない）
+        """
+        self.active_products = active_products
+        self._products: Dict[int, 'Product'] = {}  # 製品ID -> 製品
+        # 製品IDのヒープ（削除した製品のIDは取り出す際に読み飛ばす）
+        self._heap: List[int] = []
+        # 生成直後でIDが未割り当ての製品（次に在庫を参照する際にヒープに移す）
+        self._unnumbered: Dict['Product', None] = {}
+        self._classes: Dict[ClassKey, Dict['Product', None]] = {}
+
+    def __len__(self) -> int:
+        """在庫の製品数（まとめた製品は1つと数える）"""
+        return len(self._products) + len(self._unnumbered)
+
+    def __iter__(self) -> Iterator['Product']:
+        """製品IDの順に製品を走査"""
+        self._number()
+        return iter([self._products[product_id] for product_id in sorted(self._products)])
+
+    def __contains__(self, product: 'Product') -> bool:
+        return product in self._unnumbered or self._products.get(product.product_id) is product
+
+    @staticmethod
+    def class_key(product: 'Product') -> ClassKey:
+        """製品の同値類のキー"""
+        return product.kind, product.created_step
+
+    def add(self, product: 'Product') -> None:
+        """製品を在庫に追加（在庫にある場合は何もしない）"""
+        if product in self:
+            return
+        self._insert(product)
+        if self.active_products is not None:
+            self.active_products.deactivate(product)
+
+    def discard(self, product: 'Product') -> None:
+        """製品を在庫から削除（在庫にない場合は何もしない）"""
+        if self._unnumbered.pop(product, False) is False:
+            if self._products.get(product.product_id) is not product:
+                return
+            del self._products[product.product_id]
+        self._remove_from_class(product)
+        if self.active_products is not None:
+            self.active_products.activate(product)
+
+    def pop_first(self) -> 'Product':
+        """製品IDが最も小さい製品を在庫から取り出す"""
+        self._number()
+        heap = self._heap
+        while True:
+            product = self._products.pop(heapq.heappop(heap), None)
+            if product is not None:
+                break
+        if len(heap) > 2 * len(self._products) + 64:
+            self._compact()
+        self._remove_from_class(product)
+        if self.active_products is not None:
+            self.active_products.activate(product)
+        return product
+
+    def _insert(self, product: 'Product') -> None:
+        if product.product_id is None:
+            self._unnumbered[product] = None
+        else:
+            self._products[product.product_id] = product
+            heapq.heappush(self._heap, product.product_id)
+        self._classes.setdefault(self.class_key(product), {})[product] = None
+
+    def _number(self) -> None:
+        """IDが割り当てられた生成直後の製品をヒープに移す"""
+        if not self._unnumbered:
+            return
+        for product in self._unnumbered:
+            self._products[product.product_id] = product
+            heapq.heappush(self._heap, product.product_id)
+        self._unnumbered.clear()
+
+    def _compact(self) -> None:
+        """削除済みの製品をヒープから取り除く"""
+        self._heap = list(self._products)
+        heapq.heapify(self._heap)
+
+    def _remove_from_class(self, product: 'Product') -> None:
+        key = self.class_key(product)
+        members = self._classes[key]
+        del members[product]
+        if not members:
+            del self._classes[key]
+
+    def class_counts(self) -> Dict[ClassKey, int]:
+        """同値類ごとの製品数"""
+        return {key: len(members) for key, members in self._classes.items()}
+
+    def expired(self, step: int) -> List['Product']:
+        """
+        指定ステップの更新で年齢が寿命に達する在庫の製品（同値類ごとに代表の製品で判定）
+
+        Args:
+            step: ステップ
+        Returns:
+            List[Product]: 寿命に達する製品（在庫からは削除しない）
+        """
+        expired = []
+        for members in self._classes.values():
+            product = next(iter(members))
+            if product.age_at(step) >= product.lifetime:
+                expired.extend(members)
+        return expired
+
+    def clear(self) -> None:
+        """全ての製品を在庫から削除（製品の状態は変更しない）"""
+        self._products.clear()
+        self._heap.clear()
+        self._unnumbered.clear()
+        self._classes.clear()
+
+    def load(self, products: List['Product']) -> None:
+        """
+        保存済みの在庫を読み込む（チェックポイントからの復元用、製品の状態は変更しない）
+
+        Args:
+            products: 在庫の製品
+        """
+        self.clear()
+        for product in products:
+            self._insert(product)
@@ -0,0 +1,160 @@
+from typing import Dict, List, Optional, TYPE_CHECKING
+import numpy as np
+import pandas as pd
+from enablers.flow_matrix import FlowMatrices, MATERIAL_NODES
+from enablers.product_history_log import ProductHistoryLog
+if TYPE_CHECKING:
+    from enablers.product import Product
+
+class MaterialFlowLog:
+    """
+    エコシステム全体のマテリアルフローを記録する追記専用のイベントログ
+
+    製品ID・年・移動元ノード・移動先ノード・数量を、事前確保したNumPy配列に列ごとに格納する。
+    容量が不足した場合は倍に拡張するため、1件の記録は償却O(1)で行われる。
+    同時に年ごとのフロー行列（matrices）にも加算する。
+    """
+
+    def __init__(self, capacity: int = 1024):
+        """
+        Args:
+            capacity: 初期容量（イベント数）
+        """
+        self.matrices = FlowMatrices(MATERIAL_NODES)
+        self.history = ProductHistoryLog()  # 製品の使用者・提供者の履歴
+        self.year = 0  # 記録するイベントの年（エコシステムが年次サイクルの開始時に設定）
+        self.weight = 1  # 1製品オブジェクトが表す実際の製品数（イベントの既定の数量）
+        self.num_of_products = 0
+        self._size = 0
+        self._product_ids = np.empty(capacity, dtype=np.int64)
+        self._years = np.empty(capacity, dtype=np.int32)
+        self._sources = np.empty(capacity, dtype=np.int16)
+        self._targets = np.empty(capacity, dtype=np.int16)
+        self._counts = np.empty(capacity, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def register(self, product: 'Product') -> int:
+        """
+        製品にIDを割り当て、このログに記録するよう設定する
+
+        Args:
+            product: 登録する製品
+        Returns:
+            int: 割り当てた製品ID
+        """
+        if product.material_flow_log is self:
+            return product.product_id
+        product.product_id = self.num_of_products
+        product.material_flow_log = self
+        self.num_of_products += 1
+        return product.product_id
+
+    def register_batch(self, products: List['Product']) -> None:
+        """
+        生成した製品にまとめて連番のIDを割り当て、このログに記録するよう設定する
+
+        Args:
+            products: 登録する製品（登録済みの製品は除く）
+        """
+        products = [product for product in products if product.material_flow_log is not self]
+        for product_id, product in enumerate(products, start=self.num_of_products):
+            product.product_id = product_id
+            product.material_flow_log = self
+        self.num_of_products += len(products)
+
+    @property
+    def nodes(self) -> List[str]:
+        """ノード名のリスト（ノードコードの順）"""
+        return self.matrices.nodes
+
+    def append(self, product_id: int, source: str, target: str, count: Optional[int] = None) -> None:
+        """
+        イベントを記録
+
+        Args:
+            product_id: 製品ID
+            source: 移動元のノード名
+            target: 移動先のノード名
+            count: 数量（省略時は製品オブジェクトの重み）
+        """
+        if count is None:
+            count = self.weight
+        if self._size == len(self._product_ids):
+            self._grow()
+        i = self._size
+        source_code = self.matrices.index(source)
+        target_code = self.matrices.index(target)
+        self._product_ids[i] = product_id
+        self._years[i] = self.year
+        self._sources[i] = source_code
+        self._targets[i] = target_code
+        self._counts[i] = count
+        self._size += 1
+        self.matrices.add(self.year, source, target, count)
+
+    def _grow(self) -> None:
+        """容量を倍に拡張"""
+        capacity = max(2 * len(self._product_ids), 1)
+        for column in ("_product_ids", "_years", "_sources", "_targets", "_counts"):
+            array = getattr(self, column)
+            grown = np.empty(capacity, dtype=array.dtype)
+            grown[:self._size] = array[:self._size]
+            setattr(self, column, grown)
+
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        """記録済みのイベントの列（コピーではなくビュー）"""
+        return {
+            "product_id": self._product_ids[:self._size],
+            "year": self._years[:self._size],
+            "source": self._sources[:self._size],
+            "target": self._targets[:self._size],
+            "count": self._counts[:self._size],
+        }
+
+    def to_frame(self, start: int = 0, product_id: Optional[int] = None) -> pd.DataFrame:
+        """
+        イベントを (source, target, value) のDataFrameとして取得
+
+        Args:
+            start: 取得を開始するイベントの位置
+            product_id: 指定した場合、その製品のイベントのみを取得
+        Returns:
+            pd.DataFrame: ノード名に変換したイベント
+        """
+        columns = self.columns
+        mask = slice(start, None)
+        if product_id is not None:
+            mask = np.flatnonzero(columns["product_id"][start:] == product_id) + start
+        nodes = np.array(self.nodes, dtype=object)
+        return pd.DataFrame({
+            "source": nodes[columns["source"][mask]],
+            "target": nodes[columns["target"][mask]],
+            "value": columns["count"][mask],
+        })
+
+    def load(self, columns: Dict[str, np.ndarray], num_of_products: int) -> None:
+        """
+        保存済みのイベントを読み込み、フロー行列を再構築する（チェックポイントからの復元用）
+
+        Args:
+            columns: columnsプロパティと同じ形式の列
+            num_of_products: 登録済みの製品数
+        """
+        self.num_of_products = num_of_products
+        self._size = len(columns["product_id"])
+        capacity = max(self._size, 1024)
+        for column, key in (("_product_ids", "product_id"), ("_years", "year"), ("_sources", "source"),
+                            ("_targets", "target"), ("_counts", "count")):
+            array = np.empty(capacity, dtype=getattr(self, column).dtype)
+            array[:self._size] = columns[key]
+            setattr(self, column, array)
+
+        self.matrices = FlowMatrices(self.nodes, int(self._years[:self._size].max()) + 1 if self._size else 1)
+        np.add.at(
+            self.matrices.matrices,
+            (self._years[:self._size], self._sources[:self._size], self._targets[:self._size]),
+            self._counts[:self._size]
+        )
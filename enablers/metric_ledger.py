@@ -0,0 +1,138 @@
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+# プロバイダー軸の既定の順序
+PROVIDERS = ['manufacturer', 'paas_provider', 'reuse_provider', 'remanufacturer', 'recycler']
+# 指標軸の順序
+METRICS = ['revenue', 'product_cost', 'repair_cost', 'profit']
+
+class MetricLedger:
+    """
+    プロバイダー別のビジネス指標を 年×プロバイダー×指標 のNumPy配列で保持する台帳
+
+    axesの順に、values[year, provider, metric] で各値を参照する。
+    年・プロバイダー・指標ごとの切り出しはビューとして返す。
+    """
+
+    axes = ("year", "provider", "metric")
+
+    def __init__(self, providers: List[str] = PROVIDERS, num_of_years: int = 1):
+        """
+        Args:
+            providers: プロバイダー名のリスト（プロバイダー軸の順序）
+            num_of_years: 初期に確保する年数（不足した場合は拡張する）
+        """
+        self.providers = list(providers)
+        self.metrics = list(METRICS)
+        self.provider_index: Dict[str, int] = {provider: i for i, provider in enumerate(self.providers)}
+        self.metric_index: Dict[str, int] = {metric: i for i, metric in enumerate(self.metrics)}
+        self._values = np.zeros((max(num_of_years, 1), len(self.providers), len(self.metrics)), dtype=np.float64)
+        self.num_of_years = 0  # 記録済みの年数（最後に記録した年 + 1）
+
+    @property
+    def values(self) -> np.ndarray:
+        """記録済みの年の値（年×プロバイダー×指標のビュー）"""
+        return self._values[:self.num_of_years]
+
+    def _ensure_year(self, year: int) -> None:
+        """指定年まで記録できるよう配列を拡張"""
+        if year >= len(self._values):
+            grown = np.zeros((max(year + 1, 2 * len(self._values)),) + self._values.shape[1:], dtype=np.float64)
+            grown[:len(self._values)] = self._values
+            self._values = grown
+        self.num_of_years = max(self.num_of_years, year + 1)
+
+    def record(self, year: int, metric: str, values: Dict[str, float]) -> None:
+        """
+        指定年の指標をプロバイダー別に記録
+
+        Args:
+            year: 年
+            metric: 指標名
+            values: プロバイダー名をキーとした値の辞書
+        """
+        self._ensure_year(year)
+        row = self._values[year, :, self.metric_index[metric]]
+        row[:] = 0.0
+        for provider, value in values.items():
+            row[self.provider_index[provider]] = value
+
+    def add(self, year: int, metric: str, values: Dict[str, float]) -> None:
+        """
+        指定年の指標にプロバイダー別の値を加算（年内の複数ステップの集計用）
+
+        Args:
+            year: 年
+            metric: 指標名
+            values: プロバイダー名をキーとした値の辞書
+        """
+        self._ensure_year(year)
+        row = self._values[year, :, self.metric_index[metric]]
+        for provider, value in values.items():
+            row[self.provider_index[provider]] += value
+
+    def reset(self, year: int) -> None:
+        """指定年の全ての指標を0にする"""
+        self._ensure_year(year)
+        self._values[year] = 0.0
+
+    def calculate_profit(self, year: Optional[int] = None) -> None:
+        """
+        利益（収益 - 製品コスト - 修理コスト）を計算
+
+        Args:
+            year: 計算する年（Noneの場合は記録済みの全ての年）
+        """
+        if year is not None:
+            self._ensure_year(year)
+        target = self._values[:self.num_of_years] if year is None else self._values[year:year + 1]
+        revenue, product_cost, repair_cost, profit = (self.metric_index[metric] for metric in METRICS)
+        target[..., profit] = target[..., revenue] - target[..., product_cost] - target[..., repair_cost]
+
+    def year(self, year: int) -> np.ndarray:
+        """指定年の値（プロバイダー×指標のビュー）"""
+        return self._values[year]
+
+    def provider(self, provider: str) -> np.ndarray:
+        """指定プロバイダーの値（年×指標のビュー）"""
+        return self.values[:, self.provider_index[provider]]
+
+    def metric(self, metric: str) -> np.ndarray:
+        """指定指標の値（年×プロバイダーのビュー）"""
+        return self.values[:, :, self.metric_index[metric]]
+
+    def value(self, year: int, provider: str, metric: str) -> float:
+        """指定年・プロバイダー・指標の値"""
+        return float(self._values[year, self.provider_index[provider], self.metric_index[metric]])
+
+    def metric_values(self, year: int, metric: str) -> Dict[str, float]:
+        """指定年の指標をプロバイダー名をキーとした辞書で取得"""
+        row = self._values[year, :, self.metric_index[metric]]
+        return {provider: float(value) for provider, value in zip(self.providers, row)}
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        (year, provider) をインデックス、指標を列とするDataFrameとして取得（配列をコピーしない）
+
+        Returns:
+            pd.DataFrame: 記録済みの全ての年の値
+        """
+        index = pd.MultiIndex.from_product([range(self.num_of_years), self.providers], names=list(self.axes[:2]))
+        return pd.DataFrame(self.values.reshape(-1, len(self.metrics)), index=index, columns=self.metrics, copy=False)
+
+    @classmethod
+    def from_values(cls, values: np.ndarray, providers: List[str] = PROVIDERS) -> 'MetricLedger':
+        """
+        年×プロバイダー×指標の配列から台帳を作成
+
+        Args:
+            values: 値の配列（指標軸の順序はMETRICS）
+            providers: プロバイダー名のリスト
+        Returns:
+            MetricLedger: 作成した台帳
+        """
+        ledger = cls(providers, len(values))
+        ledger._values[:len(values)] = values
+        ledger.num_of_years = len(values)
+        return ledger
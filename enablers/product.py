@@ -1,11 +1,16 @@
+import copy
+import logging
 from enum import Enum
 from typing import Dict, Type, Any, TYPE_CHECKING
 import numpy as np
 import pandas as pd
 from logger import logger
 from product_category import ProductCategory
+from enablers.material_flow_log import MaterialFlowLog
+from enablers.product_history_log import HistoryKind
 if TYPE_CHECKING:
     from stakeholders.provider import Provider
+    from enablers.time_resolution import StepClock
 
 class ProductType(Enum):
     """製品タイプの列挙型"""
@@ -14,6 +19,18 @@ class ProductType(Enum):
 
 class Product:
     """製品基底クラス"""
+
+    # 製品は大量に生成されるため、インスタンス辞書を持たせない
+    __slots__ = (
+        "kind", "origin", "created_step", "index", "lifetime", "price",
+        "_matched", "_malfunction", "_disposed", "_age", "use_period",
+        "weibull_alpha", "weibull_beta", "_provider", "next_provider",
+        "product_id", "material_flow_log", "product_category", "failure_probability", "_synced_step", "count",
+    )
+
+    # 使用中の1年あたりの故障確率
+    FAILURE_PROBABILITY = 0.5
+
     def __init__(
         self,
         attributes: Dict[str, Any]
@@ -21,13 +38,20 @@ class Product:
         """
         Args:
             attributes: 製品の属性を含む辞書
-                name: 製品名
+                kind: 製品の種類名（製品の属性のキー）
+                origin: 製品を生成したプロバイダー名
+                created_step: 生成したステップ
+                index: 同じステップ・種類・プロバイダーで生成した製品の中での通し番号
                 price: 販売価格
                 lifetime: 使用寿命
                 weibull_alpha: ワイブル分布の形状パラメータ
                 weibull_beta: ワイブル分布の尺度パラメータ
         """
-        self.name = attributes["name"]
+        # 製品名は表示時にのみ生成する（kind_created_step_index_origin）
+        self.kind = attributes["kind"]
+        self.origin = attributes["origin"]
+        self.created_step = attributes["created_step"]
+        self.index = attributes["index"]
         self.lifetime = attributes["lifetime"]
         self.price = attributes["price"]
         self._matched = False
@@ -35,14 +59,68 @@ class Product:
         self._disposed = False
         self._age = 0      # 製品の製造からの経過年数
         self.use_period = 0  # 現在の消費者による使用期間
-        self.consumers = {}
         self.weibull_alpha = attributes["weibull_alpha"]  # ワイブル分布の形状パラメータ
         self.weibull_beta = attributes["weibull_beta"]  # ワイブル分布の尺度パラメータ
-        self.provider_history = {}  # 年齢をキーとしたプロバイダー履歴
         self._provider = None
         self.next_provider = None
-        self.material_flow = pd.DataFrame(columns=["source", "target", "value"])
+        self.product_id = None  # マテリアルフローのイベントログ上の製品ID
+        self.material_flow_log = None
         self.product_category = None
+        self.failure_probability = self.FAILURE_PROBABILITY  # 使用中の1ステップあたりの故障確率
+        self._synced_step = None  # 遅延評価で年齢と使用期間を反映済みのステップ（イベント方式と在庫の製品）
+        self.count = 1  # 状態が同じでまとめて扱う製品の数（コホート方式の消費者が使用する製品）
+
+    @property
+    def name(self) -> str:
+        """表示用の製品名"""
+        return f"{self.kind}_{self.created_step}_{self.index}_{self.origin}"
+
+    def clone(self, index: int) -> 'Product':
+        """
+        生成直後の製品を原型として、同じ属性の製品を複製する
+
+        Args:
+            index: 複製した製品の通し番号
+        Returns:
+            Product: 複製した製品
+        """
+        product = copy.copy(self)
+        product.index = index
+        return product
+
+    def portion(self, count: int) -> 'Product':
+        """
+        まとめた製品のうちcount個を表す、IDと状態を共有した一時的な製品（元の製品の数量は変えない）
+
+        状態が元の製品と同じに戻る処理（修理される故障など）のフローとコストをcount個分だけ記録する
+        際に使用する。
+
+        Args:
+            count: 製品数
+        Returns:
+            Product: count個を表す製品
+        """
+        product = copy.copy(self)
+        product.count = count
+        return product
+
+    def split(self, count: int) -> 'Product':
+        """
+        まとめた製品のうちcount個を、同じ状態の別の製品に分割する
+
+        Args:
+            count: 分割する製品数（1以上、まとめた製品数未満）
+        Returns:
+            Product: 分割した製品（元の製品と同じログに新しいIDで登録し、在庫などには追加しない）
+        """
+        if not 0 < count < self.count:
+            raise ValueError(f"分割する製品数が不正です: {count}（まとめた製品数 {self.count}）")
+        product = self.portion(count)
+        self.count -= count
+        if self.material_flow_log is not None:
+            product.material_flow_log = None
+            self.material_flow_log.register(product)
+        return product
 
     def update_yearly_status(self) -> None:
         """
@@ -53,18 +131,74 @@ class Product:
         """
         # 製品の年齢は常に増加
         self._age += 1
+        debug = logger.isEnabledFor(logging.DEBUG)
         
         # マッチしている場合のみ使用期間を更新
         if self._matched:
             self.use_period += 1
-            logger.debug(f"Product {self.name}: age={self._age}, use_period={self.use_period}")
-        else:
+            if debug:
+                logger.debug(f"Product {self.name}: age={self._age}, use_period={self.use_period}")
+        elif debug:
             logger.debug(f"Product {self.name}: age={self._age}, not in use")
             
         # 年齢が寿命を超えた場合、廃棄予定に設定
         if self._age >= self.lifetime:
             self.dispose()
-            logger.debug(f"Product {self.name}: disposed due to exceeding lifetime")
+            if debug:
+                logger.debug(f"Product {self.name}: disposed due to exceeding lifetime")
+
+    def to_step_resolution(self, clock: 'StepClock') -> None:
+        """
+        寿命と故障確率を年単位からステップ単位に換算
+
+        Args:
+            clock: ステップと年の換算
+        """
+        self.lifetime = clock.to_steps(self.lifetime)
+        self.failure_probability = clock.per_step_probability(self.failure_probability)
+
+    def start_tracking(self, step: int) -> None:
+        """
+        年齢と使用期間の遅延評価を開始（指定したステップの更新は未反映とする）
+
+        イベント方式では生成時に、年次方式では在庫に入った際に開始する。
+
+        Args:
+            step: 追跡を開始するステップ
+        """
+        self._synced_step = step - 1
+
+    def stop_tracking(self) -> None:
+        """年齢と使用期間の遅延評価を終了（以降は毎ステップの状態更新で反映する）"""
+        self._synced_step = None
+
+    def age_at(self, step: int) -> int:
+        """
+        指定ステップまでの更新を反映した場合の年齢
+
+        Args:
+            step: ステップ
+        Returns:
+            int: 年齢
+        """
+        if self._synced_step is None or step <= self._synced_step:
+            return self._age
+        return self._age + step - self._synced_step
+
+    def advance_to(self, step: int) -> None:
+        """
+        イベント方式で、前回の反映から指定ステップまでの年齢と使用期間の更新をまとめて反映
+        
+        Args:
+            step: 反映するステップ
+        """
+        if self._synced_step is None or step <= self._synced_step:
+            return
+        elapsed = step - self._synced_step
+        self._age += elapsed
+        if self._matched:
+            self.use_period += elapsed
+        self._synced_step = step
 
     def reset_use_period(self) -> None:
         """
@@ -73,15 +207,24 @@ class Product:
         self.use_period = 0
 
     def add_provider(self, year: int, provider: 'Provider') -> None:
-        """プロバイダーの追加"""
-        self.provider_history[year] = provider.name
+        """プロバイダーの追加（生成時のプロバイダーはorigin、移管は履歴のログに記録）"""
+        if self._provider is not None:
+            if self._provider is not provider:
+                self._provider.withdraw_available(self)
+            self._ensure_registered()
+            self.material_flow_log.history.append(
+                self.product_id, year, HistoryKind.PROVIDER, self.material_flow_log.matrices.index(provider.name)
+            )
         self._provider = provider
         self.next_provider = None
+        self._update_availability()
         
-    def add_consumer(self, year: int, consumer: str) -> None:
-        """消費者の追加"""
-        self.consumers[year] = consumer
+    def add_consumer(self, step: int, consumer_id: int) -> None:
+        """消費者の追加（履歴はエコシステムのログに記録）"""
+        self._ensure_registered()
+        self.material_flow_log.history.append(self.product_id, step, HistoryKind.CONSUMER, consumer_id)
         self._matched = True
+        self._update_availability()
         # マテリアフローの記録
         self.record_material_flow(self.provider.name, "consumer")
 
@@ -96,6 +239,11 @@ class Product:
         if self.use_period >= self.lifetime:
             self.dispose()
     
+    def _update_availability(self) -> None:
+        """状態の変化をプロバイダーの利用可能な製品のプールに反映"""
+        if self._provider is not None:
+            self._provider.update_availability(self)
+
     def is_available(self) -> bool:
         """
         製品が利用可能かどうかを判定
@@ -126,20 +274,28 @@ class Product:
         failure = np.random.choice(
             [False, True],
             # p=[1 - failure_prob, failure_prob]
-            p=[0.5, 0.5]
+            p=[1 - self.failure_probability, self.failure_probability]
         )
         
-        self._malfunction = failure
-
-        # 故障した場合、マテリアフローの記録
         if failure:
-            if self.matched:    
-                self.record_material_flow("consumer", "repair")
-            else:
-                self.record_material_flow(self.provider.name, "repair")
+            self.fail()
+        elif self._malfunction:
+            self._malfunction = False
+            self._update_availability()
 
         return failure
 
+    def fail(self) -> None:
+        """故障状態に設定"""
+        self._malfunction = True
+        self._update_availability()
+
+        # マテリアフローの記録
+        if self.matched:    
+            self.record_material_flow("consumer", "repair")
+        else:
+            self.record_material_flow(self.provider.name, "repair")
+
     @property
     def malfunction(self) -> bool:
         """
@@ -163,6 +319,7 @@ class Product:
     def remove_consumer(self) -> None:
         """消費者の削除"""
         self._matched = False
+        self._update_availability()
     
     def calculate_remaining_lifetime(self) -> int:
         """使用可能な残り寿命を計算"""
@@ -171,6 +328,7 @@ class Product:
     def repair(self) -> None:
         """製品を修理状態にする"""
         self._malfunction = False
+        self._update_availability()
 
         # 修理した場合、マテリアフローの記録
         if self.matched:
@@ -181,6 +339,7 @@ class Product:
     def dispose(self) -> None:
         """廃棄状態に設定"""
         self._disposed = True
+        self._update_availability()
 
         # マテリアフローの記録
         if self.matched:
@@ -237,14 +396,42 @@ class Product:
         """製品の解放処理"""
         self.reset_use_period()
         self._matched = False
+        self._update_availability()
     
+    def _ensure_registered(self) -> None:
+        """エコシステムに登録されていない製品を専用のログに登録"""
+        if self.material_flow_log is None:
+            MaterialFlowLog().register(self)
+
     def record_material_flow(self, source: str, target: str) -> None:
-        """マテリアフローの記録"""
-        self.material_flow = pd.concat([self.material_flow, pd.DataFrame({'source': [source], 'target': [target], 'value': [1]})], ignore_index=True)
+        """マテリアフローの記録（まとめた製品は製品数分）"""
+        self._ensure_registered()
+        self.material_flow_log.append(self.product_id, source, target, self.count * self.material_flow_log.weight)
+
+    @property
+    def consumers(self) -> Dict[int, int]:
+        """使用を開始したステップをキーとした消費者IDの履歴"""
+        if self.material_flow_log is None:
+            return {}
+        return self.material_flow_log.history.entries(self.product_id, HistoryKind.CONSUMER)
+
+    @property
+    def provider_history(self) -> Dict[int, str]:
+        """提供を開始したステップをキーとしたプロバイダー名の履歴"""
+        history = {self.created_step: self.origin}
+        if self.material_flow_log is not None:
+            nodes = self.material_flow_log.nodes
+            history.update({
+                step: nodes[code]
+                for step, code in self.material_flow_log.history.entries(self.product_id, HistoryKind.PROVIDER).items()
+            })
+        return history
     
     def get_material_flow_history(self) -> pd.DataFrame:
         """マテリアフローの履歴データを取得"""
-        return self.material_flow
+        if self.material_flow_log is None:
+            return pd.DataFrame(columns=["source", "target", "value"])
+        return self.material_flow_log.to_frame(product_id=self.product_id)
     
     def set_product_category(self, product_category: ProductCategory) -> None:
         """製品カテゴリの設定"""
@@ -252,5 +439,7 @@ class Product:
 
 class StandardProduct(Product):
     """標準的な製品"""
+    __slots__ = ()
+
     def __init__(self, attributes: Dict[str, Any]):
         super().__init__(attributes=attributes)
\ No newline at end of file
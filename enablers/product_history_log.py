@@ -0,0 +1,97 @@
+from enum import Enum
+from typing import Dict
+import numpy as np
+
+class HistoryKind(Enum):
+    """製品の履歴の種類"""
+    CONSUMER = 0  # 消費者による使用の開始（値は消費者ID）
+    PROVIDER = 1  # プロバイダーへの移管（値はマテリアルフローのノードコード）
+
+class ProductHistoryLog:
+    """
+    エコシステム全体の製品の使用者・提供者の履歴を記録する追記専用のログ
+
+    製品ごとに辞書を持たせる代わりに、製品ID・ステップ・種類・値を事前確保したNumPy配列に
+    列ごとに格納する。生成時のプロバイダーは製品自身が保持するため、移管のみを記録する。
+    """
+
+    def __init__(self, capacity: int = 1024):
+        """
+        Args:
+            capacity: 初期容量（履歴数）
+        """
+        self._size = 0
+        self._product_ids = np.empty(capacity, dtype=np.int64)
+        self._steps = np.empty(capacity, dtype=np.int32)
+        self._kinds = np.empty(capacity, dtype=np.int8)
+        self._values = np.empty(capacity, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, product_id: int, step: int, kind: HistoryKind, value: int) -> None:
+        """
+        履歴を記録
+
+        Args:
+            product_id: 製品ID
+            step: ステップ
+            kind: 履歴の種類
+            value: 消費者IDまたはプロバイダーのノードコード
+        """
+        if self._size == len(self._product_ids):
+            self._grow()
+        i = self._size
+        self._product_ids[i] = product_id
+        self._steps[i] = step
+        self._kinds[i] = kind.value
+        self._values[i] = value
+        self._size += 1
+
+    def _grow(self) -> None:
+        """容量を倍に拡張"""
+        capacity = max(2 * len(self._product_ids), 1)
+        for column in ("_product_ids", "_steps", "_kinds", "_values"):
+            array = getattr(self, column)
+            grown = np.empty(capacity, dtype=array.dtype)
+            grown[:self._size] = array[:self._size]
+            setattr(self, column, grown)
+
+    def entries(self, product_id: int, kind: HistoryKind) -> Dict[int, int]:
+        """
+        指定した製品・種類の履歴を取得
+
+        Args:
+            product_id: 製品ID
+            kind: 履歴の種類
+        Returns:
+            Dict[int, int]: ステップをキーとした値（同じステップの履歴は後の記録を優先）
+        """
+        columns = self.columns
+        mask = (columns["product_id"] == product_id) & (columns["kind"] == kind.value)
+        return {int(step): int(value) for step, value in zip(columns["step"][mask], columns["value"][mask])}
+
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        """記録済みの履歴の列（コピーではなくビュー）"""
+        return {
+            "product_id": self._product_ids[:self._size],
+            "step": self._steps[:self._size],
+            "kind": self._kinds[:self._size],
+            "value": self._values[:self._size],
+        }
+
+    def load(self, columns: Dict[str, np.ndarray]) -> None:
+        """
+        保存済みの履歴を読み込む（チェックポイントからの復元用）
+
+        Args:
+            columns: columnsプロパティと同じ形式の列
+        """
+        self._size = len(columns["product_id"])
+        capacity = max(self._size, 1024)
+        for column, key in (("_product_ids", "product_id"), ("_steps", "step"),
+                            ("_kinds", "kind"), ("_values", "value")):
+            array = np.empty(capacity, dtype=getattr(self, column).dtype)
+            array[:self._size] = columns[key]
+            setattr(self, column, array)
@@ -0,0 +1,39 @@
+from typing import Dict, Iterator, TYPE_CHECKING
+if TYPE_CHECKING:
+    from enablers.product import Product
+
+class ProductRegistry:
+    """
+    プロバイダーが管理する製品の登録簿
+
+    製品（同一性で比較）をキーとした挿入順序付きの辞書で保持し、追加・削除・所属判定を
+    O(1)で行う。走査は登録した順に行うため、乱数のシードを固定した実行は再現可能になる。
+    オブジェクトIDではなく製品自体をキーとするため、エコシステムを複製してもキーと製品が対応する。
+    """
+
+    def __init__(self):
+        self._products: Dict['Product', None] = {}
+
+    def __len__(self) -> int:
+        """登録されている製品数"""
+        return len(self._products)
+
+    def __contains__(self, product: 'Product') -> bool:
+        """製品が登録されているかどうか"""
+        return product in self._products
+
+    def __iter__(self) -> Iterator['Product']:
+        """登録した順に製品を走査"""
+        return iter(self._products)
+
+    def add(self, product: 'Product') -> None:
+        """製品を登録（登録済みの場合は何もしない）"""
+        self._products.setdefault(product)
+
+    def remove(self, product: 'Product') -> None:
+        """製品の登録を削除（未登録の場合は何もしない）"""
+        self._products.pop(product, None)
+
+    def clear(self) -> None:
+        """全ての製品の登録を削除"""
+        self._products.clear()
@@ -0,0 +1,208 @@
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+import numpy as np
+if TYPE_CHECKING:
+    from stakeholders.consumer import Consumer
+    from stakeholders.consumer_cohort import ConsumerCohort
+
+class ReleaseQueue:
+    """
+    製品を使用中の消費者を解放予定のステップごとに管理するカレンダーキュー
+
+    消費者ごとの解放予定のステップとチャーン率を配列に格納し、枠を解放予定のステップごとの
+    バケットに登録する。各ステップの処理では、そのステップのバケットの消費者と、残りの消費者から
+    チャーン率に従ってベクトル化したベルヌーイ試行で選ばれた消費者のみを解放する。
+    解放した枠は再利用する。
+    """
+
+    # 枠ごとの値を保持する配列（容量の拡張時にコピーする列）
+    _columns = ("_release_steps", "_churn_rates", "_active")
+
+    def __init__(self, capacity: int = 1024):
+        """
+        Args:
+            capacity: 初期容量（消費者数）
+        """
+        self._consumers: List[Optional['Consumer']] = [None] * capacity
+        self._release_steps = np.zeros(capacity, dtype=np.int64)
+        self._churn_rates = np.zeros(capacity, dtype=np.float64)
+        self._active = np.zeros(capacity, dtype=bool)
+        self._size = 0  # 使用したことのある枠の数
+        self._free_slots: List[int] = []
+        self._buckets: Dict[int, List[int]] = {}
+
+    def __len__(self) -> int:
+        """製品を使用中の消費者数"""
+        return self._size - len(self._free_slots)
+
+    def schedule(self, consumer: 'Consumer') -> int:
+        """
+        製品の使用を開始した消費者を解放予定のステップのバケットに登録
+
+        Args:
+            consumer: 製品の使用を開始した消費者
+        Returns:
+            int: 登録した枠
+        """
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            if self._size == len(self._release_steps):
+                self._grow()
+            slot = self._size
+            self._size += 1
+        release_step = consumer.release_step
+        self._consumers[slot] = consumer
+        self._release_steps[slot] = release_step
+        self._churn_rates[slot] = consumer.churn_rate
+        self._active[slot] = True
+        self._buckets.setdefault(release_step, []).append(slot)
+        return slot
+
+    def _grow(self) -> None:
+        """容量を倍に拡張"""
+        capacity = max(2 * len(self._release_steps), 1)
+        for column in self._columns:
+            array = getattr(self, column)
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:self._size] = array[:self._size]
+            setattr(self, column, grown)
+        self._consumers.extend([None] * (capacity - len(self._consumers)))
+
+    def pop_releases(self, step: int) -> List['Consumer']:
+        """
+        そのステップで製品を解放する消費者を取り出す
+
+        解放予定のステップに達した消費者に加え、残りの消費者のうちチャーンした消費者を含む。
+
+        Args:
+            step: ステップ
+        Returns:
+            List[Consumer]: 製品を解放する消費者（枠の順）
+        """
+        due = self._pop_due(step)
+
+        # 残りの消費者のチャーン判定（ベクトル化したベルヌーイ試行）
+        candidates = self._churn_candidates(due)
+        churned = candidates[np.random.random(len(candidates)) < self._churn_rates[candidates]]
+
+        released = np.union1d(due, churned)
+        consumers = [self._consumers[slot] for slot in released]
+        self._free(released)
+        return consumers
+
+    def _pop_due(self, step: int) -> np.ndarray:
+        """解放予定のステップに達した枠（チャーンで解放済みの枠や再利用された枠の古い登録は除く）"""
+        due = [slot for key in [key for key in self._buckets if key <= step]
+               for slot in self._buckets.pop(key)]
+        due = np.unique(np.array(due, dtype=np.int64))
+        return due[self._active[due] & (self._release_steps[due] <= step)]
+
+    def _churn_candidates(self, due: np.ndarray) -> np.ndarray:
+        """解放予定のステップに達していない、チャーン率が正の使用中の枠"""
+        remaining = self._active[:self._size].copy()
+        remaining[due] = False
+        return np.flatnonzero(remaining & (self._churn_rates[:self._size] > 0))
+
+    def _free(self, slots: np.ndarray) -> None:
+        """枠を空けて再利用待ちにする"""
+        self._active[slots] = False
+        for slot in slots:
+            self._consumers[slot] = None
+        self._free_slots.extend(int(slot) for slot in slots)
+
+    def slots(self) -> List[Optional['Consumer']]:
+        """枠ごとの消費者（空いている枠はNone）"""
+        return self._consumers[:self._size]
+
+    @property
+    def free_slots(self) -> List[int]:
+        """再利用待ちの枠（再利用する順の逆順）"""
+        return list(self._free_slots)
+
+    def load(self, slots: List[Optional['Consumer']], free_slots: List[int]) -> None:
+        """
+        保存済みの枠の状態を読み込む（チェックポイントからの復元用）
+
+        Args:
+            slots: 枠ごとの消費者（空いている枠はNone）
+            free_slots: 再利用待ちの枠
+        """
+        self.__init__(max(len(slots), 1024))
+        self._size = len(slots)
+        for slot, consumer in enumerate(slots):
+            if consumer is None:
+                continue
+            self._consumers[slot] = consumer
+            self._release_steps[slot] = consumer.release_step
+            self._churn_rates[slot] = consumer.churn_rate
+            self._active[slot] = True
+            self._buckets.setdefault(consumer.release_step, []).append(slot)
+        self._free_slots = list(free_slots)
+
+class CohortReleaseQueue(ReleaseQueue):
+    """
+    製品を使用中のコホートを解放予定のステップごとに管理するカレンダーキュー
+
+    枠ごとに使用中のメンバー数を保持する。解放予定のステップに達したコホートは使用中の全メンバーを、
+    それ以外のコホートは使用中のメンバー数に対する二項分布でサンプリングした人数を解放する。
+    """
+
+    _columns = ReleaseQueue._columns + ("_counts",)
+
+    def __init__(self, capacity: int = 1024):
+        """
+        Args:
+            capacity: 初期容量（コホート数）
+        """
+        super().__init__(capacity)
+        self._counts = np.zeros(capacity, dtype=np.int64)
+
+    def schedule(self, cohort: 'ConsumerCohort') -> int:
+        """
+        製品の使用を開始したコホートを解放予定のステップのバケットに登録
+
+        Args:
+            cohort: 製品の使用を開始したコホート
+        Returns:
+            int: 登録した枠
+        """
+        slot = super().schedule(cohort)
+        self._counts[slot] = cohort.active
+        return slot
+
+    def pop_releases(self, step: int) -> List[Tuple['ConsumerCohort', int]]:
+        """
+        そのステップで製品を解放するコホートと人数を取り出す
+
+        Args:
+            step: ステップ
+        Returns:
+            List[Tuple[ConsumerCohort, int]]: コホートと解放する人数（枠の順）
+        """
+        due = self._pop_due(step)
+
+        # 残りのコホートのチャーン人数（ベクトル化した二項分布）
+        candidates = self._churn_candidates(due)
+        churned = np.random.binomial(self._counts[candidates], self._churn_rates[candidates])
+        released_counts = np.zeros(self._size, dtype=np.int64)
+        released_counts[due] = self._counts[due]
+        released_counts[candidates] = churned
+        self._counts[:self._size] -= released_counts
+
+        slots = np.flatnonzero(released_counts)
+        releases = [(self._consumers[slot], int(released_counts[slot])) for slot in slots]
+        self._free(np.union1d(due, candidates[self._counts[candidates] == 0]))
+        return releases
+
+    def load(self, slots: List[Optional['ConsumerCohort']], free_slots: List[int]) -> None:
+        """
+        保存済みの枠の状態を読み込む（チェックポイントからの復元用、使用中のメンバー数はコホートから取得）
+
+        Args:
+            slots: 枠ごとのコホート（空いている枠はNone）
+            free_slots: 再利用待ちの枠
+        """
+        super().load(slots, free_slots)
+        for slot, cohort in enumerate(slots):
+            if cohort is not None:
+                self._counts[slot] = cohort.active
@@ -0,0 +1,114 @@
+from typing import Dict, List
+import numpy as np
+
+class SubscriptionLedger:
+    """
+    PaaSの契約を配列で管理する台帳
+
+    契約ごとのステップあたりの料金と最終課金ステップを配列に格納し、契約の枠を最終課金ステップ
+    ごとのバケット（カレンダーキュー）に登録する。各ステップの課金は有効な契約の料金のベクトル和で
+    計算し、満了した契約はそのステップのバケットを取り出して解除する。解除した枠は再利用する。
+    1年1ステップの場合、料金は年額、ステップは年になる。
+    """
+
+    def __init__(self, capacity: int = 1024):
+        """
+        Args:
+            capacity: 初期容量（契約数）
+        """
+        self._prices = np.zeros(capacity, dtype=np.float64)
+        self._expiry_steps = np.zeros(capacity, dtype=np.int64)
+        self._active = np.zeros(capacity, dtype=bool)
+        self._size = 0  # 使用したことのある枠の数
+        self._free_slots: List[int] = []
+        self._buckets: Dict[int, List[int]] = {}
+
+    def __len__(self) -> int:
+        """有効な契約数"""
+        return self._size - len(self._free_slots)
+
+    def subscribe(self, step: int, price: float, period: int) -> None:
+        """
+        契約を登録（登録したステップから period ステップの間課金する）
+
+        Args:
+            step: 契約開始ステップ
+            price: ステップあたりの料金
+            period: 契約期間（ステップ数）
+        """
+        if period <= 0:
+            return
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            if self._size == len(self._prices):
+                self._grow()
+            slot = self._size
+            self._size += 1
+        expiry_step = step + period - 1
+        self._prices[slot] = price
+        self._expiry_steps[slot] = expiry_step
+        self._active[slot] = True
+        self._buckets.setdefault(expiry_step, []).append(slot)
+
+    def _grow(self) -> None:
+        """容量を倍に拡張"""
+        capacity = max(2 * len(self._prices), 1)
+        for column in ("_prices", "_expiry_steps", "_active"):
+            array = getattr(self, column)
+            grown = np.zeros(capacity, dtype=array.dtype)
+            grown[:self._size] = array[:self._size]
+            setattr(self, column, grown)
+
+    def bill(self, step: int) -> float:
+        """
+        有効な契約に課金し、そのステップで満了する契約を解除する
+
+        Args:
+            step: 課金するステップ
+        Returns:
+            float: 課金額の合計
+        """
+        active = self._active[:self._size]
+        total = float(self._prices[:self._size][active].sum())
+
+        # 満了した契約のバケットを取り出して解除
+        for expiry_step in [key for key in self._buckets if key <= step]:
+            slots = self._buckets.pop(expiry_step)
+            self._active[slots] = False
+            self._free_slots.extend(slots)
+        return total
+
+    def contracts(self) -> Dict[str, np.ndarray]:
+        """
+        契約の枠の状態を取得
+
+        復元後も課金の合計の加算順と枠の再利用順が変わらないよう、空いている枠を含む枠ごとの値、
+        再利用待ちの枠、バケットの登録順を保存する。
+        """
+        return {
+            "prices": self._prices[:self._size].copy(),
+            "expiry_steps": self._expiry_steps[:self._size].copy(),
+            "active": self._active[:self._size].copy(),
+            "free_slots": np.array(self._free_slots, dtype=np.int64),
+            "bucket_slots": np.array(
+                [slot for slots in self._buckets.values() for slot in slots], dtype=np.int64
+            ),
+        }
+
+    def load(self, contracts: Dict[str, np.ndarray]) -> None:
+        """
+        保存済みの契約の枠の状態を読み込む（チェックポイントからの復元用）
+
+        Args:
+            contracts: contractsメソッドと同じ形式の配列
+        """
+        prices = contracts["prices"]
+        self.__init__(max(len(prices), 1024))
+        self._size = len(prices)
+        self._prices[:self._size] = prices
+        self._expiry_steps[:self._size] = contracts["expiry_steps"]
+        self._active[:self._size] = contracts["active"]
+        self._free_slots = [int(slot) for slot in contracts["free_slots"]]
+        for slot in contracts["bucket_slots"]:
+            self._buckets.setdefault(int(self._expiry_steps[slot]), []).append(int(slot))
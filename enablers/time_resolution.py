@@ -0,0 +1,77 @@
+from enum import Enum
+import numpy as np
+
+class TimeResolution(Enum):
+    """シミュレーションの時間の刻み"""
+    YEARLY = "yearly"
+    QUARTERLY = "quarterly"
+    MONTHLY = "monthly"
+
+# 1年あたりのステップ数
+STEPS_PER_YEAR = {
+    TimeResolution.YEARLY: 1,
+    TimeResolution.QUARTERLY: 4,
+    TimeResolution.MONTHLY: 12,
+}
+
+class StepClock:
+    """
+    ステップ（シミュレーションの時間の刻み）と年の換算
+
+    消費者や製品などのエージェントの時間（使用期間、寿命、解放年など）はステップ単位で扱い、
+    指標やフローなどの集計は年単位で行う。年単位の設定値（年額料金、年あたりの確率、
+    年あたりの人数や生産量）は、このクラスでステップ単位に換算する。
+    """
+
+    def __init__(self, resolution: TimeResolution = TimeResolution.YEARLY):
+        """
+        Args:
+            resolution: 時間の刻み
+        """
+        self.resolution = resolution
+        self.steps_per_year = STEPS_PER_YEAR[resolution]
+
+    def year_of(self, step: int) -> int:
+        """ステップが属する年"""
+        return step // self.steps_per_year
+
+    def steps_of(self, year: int) -> range:
+        """年に含まれるステップ"""
+        return range(year * self.steps_per_year, (year + 1) * self.steps_per_year)
+
+    def share(self, total: int, step: int) -> range:
+        """
+        年あたりの数量のうち、指定ステップに割り当てる分の通し番号（年内で均等に配分）
+
+        Args:
+            total: 年あたりの数量
+            step: ステップ
+        Returns:
+            range: 年内での通し番号の範囲
+        """
+        k = step % self.steps_per_year
+        return range(total * k // self.steps_per_year, total * (k + 1) // self.steps_per_year)
+
+    def to_steps(self, years: float) -> float:
+        """年数をステップ数に換算"""
+        return years * self.steps_per_year
+
+    def months_to_steps(self, months: float) -> int:
+        """月数を最小1のステップ数に換算（四捨五入）"""
+        return max(1, round(months / (12 / self.steps_per_year)))
+
+    def months_to_steps_array(self, months: np.ndarray) -> np.ndarray:
+        """月数の配列を最小1のステップ数の配列に換算（months_to_stepsと同じ偶数丸め）"""
+        return np.maximum(1, np.round(months / (12 / self.steps_per_year))).astype(np.int64)
+
+    def per_step_amount(self, annual_amount: float) -> float:
+        """年あたりの金額をステップあたりに換算"""
+        if self.steps_per_year == 1:
+            return annual_amount
+        return annual_amount / self.steps_per_year
+
+    def per_step_probability(self, annual_probability: float) -> float:
+        """年あたりの発生確率を、同じ年間発生確率になるステップあたりの確率に換算"""
+        if self.steps_per_year == 1:
+            return annual_probability
+        return 1 - (1 - annual_probability) ** (1 / self.steps_per_year)
@@ -0,0 +1,186 @@
+import heapq
+import logging
+import math
+from enum import Enum
+from typing import List, Optional, Tuple, TYPE_CHECKING
+import numpy as np
+from logger import logger
+if TYPE_CHECKING:
+    from enablers.product import Product
+    from stakeholders.consumer import Consumer
+
+class EngineMode(Enum):
+    """年次サイクルの状態更新の方式"""
+    YEARLY = "yearly"  # 毎年全ての製品と消費者を走査する
+    EVENT = "event"  # 事前にサンプリングしたイベントのみを処理する
+
+class EventType(Enum):
+    """イベントの種類（値は同じステップのイベントの処理順）"""
+    RELEASE = 0  # 消費者による製品の解放（計画使用期間の満了またはチャーン）
+    DISPOSAL = 1  # 製品の年齢が寿命に達したことによる廃棄
+    FAILURE = 2  # 使用中の製品の故障
+
+# イベント: (ステップ, 種類, 通し番号, 対象の消費者または製品, 故障を判定する期限のステップ)
+Event = Tuple[int, int, int, object, int]
+
+class EventEngine:
+    """
+    離散イベント方式で製品と消費者の状態を更新するエンジン
+
+    消費者の解放（計画使用期間の満了とチャーン）と製品の故障のステップを使用開始時に、
+    製品の廃棄のステップを生成時にサンプリングし、優先度付きキューに登録する。市場の
+    マッチングの間には、そのステップのイベントのみを処理するため、計算量は
+    エージェント数×ステップ数ではなくイベント数に比例する。
+
+    各確率は年次サイクルと同じステップあたりの確率（チャーン率、製品の故障確率）から
+    幾何分布でサンプリングするため、ステップ単位では年次サイクルと同じ挙動になる。
+    製品の年齢と使用期間は、イベントの処理時にのみ追いつかせる。
+    """
+
+    def __init__(self):
+        self._events: List[Event] = []
+        self._seq = 0
+        self.events_processed = 0  # 処理したイベントの累積数（計測用）
+        self.failures_sampled = 0  # 故障のステップをサンプリングした累積回数（計測用）
+
+    def __len__(self) -> int:
+        """未処理のイベント数"""
+        return len(self._events)
+
+    def _push(self, step: int, event_type: EventType, target: object, until: int = -1) -> None:
+        """イベントをキューに登録"""
+        heapq.heappush(self._events, (step, event_type.value, self._seq, target, until))
+        self._seq += 1
+
+    def add_products(self, products: List['Product'], step: int) -> None:
+        """
+        生成した製品を登録し、寿命に達するステップに廃棄イベントを登録
+
+        Args:
+            products: 生成した製品
+            step: 生成したステップ
+        """
+        for product in products:
+            product.start_tracking(step)
+            # 年齢（生成したステップを1とする）が寿命以上になるステップ
+            self._push(step + math.ceil(product.lifetime) - 1, EventType.DISPOSAL, product)
+
+    def assign(self, consumer: 'Consumer', product: 'Product', step: int) -> None:
+        """
+        製品を消費者に割り当て、解放と故障のステップをサンプリングしてイベントを登録
+
+        Args:
+            consumer: 製品を使用する消費者
+            product: 割り当てる製品
+            step: 使用を開始したステップ
+        """
+        product.advance_to(step - 1)
+        consumer.set_possession(product, step)
+        product.add_consumer(step, consumer.consumer_id)
+
+        # 解放のステップ（計画使用期間の満了と、使用開始から毎ステップ判定するチャーンの早い方）
+        release_step = consumer.release_step
+        if consumer.churn_rate > 0:
+            release_step = min(release_step, step + int(np.random.geometric(consumer.churn_rate)) - 1)
+        self._push(release_step, EventType.RELEASE, consumer)
+
+        # 故障は使用開始から解放の前のステップまで毎ステップ判定される
+        self._schedule_failure(product, step, release_step)
+
+    def _schedule_failure(self, product: 'Product', step: int, until: int) -> None:
+        """指定ステップ以降で最初に故障するステップをサンプリングし、解放の前までであれば登録"""
+        failure_step = step + int(np.random.geometric(product.failure_probability)) - 1
+        self.failures_sampled += 1
+        if failure_step < until:
+            self._push(failure_step, EventType.FAILURE, product, until)
+
+    def process(self, step: int) -> Tuple[List['Product'], List['Product']]:
+        """
+        指定ステップのイベントを処理
+
+        Args:
+            step: ステップ
+        Returns:
+            Tuple[List[Product], List[Product]]: 修理した製品と、消費者が解放した製品
+        """
+        repaired_products = []
+        released_products = []
+        debug = logger.isEnabledFor(logging.DEBUG)
+        while self._events and self._events[0][0] <= step:
+            _, event_type, _, target, until = heapq.heappop(self._events)
+            self.events_processed += 1
+
+            if event_type == EventType.RELEASE.value:
+                consumer = target
+                product = consumer.matched_product
+                if product is None:
+                    continue
+                product.advance_to(step - 1)
+                consumer.release(step)
+                released_products.append(product)
+
+            elif event_type == EventType.DISPOSAL.value:
+                product = target
+                product.advance_to(step)
+                product.dispose()
+                if debug:
+                    logger.debug(f"Product {product.name}: disposed due to exceeding lifetime")
+                # 年次サイクルと同様に、寿命を超えた製品は毎ステップ廃棄として記録する
+                self._push(step + 1, EventType.DISPOSAL, product)
+
+            elif event_type == EventType.FAILURE.value:
+                product = target
+                product.advance_to(step)
+                if not product.matched:
+                    continue
+                product.fail()
+                if debug:
+                    logger.debug(f"Product {product.name} malfunctioned")
+                if product.provider is not None:
+                    # 修理コストを計算
+                    product.provider.repair_product(product)
+                    if not product.malfunction:
+                        repaired_products.append(product)
+                    if debug:
+                        logger.debug(f"Product {product.name} repaired by {product.provider.name}")
+                if product.matched:
+                    self._schedule_failure(product, step + 1, until)
+
+        return repaired_products, released_products
+
+    def events(self) -> List[Event]:
+        """未処理のイベント（処理順）"""
+        return sorted(self._events)
+
+    def load(self, events: List[Event], seq: int) -> None:
+        """
+        保存済みのイベントを読み込む（チェックポイントからの復元用）
+
+        Args:
+            events: 未処理のイベント
+            seq: 次に割り当てる通し番号
+        """
+        self._events = list(events)
+        heapq.heapify(self._events)
+        self._seq = seq
+
+    @property
+    def seq(self) -> int:
+        """次に割り当てる通し番号"""
+        return self._seq
+
+def create_event_engine(engine_mode: EngineMode) -> Optional[EventEngine]:
+    """
+    状態更新の方式に応じたイベントエンジンを作成
+
+    Args:
+        engine_mode: 状態更新の方式
+    Returns:
+        Optional[EventEngine]: イベント方式の場合はエンジン、年次方式の場合はNone
+    """
+    engine_map = {
+        EngineMode.YEARLY: None,
+        EngineMode.EVENT: EventEngine,
+    }
+    engine_class = engine_map[engine_mode]
+    return engine_class() if engine_class is not None else None
@@ -1,4 +1,4 @@
-from circular_ecosystem import CircularEcosystem
+from circular_ecosystem import CircularEcosystemBase
 from stakeholders.provider import Provider
 from scipy.optimize import minimize_scalar
 import logging
@@ -14,7 +14,7 @@ class Game:
         self.tol = 5
         self.max_iter = 1000
 
-    def find_equilibrium(self, ecosystem: CircularEcosystem, year: int) -> dict[str, float]:
+    def find_equilibrium(self, ecosystem: CircularEcosystemBase, year: int) -> dict[str, float]:
         """
         エコシステムの均衡価格を探索
         
@@ -85,7 +85,7 @@ class Game:
             logger.warning("警告: 収束しませんでした。最終値を返します。")
         return new_prices
                     
-    def best_response(self, ecosystem: CircularEcosystem, year: int, provider: str) -> float:
+    def best_response(self, ecosystem: CircularEcosystemBase, year: int, provider: str) -> float:
         """
         各プロバイダーの最適価格を計算
         """
@@ -101,7 +101,7 @@ class Game:
         return best_price, best_profit
 
     
-    def calculate_profit(self, ecosystem: CircularEcosystem, year: int, provider: str, price: float) -> float:
+    def calculate_profit(self, ecosystem: CircularEcosystemBase, year: int, provider: str, price: float) -> float:
         """
         各プロバイダーの利潤を計算
         """
@@ -118,12 +118,15 @@ class Game:
         elif provider == 'recycler':
             ecosystem_copy.recycler.set_price(price)
                     
-        result_df = ecosystem_copy.execute_yearly_cycle(year)
-        result = result_df.iloc[-1]
+        ecosystem_copy.execute_yearly_cycle(year)
+        metrics = ecosystem_copy.business_model.metrics
+        metrics.calculate_profit(year)
+        revenue = metrics.value(year, provider, 'revenue')
+        profit = metrics.value(year, provider, 'profit')
 
-        print(f"{provider} price: {int(price)}, revenue: {int(result['revenue_history'][provider])}, profit: {int(result['revenue_history'][provider]-result['product_cost_history'][provider]-result['repair_cost_history'][provider])}")
+        print(f"{provider} price: {int(price)}, revenue: {int(revenue)}, profit: {int(profit)}")
 
-        return result['revenue_history'][provider]-result['product_cost_history'][provider]-result['repair_cost_history'][provider]
+        return profit
 
         
         
\ No newline at end of file
@@ -0,0 +1,94 @@
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Dict, List, Tuple
+import pandas as pd
+
+# フェーズごとに集計する処理件数（エコシステムの work_counts と同じ順）
+COUNTERS = (
+    "consumers_created",  # 生成した消費者エージェント数（コホートは1件）
+    "utility_evaluations",  # マッチングで計算した効用の数（消費者×製品カテゴリ）
+    "products_scanned",  # 状態更新で走査した製品数（イベント方式は処理したイベント数）
+    "failures_sampled",  # 故障の判定・サンプリングの回数
+    "flows_recorded",  # 記録したマテリアルフローのイベントと財務フローの取引の数
+    "dataframes_built",  # 結果の生成のために作成したDataFrameの数
+)
+
+REPORT_COLUMNS = ["run", "year", "phase", "wall_time", "calls", *COUNTERS]
+
+@dataclass
+class InstrumentationReport:
+    """
+    年次サイクルの計測結果
+
+    Attributes:
+        phases: 実行・年・フェーズごとの経過時間（秒）、呼び出し回数、処理件数
+    """
+    phases: pd.DataFrame
+
+    def by_year(self) -> pd.DataFrame:
+        """実行・年ごとの合計（全フェーズ）"""
+        return self.phases.drop(columns="phase").groupby(["run", "year"], as_index=False).sum()
+
+    def by_run(self) -> pd.DataFrame:
+        """実行・フェーズごとの合計（全年）"""
+        return self.phases.drop(columns="year").groupby(["run", "phase"], as_index=False, sort=False).sum()
+
+    def by_phase(self) -> pd.DataFrame:
+        """フェーズごとの合計（全実行・全年）と経過時間の割合"""
+        totals = self.phases.drop(columns=["run", "year"]).groupby("phase", as_index=False, sort=False).sum()
+        elapsed = totals["wall_time"].sum()
+        totals["share"] = totals["wall_time"] / elapsed if elapsed > 0 else 0.0
+        return totals
+
+class Instrumentation:
+    """
+    年次サイクルのフェーズごとの経過時間、呼び出し回数、処理件数を実行・年ごとに集計する
+
+    処理件数は各コンポーネントが常に保持している累積のカウンタ（エコシステムの
+    work_counts）をフェーズの前後で取得した差分とするため、計測しない場合に
+    ホットループで追加の処理は発生しない。
+    """
+
+    def __init__(self):
+        self.run_id = 0
+        self.year = 0
+        # (実行, 年, フェーズ名) -> [経過時間, 呼び出し回数, 処理件数...]
+        self._records: Dict[Tuple[int, int, str], List[float]] = {}
+
+    def begin_run(self, run_id: int) -> None:
+        """以降の計測値を集計する実行を設定"""
+        self.run_id = run_id
+
+    def begin_year(self, year: int) -> None:
+        """以降の計測値を集計する年を設定"""
+        self.year = year
+
+    def measure(self, phase, ecosystem, context) -> None:
+        """
+        フェーズを実行し、経過時間と処理件数を現在の実行・年に加算
+
+        Args:
+            phase: 実行するフェーズ
+            ecosystem: エコシステム
+            context: ステップまたは年末のコンテキスト
+        """
+        before = ecosystem.work_counts()
+        start = perf_counter()
+        phase.run(ecosystem, context)
+        elapsed = perf_counter() - start
+        after = ecosystem.work_counts()
+
+        key = (self.run_id, self.year, phase.name)
+        record = self._records.get(key)
+        if record is None:
+            record = self._records[key] = [0.0] * (2 + len(COUNTERS))
+        record[0] += elapsed
+        record[1] += 1
+        for i, (b, a) in enumerate(zip(before, after)):
+            record[2 + i] += a - b
+
+    def report(self) -> InstrumentationReport:
+        """計測結果を取得"""
+        rows = [(*key, *record) for key, record in self._records.items()]
+        phases = pd.DataFrame(rows, columns=REPORT_COLUMNS)
+        return InstrumentationReport(phases=phases.astype({column: "int64" for column in ("calls", *COUNTERS)}))
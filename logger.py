@@ -1,11 +1,64 @@
+import atexit
 import logging
+import logging.handlers
+import queue
+from typing import Optional
 
 from rich.logging import RichHandler
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(message)s",
-    datefmt="[%X]",
-    filename="test.log"
-)
+# ログファイルの書式（コンソールはRichHandlerが時刻とレベルを表示する）
+FILE_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# ハンドラーとレベルはインポート時ではなく、エントリーポイントで configure_logging により設定する
 logger = logging.getLogger("rich")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def configure_logging(level: int = logging.INFO, log_file: Optional[str] = None,
+                      file_level: int = logging.DEBUG) -> None:
+    """
+    ルートロガーを設定する（エントリーポイントから呼び出す）
+
+    ログファイルへの出力はQueueHandlerでキューに入れ、QueueListenerのスレッドで書き込むため、
+    シミュレーションのスレッドはファイルへの書き込みを待たない。
+
+    Args:
+        level: コンソールに出力するレベル
+        log_file: ログファイルのパス（Noneの場合はファイルに出力しない）
+        file_level: ログファイルに出力するレベル
+    """
+    global _listener
+    shutdown_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+    console = RichHandler(level=level, show_path=False)
+    console.setFormatter(logging.Formatter("%(message)s", datefmt="[%X]"))
+    root.addHandler(console)
+    root.setLevel(level)
+
+    if log_file is not None:
+        file_handler = logging.FileHandler(log_file, encoding="utf-8")
+        file_handler.setFormatter(logging.Formatter(FILE_FORMAT))
+        file_handler.setLevel(file_level)
+        log_queue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.setLevel(file_level)
+        root.addHandler(queue_handler)
+        root.setLevel(min(level, file_level))
+        _listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+        _listener.start()
+
+def shutdown_logging() -> None:
+    """ログファイルのリスナーを停止し、キューに残ったログを書き出してファイルを閉じる"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+atexit.register(shutdown_logging)
@@ -1,8 +1,10 @@
+import logging
 from typing import List, Dict, Optional
 from stakeholders.consumer import Consumer
 from enablers.product import Product
 from logger import logger
 from collections import defaultdict
+import math
 from stakeholders.manufacturer import Manufacturer
 from stakeholders.paas_provider import PaasProvider
 from stakeholders.reuse_provider import ReuseProvider
@@ -11,7 +13,13 @@ from product_category import ProductCategory
 class Matching:
     """消費者と製品のマッチング処理を行うクラス"""
     
-    def __init__(self):
+    def __init__(self, weight: int = 1):
+        """
+        Args:
+            weight: 1エージェントが表す実際の消費者数（マッチング数の記録時に乗じる）
+        """
+        self.weight = weight
+        self.utility_evaluations = 0  # 計算した効用の累積数（計測用）
         self.matches_history: Dict[int, Dict[Consumer, Product]] = {}
         self.PROVIDER_TYPES = ['manufacturer', 'paas_provider', 'reuse_provider', 'remanufacturer']
         self._init_history()
@@ -20,6 +28,7 @@ class Matching:
         """履歴データの初期化"""
         # defaultdictを使用して、年次データの自動初期化
         self.matches_history = defaultdict(lambda: {provider: 0 for provider in self.PROVIDER_TYPES})
+        self.sample_sizes: Dict[int, int] = defaultdict(int)  # 年ごとのマッチングを試行したエージェント数
 
     def match(self, year: int, consumers: List[Consumer], product_categories: List[ProductCategory]) -> Dict[Consumer, ProductCategory]:
         """
@@ -29,8 +38,11 @@ class Matching:
             Dict[Consumer, ProductCategory]: 消費者と製品カテゴリのマッチング結果
         """
         matches = {}
+        self.sample_sizes[year] += sum(consumer.count for consumer in consumers)
+        self.utility_evaluations += len(consumers) * len(product_categories)
 
         # 各消費者について、最も効用の高い製品とマッチング
+        debug = logger.isEnabledFor(logging.DEBUG)
         for consumer in consumers:
             result = self._find_best_product_category(consumer, product_categories)
             if result:
@@ -38,7 +50,8 @@ class Matching:
                 matches[consumer] = best_product_category
                 best_product_category.add_candidate(consumer)
                 consumer.add_matched_product_category(best_product_category, total_price)
-                logger.debug(f"Matched consumer {consumer.name} to product {best_product_category.provider.name}")
+                if debug:
+                    logger.debug(f"Matched consumer {consumer.name} to product {best_product_category.provider.name}")
         
         # マッチング結果を記録
         self.record_matches(year, matches)
@@ -81,7 +94,7 @@ class Matching:
                 'product_category': product_category,
                 'total_price': total_price
             })
-        # 効用値を計算して製品をソート
+        # 効用値を計算
         product_categories_with_utility = [
             {
                 'product_category': p['product_category'],
@@ -90,38 +103,70 @@ class Matching:
             }
             for p in product_category_with_price
         ]
-        sorted_product_categories = sorted(
-            product_categories_with_utility,
-            key=lambda p: p['utility'],
-            reverse=True
-        )
-
-        logger.debug(
-            f"Sorted product categories with utility for {consumer.name}: " + 
-            f"{[(item['product_category'].provider.name, round(item['total_price']), round(item['utility'])) for item in sorted_product_categories]}"
-        )
-        if sorted_product_categories and sorted_product_categories[0]['utility'] > 0: # TODO: 効用が負の場合はマッチングしない
-            best_match = sorted_product_categories[0]
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            sorted_product_categories = sorted(
+                product_categories_with_utility,
+                key=lambda p: p['utility'],
+                reverse=True
+            )
+            logger.debug(
+                f"Sorted product categories with utility for {consumer.name}: " + 
+                f"{[(item['product_category'].provider.name, round(item['total_price']), round(item['utility'])) for item in sorted_product_categories]}"
+            )
+        # 効用が最大の製品カテゴリ（同じ効用の場合は先の製品カテゴリ。降順の安定ソートの先頭と同じ）
+        best_match = max(product_categories_with_utility, key=lambda p: p['utility'], default=None)
+        if best_match is not None and best_match['utility'] > 0: # TODO: 効用が負の場合はマッチングしない
             return best_match['product_category'], best_match['total_price']
         else:
-            logger.debug(f"No product found with positive utility for consumer {consumer}")
+            if debug:
+                logger.debug(f"No product found with positive utility for consumer {consumer}")
             return None
 
     def record_matches(self, time_step: int, matches: Dict[Consumer, Product]):
         """マッチングを記録"""
-        self.matches_history[time_step] = defaultdict(int)
+        # 1年に複数ステップがある場合は同じ年のマッチング数に加算
+        if time_step not in self.matches_history:
+            self.matches_history[time_step] = defaultdict(int)
         
-        # プロバイダーごとのマッチング数をカウント
+        # プロバイダーごとのマッチング数をカウント（コホートはメンバー数、重み付きエージェントは重みを乗じる）
         for consumer, product in matches.items():
             provider = product.provider        
             if isinstance(provider, Manufacturer):
-                self.matches_history[time_step]['manufacturer'] += 1
+                self.matches_history[time_step]['manufacturer'] += consumer.count * self.weight
             elif isinstance(provider, PaasProvider):
-                self.matches_history[time_step]['paas_provider'] += 1
+                self.matches_history[time_step]['paas_provider'] += consumer.count * self.weight
             elif isinstance(provider, ReuseProvider):
-                self.matches_history[time_step]['reuse_provider'] += 1
+                self.matches_history[time_step]['reuse_provider'] += consumer.count * self.weight
             elif isinstance(provider, Remanufacturer):
-                self.matches_history[time_step]['remanufacturer'] += 1
+                self.matches_history[time_step]['remanufacturer'] += consumer.count * self.weight
+
+    def get_yearly_matches(self, time_step: int) -> Dict[str, int]:
+        """指定年のプロバイダーごとのマッチング数を取得"""
+        return dict(self.matches_history.get(time_step, {}))
+
+    def get_yearly_standard_errors(self, time_step: int) -> Dict[str, float]:
+        """
+        指定年のプロバイダー別マッチング数の標準誤差を取得
+
+        n人のエージェントのうちk人がマッチした場合のマッチング数の推定値 w*k について、
+        母集団 w*n 人からの単純無作為抽出とみなした標準誤差
+        w * sqrt(n * p * (1 - p) * (1 - 1/w))（p = k/n）を計算する。
+
+        Args:
+            time_step: 年
+        Returns:
+            Dict[str, float]: プロバイダーごとの標準誤差（重みが1の場合は0）
+        """
+        n = self.sample_sizes.get(time_step, 0)
+        if n == 0:
+            return {}
+        w = self.weight
+        errors = {}
+        for provider, count in self.matches_history.get(time_step, {}).items():
+            p = count / w / n
+            errors[provider] = w * math.sqrt(n * p * (1 - p) * (1 - 1 / w))
+        return errors
 
     def get_matches_history(self) -> Dict[int, Dict[str, int]]:
         """プロバイダーごとのマッチング数の履歴を取得"""
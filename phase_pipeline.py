@@ -0,0 +1,436 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, TYPE_CHECKING
+import pandas as pd
+from stakeholders.consumer import create_consumer
+from stakeholders.consumer_cohort import ConsumerMode, create_cohorts
+from result_sink import YearlyResult
+from logger import logger
+if TYPE_CHECKING:
+    from stakeholders.consumer import Consumer
+    from enablers.product import Product
+    from instrumentation import Instrumentation
+
+@dataclass
+class StepContext:
+    """
+    1ステップのフェーズ間で受け渡すデータ
+
+    Attributes:
+        step: ステップ
+        year: ステップが属する年
+        new_consumers: 当ステップに生成した消費者（コホート）
+        new_products: 当ステップに生成した製品（在庫不足による追加生産を含む）
+        matches: 消費者とマッチした製品カテゴリ（または製品）
+        repaired_products: 当ステップに修理した製品
+    """
+    step: int
+    year: int
+    new_consumers: List['Consumer'] = field(default_factory=list)
+    new_products: List['Product'] = field(default_factory=list)
+    matches: Dict = field(default_factory=dict)
+    repaired_products: List['Product'] = field(default_factory=list)
+
+@dataclass
+class YearContext:
+    """
+    年末のフェーズ間で受け渡すデータ
+
+    Attributes:
+        year: 年
+        material_flow: 当年のマテリアルフロー
+        financial_flow: 当年の財務フロー
+        result: 年次サイクルの結果
+    """
+    year: int
+    material_flow: Optional[pd.DataFrame] = None
+    financial_flow: Optional[pd.DataFrame] = None
+    result: Optional[YearlyResult] = None
+
+class Phase:
+    """
+    年次サイクルの処理段階
+
+    フェーズはエコシステムとコンテキストのみを介してデータを受け渡すため、同じ名前の
+    別の実装（ベクトル化した実装など）に差し替えたり、単独で実行して計測したりできる。
+    状態はエコシステムに持たせ、フェーズ自体は状態を持たない。
+    """
+
+    name = ""
+
+    def run(self, ecosystem, context) -> None:
+        """
+        フェーズを実行
+
+        Args:
+            ecosystem: エコシステム
+            context: ステップまたは年末のコンテキスト
+        """
+        raise NotImplementedError
+
+class PhasePipeline:
+    """フェーズを宣言した順に実行するパイプライン"""
+
+    def __init__(self, phases: Iterable[Phase]):
+        """
+        Args:
+            phases: 実行するフェーズ（名前は一意）
+        """
+        self.phases: List[Phase] = list(phases)
+        names = self.names
+        if len(set(names)) != len(names):
+            raise ValueError(f"フェーズの名前が重複しています: {names}")
+        self.instrumentation: Optional['Instrumentation'] = None  # 設定した場合はフェーズごとに計測する
+
+    @property
+    def names(self) -> List[str]:
+        """フェーズの名前（実行順）"""
+        return [phase.name for phase in self.phases]
+
+    def phase(self, name: str) -> Phase:
+        """名前でフェーズを取得"""
+        return self.phases[self._index(name)]
+
+    def replace(self, name: str, phase: Phase) -> None:
+        """
+        フェーズを別の実装に差し替える
+
+        Args:
+            name: 差し替えるフェーズの名前
+            phase: 新しいフェーズ（同じ名前）
+        """
+        if phase.name != name:
+            raise ValueError(f"差し替えるフェーズの名前が一致しません: {name} != {phase.name}")
+        self.phases[self._index(name)] = phase
+
+    def _index(self, name: str) -> int:
+        for i, phase in enumerate(self.phases):
+            if phase.name == name:
+                return i
+        raise ValueError(f"不明なフェーズです: {name}")
+
+    def run(self, ecosystem, context) -> None:
+        """
+        フェーズを順に実行
+
+        Args:
+            ecosystem: エコシステム
+            context: ステップまたは年末のコンテキスト
+        """
+        instrumentation = self.instrumentation
+        if instrumentation is None:
+            for phase in self.phases:
+                phase.run(ecosystem, context)
+            return
+        for phase in self.phases:
+            instrumentation.measure(phase, ecosystem, context)
+
+# ---------- ステップのフェーズ ----------
+
+class ConsumerGenerationPhase(Phase):
+    """消費者の生成（年あたりの人数を重みで割り、ステップに配分）"""
+
+    name = "consumer_generation"
+
+    def run(self, ecosystem, context: StepContext) -> None:
+        step, year = context.step, context.year
+        debug = logger.isEnabledFor(logging.DEBUG)
+        for name, attribute in ecosystem.consumer_attributes.items():
+            indices = ecosystem.clock.share(ecosystem._sample_size(attribute.num_of_players), step)
+            if ecosystem.consumer_mode == ConsumerMode.COHORT:
+                # 選好と計画使用期間が同じ消費者をコホートにまとめて生成
+                cohorts = create_cohorts(
+                    segment=name,
+                    attributes=attribute,
+                    n=len(indices),
+                    year=year,
+                    consumer_id=ecosystem.num_of_consumers,
+                    product_categories=ecosystem.product_categories,
+                    clock=ecosystem.clock
+                )
+                ecosystem.num_of_consumers += len(cohorts)
+                if debug:
+                    logger.debug(f"--- Created {len(cohorts)} cohorts of {len(indices)} consumers of type {name} ---")
+                context.new_consumers.extend(cohorts)
+                continue
+            if debug:
+                logger.debug(f"--- Creating {len(indices)} consumers of type {name} ---")
+                logger.debug("part_worth_values: [ownership,subscription,reuse,remanufacture,price,spec]")
+            for i in indices:
+                consumer = create_consumer(
+                    consumer_type=attribute.consumer_type,
+                    consumer_id=ecosystem.num_of_consumers,
+                    segment=name,
+                    year=year,
+                    index=i,
+                    attributes=attribute,
+                    clock=ecosystem.clock
+                )
+                ecosystem.num_of_consumers += 1
+                if debug:
+                    logger.debug(f"Created consumer {consumer.name}, "
+                               f"part_worth_values: {[round(v, 3) for v in consumer.preference.part_worth_values.values()]}, "
+                               f"plan_of_use_period: {consumer.plan_of_use_period}")
+                context.new_consumers.append(consumer)
+        ecosystem.consumers.extend(context.new_consumers)
+
+class ProductGenerationPhase(Phase):
+    """製品カテゴリを持つプロバイダーの基本生産（年あたりの生産量をステップに配分）"""
+
+    name = "product_generation"
+
+    def run(self, ecosystem, context: StepContext) -> None:
+        step = context.step
+        for provider, attributes in (
+            (ecosystem.manufacturer, ecosystem.manufacturer_attributes),
+            (ecosystem.paas_provider, ecosystem.paas_provider_attributes),
+        ):
+            n = len(ecosystem.clock.share(ecosystem._sample_size(attributes.base_production_volume), step))
+            context.new_products.extend(ecosystem._create_products(provider, step, n))
+        ecosystem.products.extend(context.new_products)
+        ecosystem._register_products(context.new_products, step)
+
+class ProviderSupplyPhase(Phase):
+    """各プロバイダーによる製品の生産・提供（製品カテゴリを持たないエコシステム）"""
+
+    name = "product_generation"
+
+    def run(self, ecosystem, context: StepContext) -> None:
+        year = context.year
+        new_products = context.new_products
+        new_products.extend(ecosystem.manufacturer.create_products(ecosystem.product_attributes, year))
+        new_products.extend(ecosystem.paas_provider.provide_products(ecosystem.product_attributes, year))
+        new_products.extend(ecosystem.reuse_provider.provide_products(ecosystem.product_attributes, year))
+        ecosystem.products.extend(new_products)
+        for product in new_products:
+            ecosystem.material_flow_log.register(product)
+
+class MatchingPhase(Phase):
+    """消費者と製品カテゴリのマッチング"""
+
+    name = "matching"
+
+    def offers(self, ecosystem) -> list:
+        """マッチングの対象"""
+        return ecosystem.product_categories
+
+    def run(self, ecosystem, context: StepContext) -> None:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("---Getting available products---")
+            for product_category in ecosystem.product_categories:
+                logger.debug(f"{product_category.provider.name}: {len(product_category)} products available")
+        logger.debug("---Starting matching process---")
+        context.matches = ecosystem.matching.match(context.year, context.new_consumers, self.offers(ecosystem))
+
+class ProductMatchingPhase(MatchingPhase):
+    """消費者と製品のマッチング（製品カテゴリを持たないエコシステム）"""
+
+    def offers(self, ecosystem) -> list:
+        return ecosystem.products
+
+class AllocationPhase(Phase):
+    """マッチング結果から製品カテゴリの在庫の製品を割り当て、不足分は追加生産する"""
+
+    name = "allocation"
+
+    def run(self, ecosystem, context: StepContext) -> None:
+        step = context.step
+        for product_category in ecosystem.product_categories:
+            demand = sum(consumer.count for consumer in product_category.candidates)
+            allocated, shortfall = product_category.allocate(demand)
+            # 製品カテゴリの在庫が足りない場合は新規生産/調達し、在庫に入った製品を割り当てる
+            if shortfall > 0:
+                new_products = ecosystem._create_products(product_category.provider, step, shortfall)
+                context.new_products.extend(new_products)
+                ecosystem.products.extend(new_products)
+                ecosystem._register_products(new_products, step)
+                allocated.extend(product_category.allocate(shortfall)[0])
+            if ecosystem.consumer_mode == ConsumerMode.COHORT:
+                self._assign_cohorts(ecosystem, product_category, allocated, context)
+                continue
+            for consumer, product in zip(product_category.candidates, allocated):
+                if ecosystem.event_engine is not None:
+                    # 割当時に解放と故障のステップをサンプリング
+                    ecosystem.event_engine.assign(consumer, product, step)
+                    continue
+                consumer.set_possession(product, step)
+                product.add_consumer(step, consumer.consumer_id)
+                ecosystem.release_queue.schedule(consumer)
+
+    @staticmethod
+    def _assign_cohorts(ecosystem, product_category, allocated: list, context: StepContext) -> None:
+        """
+        取り出したまとめた製品をコホートのメンバー数ずつ分割して割り当て、余りは在庫に戻す
+
+        分割した製品はコホートに割り当て、元の製品（IDが小さい方）を次のコホートまたは在庫に残す。
+        当ステップに生成した製品から分割した製品は、生成した製品としてコストの計算対象に加える。
+        """
+        step = context.step
+        remaining = allocated[::-1]  # 末尾から取り出す
+        for cohort in product_category.candidates:
+            products, need = [], cohort.count
+            while need > 0:
+                product = remaining[-1]
+                if product.count > need:
+                    product = ecosystem._split_product(product, need)
+                    if product.created_step == step:
+                        context.new_products.append(product)
+                else:
+                    remaining.pop()
+                products.append(product)
+                need -= product.count
+            cohort.assign(products, step)
+            ecosystem.release_queue.schedule(cohort)
+        for product in remaining:
+            product.provider.update_availability(product)
+
+class ProductCostPhase(Phase):
+    """生成した製品のコスト計算"""
+
+    name = "product_cost"
+
+    def run(self, ecosystem, context: StepContext) -> None:
+        ecosystem.business_model.calculate_product_costs(context.new_products, context.step)
+
+class BillingPhase(Phase):
+    """マッチング結果の売上計算"""
+
+    name = "billing"
+
+    def run(self, ecosystem, context: StepContext) -> None:
+        if ecosystem.business_model:
+            ecosystem.business_model.calculate_revenues(context.matches, context.step)
+
+class StatusUpdatePhase(Phase):
+    """消費者と製品の状態更新（解放、廃棄、故障と修理、移管）"""
+
+    name = "status_update"
+
+    def run(self, ecosystem, context: StepContext) -> None:
+        if ecosystem.event_engine is not None:
+            context.repaired_products = ecosystem._process_events(context.step)
+        else:
+            context.repaired_products = ecosystem._update_status_yearly(context.step)
+
+class ConsumerReleasePhase(Phase):
+    """製品を使用中の消費者を登録し、当ステップに解放する消費者のみを処理"""
+
+    name = "consumer_update"
+
+    def run(self, ecosystem, context: StepContext) -> None:
+        logger.debug("---Updating consumer status---")
+        for consumer in context.new_consumers:
+            if consumer.matched_product is not None:
+                ecosystem.release_queue.schedule(consumer)
+        for consumer in ecosystem.release_queue.pop_releases(context.step):
+            consumer.release(context.step)
+
+class ProductScanPhase(Phase):
+    """全製品を走査して状態更新、故障と修理、移管を行う"""
+
+    name = "product_update"
+
+    def run(self, ecosystem, context: StepContext) -> None:
+        year = context.year
+        debug = logger.isEnabledFor(logging.DEBUG)
+        logger.debug("---Updating product status---")
+        failures_sampled = 0
+        for product in ecosystem.products:
+            # 年次の状態更新（年齢と使用期間）
+            product.update_yearly_status()
+
+            # マッチしている製品の故障判定と修理
+            if product.matched:
+                product.determine_malfunction()
+                failures_sampled += 1
+                if product.malfunction:
+                    if debug:
+                        logger.debug(f"Product {product.name} malfunctioned")
+                    if product.provider is not None:
+                        # 修理コストを計算
+                        ecosystem.business_model.calculate_repair_costs(product, year)
+                        product.provider.repair_product(product)
+                        context.repaired_products.append(product)
+                        if debug:
+                            logger.debug(f"Product {product.name} repaired by {product.provider.name}")
+            else:
+                # 未マッチ製品の移管処理
+                if product.next_provider == "paas_provider":
+                    product.add_provider(year+1, ecosystem.paas_provider)
+                    if debug:
+                        logger.debug(f"Product {product.name} is transferred to {ecosystem.paas_provider.name}")
+                elif product.next_provider == "reuse_provider":
+                    product.add_provider(year+1, ecosystem.reuse_provider)
+                    if debug:
+                        logger.debug(f"Product {product.name} is transferred to {ecosystem.reuse_provider.name}")
+                elif product.next_provider == "recycler":
+                    product.add_provider(year+1, ecosystem.recycler)
+                    if debug:
+                        logger.debug(f"Product {product.name} is transferred to {ecosystem.recycler.name}")
+        ecosystem.products_scanned += len(ecosystem.products)
+        ecosystem.failures_sampled += failures_sampled
+
+class RepairCostPhase(Phase):
+    """修理した製品の修理コスト計算"""
+
+    name = "repair_cost"
+
+    def run(self, ecosystem, context: StepContext) -> None:
+        ecosystem.business_model.calculate_repair_costs(context.repaired_products, context.step)
+
+class CandidateClearPhase(Phase):
+    """製品カテゴリの候補のクリア（在庫は製品の状態の変化に応じて更新済み）"""
+
+    name = "candidate_clear"
+
+    def run(self, ecosystem, context: StepContext) -> None:
+        for product_category in ecosystem.product_categories:
+            product_category.clear_candidates()
+
+# ---------- 年末のフェーズ ----------
+
+class ProfitPhase(Phase):
+    """当年の利益の計算"""
+
+    name = "profit"
+
+    def run(self, ecosystem, context: YearContext) -> None:
+        ecosystem.business_model.calculate_profit(context.year)
+
+class FlowAggregationPhase(Phase):
+    """当年のマテリアルフローと財務フローをフロー行列から取得"""
+
+    name = "flow_aggregation"
+
+    def run(self, ecosystem, context: YearContext) -> None:
+        context.material_flow, context.financial_flow = ecosystem.collect_yearly_flows(context.year)
+
+class ResultPhase(Phase):
+    """台帳の当年の指標とマッチング数、フローから年次サイクルの結果を生成"""
+
+    name = "result"
+
+    def __init__(self, metrics: Iterable[str]):
+        """
+        Args:
+            metrics: 結果に含める指標名
+        """
+        self.metrics = tuple(metrics)
+
+    def run(self, ecosystem, context: YearContext) -> None:
+        year = context.year
+        metrics = ecosystem.business_model.metrics
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("---Calculating business model revenues---")
+            for metric in self.metrics:
+                logger.debug(f"{metric}: {metrics.metric_values(year, metric)}")
+        context.result = YearlyResult(
+            year=year,
+            metrics={metric: metrics.metric_values(year, metric) for metric in self.metrics},
+            matches=ecosystem.matching.get_yearly_matches(year),
+            material_flow=context.material_flow,
+            financial_flow=context.financial_flow,
+            standard_errors=(
+                {'matches_se': ecosystem.matching.get_yearly_standard_errors(year)} if ecosystem.agent_weight > 1 else {}
+            )
+        )
@@ -9,11 +9,24 @@ if TYPE_CHECKING:
     from stakeholders.consumer import Consumer
     from enablers.product import Product
     from product_category import ProductCategory
+    from enablers.time_resolution import StepClock
+
+# 部分効用値の属性名
+PART_WORTH_KEYS = ("ownership", "subscription", "reuse", "remanufacture", "price", "spec")
 
 class Preference:
+    # 部分効用値は辞書ではなく属性ごとのfloatで保持する（消費者ごとに生成されるため）
+    __slots__ = ("owner", "ownership", "subscription", "reuse", "remanufacture", "price", "spec")
+
     def __init__(self, part_worth_values: Dict, consumer: 'Consumer') -> None:
         self.owner: 'Consumer' = consumer
-        self.part_worth_values: Dict = part_worth_values
+        for key in PART_WORTH_KEYS:
+            setattr(self, key, float(part_worth_values[key]))
+
+    @property
+    def part_worth_values(self) -> Dict[str, float]:
+        """部分効用値の辞書"""
+        return {key: getattr(self, key) for key in PART_WORTH_KEYS}
 
     def calculate_utility(self, product_category: 'ProductCategory', total_price: float) -> float:
         """
@@ -26,56 +39,76 @@ class Preference:
         Returns:
             float: 効用値
         """
-        # 各ステータスに対する選好の重み付け
-        status_utility = (
-            # 新品購入の選好
-            self.part_worth_values['ownership'] * 
-            (1 if isinstance(product_category.provider, Manufacturer) else 0) +
-            
-            # サブスクリプションの選好
-            self.part_worth_values['subscription'] * 
-            (1 if isinstance(product_category.provider, PaasProvider) else 0) +
-            
-            # リユース品の選好
-            self.part_worth_values['reuse'] * 
-            (1 if isinstance(product_category.provider, ReuseProvider) else 0) +
-            
-            # リマニュファクチャリング品の選好
-            self.part_worth_values['remanufacture'] * 
-            (1 if isinstance(product_category.provider, Remanufacturer) else 0)
-        )
-
-        price_utility = (
-            # 新品購入の選好
-            self.part_worth_values['price'] * total_price * 
-            (1 if isinstance(product_category.provider, Manufacturer) else 0) +
-
-            # サブスクリプションの選好
-            self.part_worth_values['price'] * total_price * self.owner.plan_of_use_period * 
-            (1 if isinstance(product_category.provider, PaasProvider) else 0) +
-
-            # リユース品の選好
-            self.part_worth_values['price'] * total_price * 
-            (1 if isinstance(product_category.provider, ReuseProvider) else 0) +
-
-            # リマニュファクチャリング品の選好
-            self.part_worth_values['price'] * total_price * 
-            (1 if isinstance(product_category.provider, Remanufacturer) else 0)
-        )
-
-        # 総合的な効用値の計算
-        utility = (
-            # ステータスに対する選好
-            status_utility
-            
-            # 価格の選好（負の効用）
-            - price_utility
-            #TODO: リユースに切り替える偏差
-            + 19
-            
-            # スペックの選好
-            # + self.part_worth_values['spec'] * product.age
-        )
+        return calculate_utility(self, product_category, total_price, self.owner.plan_of_use_period, self.owner.clock)
+
+def calculate_utility(part_worths, product_category: 'ProductCategory', total_price: float,
+                      plan_of_use_period, clock: 'StepClock'):
+    """
+    部分効用値と計画使用期間から製品カテゴリに対する効用値を計算
+
+    効用値は部分効用値の1次式である。部分効用値と計画使用期間には、消費者1人分のスカラーの
+    代わりに複数の消費者分の配列を渡すこともできる（コホートの生成時の一括計算用）。
+
+    Args:
+        part_worths: 属性ごとの部分効用値を属性として持つオブジェクト（Preferenceなど）
+        product_category: 対象製品カテゴリ
+        total_price: 使用期間を考慮した総価格
+        plan_of_use_period: 計画使用期間（ステップ数）
+        clock: ステップと年の換算
+
+    Returns:
+        効用値（部分効用値と同じ形状）
+    """
+    # 各ステータスに対する選好の重み付け
+    status_utility = (
+        # 新品購入の選好
+        part_worths.ownership * 
+        (1 if isinstance(product_category.provider, Manufacturer) else 0) +
+        
+        # サブスクリプションの選好
+        part_worths.subscription * 
+        (1 if isinstance(product_category.provider, PaasProvider) else 0) +
+        
+        # リユース品の選好
+        part_worths.reuse * 
+        (1 if isinstance(product_category.provider, ReuseProvider) else 0) +
+        
+        # リマニュファクチャリング品の選好
+        part_worths.remanufacture * 
+        (1 if isinstance(product_category.provider, Remanufacturer) else 0)
+    )
+
+    price_utility = (
+        # 新品購入の選好
+        part_worths.price * total_price * 
+        (1 if isinstance(product_category.provider, Manufacturer) else 0) +
+
+        # サブスクリプションの選好（ステップあたりの料金×計画使用期間のステップ数）
+        part_worths.price * clock.per_step_amount(total_price) * plan_of_use_period * 
+        (1 if isinstance(product_category.provider, PaasProvider) else 0) +
+
+        # リユース品の選好
+        part_worths.price * total_price * 
+        (1 if isinstance(product_category.provider, ReuseProvider) else 0) +
+
+        # リマニュファクチャリング品の選好
+        part_worths.price * total_price * 
+        (1 if isinstance(product_category.provider, Remanufacturer) else 0)
+    )
+
+    # 総合的な効用値の計算
+    utility = (
+        # ステータスに対する選好
+        status_utility
+        
+        # 価格の選好（負の効用）
+        - price_utility
+        #TODO: リユースに切り替える偏差
+        + 19
+        
+        # スペックの選好
+        # + part_worths.spec * product.age
+    )
 
-        return utility
+    return utility
 
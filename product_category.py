@@ -1,49 +1,65 @@
 from stakeholders.provider import Provider
 from stakeholders.consumer import Consumer
-from typing import Union, List, TYPE_CHECKING
+from typing import List, Tuple, TYPE_CHECKING
 if TYPE_CHECKING:
+    from enablers.idle_inventory import IdleInventory
     from enablers.product import Product
 
 class ProductCategory:
+    __slots__ = ("_provider", "candidates")
+
     def __init__(
         self, provider: Provider
     ):
         self._provider = provider
-        self.product_list = []  # このカテゴリに属する製品のリスト
         self.candidates = []  # このカテゴリの使用する顧客の候補
-    
-    def add_products(self, products: Union['Product', List['Product']]) -> None:
+
+    @property
+    def inventory(self) -> 'IdleInventory':
+        """
+        このカテゴリの在庫（プロバイダーの利用可能な製品のプール）
+
+        製品の状態の変化に応じて随時更新されるため、年ごとに作り直さない。
+        """
+        return self._provider.available_products
+
+    def __len__(self) -> int:
+        """在庫の製品数（まとめた製品は1つと数える）"""
+        return len(self.inventory)
+
+    def allocate(self, n: int) -> Tuple[List['Product'], int]:
         """
-        このカテゴリに製品を追加する。
-        単一の製品または製品のリストを受け取る。
-        
+        在庫から製品IDの順に製品を取り出す（1製品あたりO(log 在庫数)）
+
+        まとめた製品（Product.count）は数量分として数えるため、最後に取り出した製品の数量が
+        不足数を超える場合がある（超えた分の分割と在庫への返却は呼び出し側で行う）。
+
         Args:
-            products: 追加する製品または製品のリスト
-        """
-        from enablers.product import Product
-
-        if isinstance(products, Product):
-            # 単一の製品の場合
-            self.product_list.append(products)
-            products.set_product_category(self)  # 製品にもセットしておく
-        else:
-            # 製品リストの場合
-            self.product_list.extend(products)
-            for product in products:
-                product.set_product_category(self)  # 各製品にもセットしておく
-    
+            n: 取り出す製品数（マッチした候補の数）
+        Returns:
+            Tuple[List[Product], int]: 取り出した製品と、在庫の不足数
+        """
+        inventory = self.inventory
+        products = []
+        while n > 0 and len(inventory) > 0:
+            product = inventory.pop_first()
+            product.set_product_category(self)  # 製品にもセットしておく
+            products.append(product)
+            n -= product.count
+        return products, max(n, 0)
+
     def add_candidate(self, candidate: Consumer) -> None:
         """
         このカテゴリに引数の消費者を追加する。
         """
         self.candidates.append(candidate)
-    
-    def remove_all(self) -> None:
+
+    def clear_candidates(self) -> None:
         """
-        このカテゴリに属する製品と候補をすべて削除する。
+        このカテゴリの候補をすべて削除する。
         """
-        self.product_list = []
         self.candidates = []
+
     @property
     def provider(self) -> Provider:
         """
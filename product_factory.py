@@ -1,4 +1,4 @@
-from typing import Dict, Any, Type, TYPE_CHECKING
+from typing import Dict, List, Any, Type, TYPE_CHECKING
 import logging
 logger = logging.getLogger(__name__)
 
@@ -6,37 +6,69 @@ if TYPE_CHECKING:
     from enablers.product import Product, StandardProduct
     from enablers.product import ProductType
 
-def create_product(product_type: 'ProductType', attributes: Dict[str, Any]) -> 'Product':
+def resolve_product_class(product_type: 'ProductType') -> Type['Product']:
     """
-    製品クラスのファクトリー関数
-    
+    製品タイプに対応する製品クラスを取得
+
     Args:
         product_type: 製品タイプ（ProductType列挙型）
-        attributes: 製品の属性
-        
+
     Returns:
-        Product: 生成された製品インスタンス
+        Type[Product]: 製品クラス
     """
     # 実行時にインポート
-    from enablers.product import Product, ProductType, StandardProduct
-    
+    from enablers.product import ProductType, StandardProduct
+
     # 製品タイプと対応するクラスのマッピング
     product_map = {
         ProductType.STANDARD: StandardProduct,
     }
-    
+
     if product_type not in product_map:
         raise ValueError(f"Unsupported product type: {product_type}. Available types: {list(product_map.keys())}")
+    return product_map[product_type]
+
+def create_product(product_type: 'ProductType', attributes: Dict[str, Any]) -> 'Product':
+    """
+    製品クラスのファクトリー関数
     
+    Args:
+        product_type: 製品タイプ（ProductType列挙型）
+        attributes: 製品の属性
+        
+    Returns:
+        Product: 生成された製品インスタンス
+    """
+    product_class = resolve_product_class(product_type)
+
     try:
         # 製品インスタンスの生成
-        product_class = product_map[product_type]
         product = product_class(attributes)
-        logger.debug(f"Creating product {attributes['name']}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Creating product {product.name}")
         return product
         
     except Exception as e:
         logger.error(f"Failed to create product of type {product_type}")
         logger.error(f"Attributes: {attributes}")
         logger.error(f"Error: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+def create_products_batch(product_type: 'ProductType', attributes: Dict[str, Any], n: int) -> List['Product']:
+    """
+    同じ属性の製品をまとめて生成するファクトリー関数
+
+    製品クラスの解決と属性からの初期化は1度だけ行い、その製品を原型として残りの製品を複製する。
+
+    Args:
+        product_type: 製品タイプ（ProductType列挙型）
+        attributes: 製品の属性（通し番号を除く）
+        n: 生成する製品数（通し番号は0からn-1）
+
+    Returns:
+        List[Product]: 生成された製品インスタンス（通し番号の順）
+    """
+    if n <= 0:
+        return []
+    prototype = create_product(product_type, dict(attributes, index=0))
+    return [prototype] + [prototype.clone(index) for index in range(1, n)]
@@ -0,0 +1,411 @@
+from enum import Enum
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from enablers.metric_ledger import MetricLedger, PROVIDERS, METRICS
+
+# 指標テーブルのスキーマ（縦持ち形式）
+METRIC_COLUMNS = ["config", "run", "year", "provider", "metric", "value"]
+# フローテーブルのスキーマ
+FLOW_COLUMNS = ["config", "run", "year", "flow", "source", "target", "value"]
+
+METRIC_DTYPES = {"config": str, "run": "int64", "year": "int64", "provider": str, "metric": str, "value": "float64"}
+FLOW_DTYPES = {"config": str, "run": "int64", "year": "int64", "flow": str, "source": str, "target": str, "value": "float64"}
+
+@dataclass
+class YearlyResult:
+    """
+    年次サイクルの結果
+
+    Attributes:
+        year: 年
+        metrics: 指標名（revenue, product_cost, repair_cost, profit）ごとのプロバイダー別の値
+        matches: 当年のプロバイダー別マッチング数
+        material_flow: 当年に発生したマテリアルフロー（source, target, value）
+        financial_flow: 当年に発生した財務フロー（source, target, value）
+        standard_errors: 重み付きエージェントの場合の指標名（matches_seなど）ごとのプロバイダー別の標準誤差
+    """
+    year: int
+    metrics: Dict[str, Dict[str, float]]
+    matches: Dict[str, int]
+    material_flow: pd.DataFrame
+    financial_flow: pd.DataFrame
+    standard_errors: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+    def metric_rows(self, config_name: str, run_id: int) -> Dict[str, list]:
+        """指標テーブルの行を列ごとのリストとして取得"""
+        rows = {column: [] for column in METRIC_COLUMNS}
+
+        def append(provider: str, metric: str, value: float) -> None:
+            rows["config"].append(config_name)
+            rows["run"].append(run_id)
+            rows["year"].append(self.year)
+            rows["provider"].append(provider)
+            rows["metric"].append(metric)
+            rows["value"].append(float(value))
+
+        for metric, values in self.metrics.items():
+            for provider, value in values.items():
+                append(provider, metric, value)
+        for provider, count in self.matches.items():
+            append(provider, "matches", count)
+        for metric, values in self.standard_errors.items():
+            for provider, value in values.items():
+                append(provider, metric, value)
+        return rows
+
+    def flow_rows(self, config_name: str, run_id: int) -> Dict[str, list]:
+        """フローテーブルの行を列ごとのリストとして取得"""
+        rows = {column: [] for column in FLOW_COLUMNS}
+        for flow_name, flow in (("material", self.material_flow), ("financial", self.financial_flow)):
+            for source, target, value in zip(flow["source"], flow["target"], flow["value"]):
+                rows["config"].append(config_name)
+                rows["run"].append(run_id)
+                rows["year"].append(self.year)
+                rows["flow"].append(flow_name)
+                rows["source"].append(source)
+                rows["target"].append(target)
+                rows["value"].append(float(value))
+        return rows
+
+class ResultSinkType(Enum):
+    """結果の出力先の種類"""
+    MEMORY = "memory"
+    CSV = "csv"
+    PARQUET = "parquet"
+
+class ResultSink:
+    """年次結果の出力先の基底クラス"""
+
+    def write(self, config_name: str, run_id: int, result: YearlyResult) -> None:
+        """年次結果を書き込む"""
+        self._write_rows(
+            config_name, run_id, result.year,
+            pd.DataFrame(result.metric_rows(config_name, run_id), columns=METRIC_COLUMNS).astype(METRIC_DTYPES),
+            pd.DataFrame(result.flow_rows(config_name, run_id), columns=FLOW_COLUMNS).astype(FLOW_DTYPES)
+        )
+
+    def _write_rows(self, config_name: str, run_id: int, year: int, metrics: pd.DataFrame, flows: pd.DataFrame) -> None:
+        """行を書き込む（サブクラスで実装）"""
+        raise NotImplementedError
+
+    def discard_after(self, run_id: int, year: int) -> None:
+        """
+        指定した（実行, 年）より後の行を削除する（チェックポイントからの再開用）
+
+        Args:
+            run_id: 実行番号
+            year: 残す最後の年（-1の場合はその実行の行を全て削除）
+        """
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """出力済みの結果を全て削除する（サブクラスで実装）"""
+        raise NotImplementedError
+
+    def read_metrics(self) -> pd.DataFrame:
+        """指標テーブルを読み込む（サブクラスで実装）"""
+        raise NotImplementedError
+
+    def read_flows(self) -> pd.DataFrame:
+        """フローテーブルを読み込む（サブクラスで実装）"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """出力先を閉じる"""
+        pass
+
+    @staticmethod
+    def _keep_until(frame: pd.DataFrame, run_id: int, year: int) -> pd.DataFrame:
+        """指定した（実行, 年）以前の行のみを残す"""
+        return frame[(frame["run"] < run_id) | ((frame["run"] == run_id) & (frame["year"] <= year))]
+
+class InMemorySink(ResultSink):
+    """メモリ上に年次ごとのテーブルとして保持する出力先"""
+
+    def __init__(self):
+        self._metrics = []
+        self._flows = []
+
+    def _write_rows(self, config_name: str, run_id: int, year: int, metrics: pd.DataFrame, flows: pd.DataFrame) -> None:
+        self._metrics.append(metrics)
+        self._flows.append(flows)
+
+    def discard_after(self, run_id: int, year: int) -> None:
+        self._metrics = [self._keep_until(frame, run_id, year) for frame in self._metrics]
+        self._flows = [self._keep_until(frame, run_id, year) for frame in self._flows]
+
+    def clear(self) -> None:
+        self._metrics = []
+        self._flows = []
+
+    def read_metrics(self) -> pd.DataFrame:
+        if not self._metrics:
+            return pd.DataFrame(columns=METRIC_COLUMNS).astype(METRIC_DTYPES)
+        return pd.concat(self._metrics, ignore_index=True)
+
+    def read_flows(self) -> pd.DataFrame:
+        if not self._flows:
+            return pd.DataFrame(columns=FLOW_COLUMNS).astype(FLOW_DTYPES)
+        return pd.concat(self._flows, ignore_index=True)
+
+class CsvSink(ResultSink):
+    """指標とフローをそれぞれCSVファイルに追記する出力先"""
+
+    def __init__(self, directory: Path):
+        """
+        Args:
+            directory: metrics.csvとflows.csvの出力先ディレクトリ
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        self.metrics_path = directory / "metrics.csv"
+        self.flows_path = directory / "flows.csv"
+
+    def _write_rows(self, config_name: str, run_id: int, year: int, metrics: pd.DataFrame, flows: pd.DataFrame) -> None:
+        metrics.to_csv(self.metrics_path, mode="a", index=False, header=not self.metrics_path.exists())
+        flows.to_csv(self.flows_path, mode="a", index=False, header=not self.flows_path.exists())
+
+    def discard_after(self, run_id: int, year: int) -> None:
+        for path, dtypes in ((self.metrics_path, METRIC_DTYPES), (self.flows_path, FLOW_DTYPES)):
+            if path.exists():
+                frame = pd.read_csv(path, dtype=dtypes, keep_default_na=False, float_precision="round_trip")
+                self._keep_until(frame, run_id, year).to_csv(path, index=False)
+
+    def clear(self) -> None:
+        for path in (self.metrics_path, self.flows_path):
+            if path.exists():
+                path.unlink()
+
+    def read_metrics(self) -> pd.DataFrame:
+        if not self.metrics_path.exists():
+            return pd.DataFrame(columns=METRIC_COLUMNS).astype(METRIC_DTYPES)
+        return pd.read_csv(self.metrics_path, dtype=METRIC_DTYPES, keep_default_na=False, float_precision="round_trip")
+
+    def read_flows(self) -> pd.DataFrame:
+        if not self.flows_path.exists():
+            return pd.DataFrame(columns=FLOW_COLUMNS).astype(FLOW_DTYPES)
+        return pd.read_csv(self.flows_path, dtype=FLOW_DTYPES, keep_default_na=False, float_precision="round_trip")
+
+class ParquetSink(ResultSink):
+    """
+    年次ごとにParquetファイルを書き出す出力先
+
+    metrics/とflows/の下に (実行, 年) ごとのファイルを作成し、
+    ディレクトリ単位でデータセットとして読み込める。pyarrowが必要。
+    """
+
+    def __init__(self, directory: Path):
+        """
+        Args:
+            directory: metrics/とflows/の出力先ディレクトリ
+        """
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("ParquetSinkを使用するにはpyarrowをインストールしてください") from e
+        self.metrics_dir = directory / "metrics"
+        self.flows_dir = directory / "flows"
+        self.metrics_dir.mkdir(parents=True, exist_ok=True)
+        self.flows_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def _file_name(run_id: int, year: int) -> str:
+        return f"run_{run_id:04d}_year_{year:04d}.parquet"
+
+    def _write_rows(self, config_name: str, run_id: int, year: int, metrics: pd.DataFrame, flows: pd.DataFrame) -> None:
+        metrics.to_parquet(self.metrics_dir / self._file_name(run_id, year), index=False)
+        flows.to_parquet(self.flows_dir / self._file_name(run_id, year), index=False)
+
+    def discard_after(self, run_id: int, year: int) -> None:
+        for directory in (self.metrics_dir, self.flows_dir):
+            for path in directory.glob("run_*_year_*.parquet"):
+                _, file_run, _, file_year = path.stem.split("_")
+                if int(file_run) > run_id or (int(file_run) == run_id and int(file_year) > year):
+                    path.unlink()
+
+    def clear(self) -> None:
+        for directory in (self.metrics_dir, self.flows_dir):
+            for path in directory.glob("run_*_year_*.parquet"):
+                path.unlink()
+
+    def _read(self, directory: Path, columns: List[str], dtypes: Dict) -> pd.DataFrame:
+        paths = sorted(directory.glob("run_*_year_*.parquet"))
+        if not paths:
+            return pd.DataFrame(columns=columns).astype(dtypes)
+        return pd.concat([pd.read_parquet(path) for path in paths], ignore_index=True)
+
+    def read_metrics(self) -> pd.DataFrame:
+        return self._read(self.metrics_dir, METRIC_COLUMNS, METRIC_DTYPES)
+
+    def read_flows(self) -> pd.DataFrame:
+        return self._read(self.flows_dir, FLOW_COLUMNS, FLOW_DTYPES)
+
+def create_result_sink(result_sink_type: ResultSinkType, directory: Path) -> ResultSink:
+    """
+    結果の出力先ファクトリー関数
+
+    Args:
+        result_sink_type: 出力先の種類
+        directory: 出力先ディレクトリ（メモリの場合は使用しない）
+    Returns:
+        ResultSink: 生成された出力先
+    """
+    if result_sink_type == ResultSinkType.MEMORY:
+        return InMemorySink()
+    result_sink_map = {
+        ResultSinkType.CSV: CsvSink,
+        ResultSinkType.PARQUET: ParquetSink,
+    }
+    return result_sink_map[result_sink_type](directory)
+
+# ---------------------------------------------------------------------------
+# 可視化用の履歴データへの変換
+# ---------------------------------------------------------------------------
+
+def run_axis(metrics: pd.DataFrame) -> Tuple[np.ndarray, int]:
+    """
+    指標テーブルから、シミュレーションした実行IDと年数を取得
+
+    フローが1件も発生しなかった実行や年はフローテーブルに行がないため、実行と年の軸は
+    全ての実行・年に行がある指標テーブルから決める。
+
+    Args:
+        metrics: 指標テーブル
+    Returns:
+        Tuple[np.ndarray, int]: 昇順の実行IDと年数
+    """
+    runs = np.sort(pd.unique(metrics["run"]))
+    num_of_years = int(metrics["year"].max()) + 1 if not metrics.empty else 0
+    return runs, num_of_years
+
+def to_metric_ledgers(metrics: pd.DataFrame) -> List[MetricLedger]:
+    """
+    指標テーブルから、実行ごとの指標の台帳（年×プロバイダー×指標）を作成
+
+    Args:
+        metrics: 指標テーブル
+    Returns:
+        List[MetricLedger]: 実行ごとの台帳
+    """
+    frame = metrics[metrics["metric"].isin(METRICS)]
+    runs, num_of_years = run_axis(metrics)
+    values = np.zeros((len(runs), num_of_years, len(PROVIDERS), len(METRICS)), dtype=np.float64)
+    provider_index = {provider: i for i, provider in enumerate(PROVIDERS)}
+    metric_index = {metric: i for i, metric in enumerate(METRICS)}
+    values[
+        np.searchsorted(runs, frame["run"].to_numpy()),
+        frame["year"].to_numpy(),
+        frame["provider"].map(provider_index).to_numpy(),
+        frame["metric"].map(metric_index).to_numpy()
+    ] = frame["value"].to_numpy()
+    return [MetricLedger.from_values(run_values) for run_values in values]
+
+def to_matches_histories(metrics: pd.DataFrame) -> List[pd.Series]:
+    """
+    指標テーブルから、実行ごとのマッチング数の履歴を作成
+
+    各年の値は当年のプロバイダー別マッチング数の辞書とする。
+
+    Args:
+        metrics: 指標テーブル
+    Returns:
+        List[pd.Series]: 実行ごとの履歴
+    """
+    histories = []
+    for _, run_frame in metrics.groupby("run", sort=True):
+        history = {int(year): {} for year in pd.unique(run_frame["year"])}
+        matches = run_frame[run_frame["metric"] == "matches"]
+        for year, provider, value in zip(matches["year"], matches["provider"], matches["value"]):
+            history[int(year)][provider] = int(value)
+        histories.append(pd.Series(list(history.values()), index=list(history.keys())))
+    return histories
+
+def to_cumulative_flows(flows: pd.DataFrame) -> pd.DataFrame:
+    """
+    年次のフローテーブルから、各年末時点の累積フローのテーブルを作成
+
+    Args:
+        flows: フローテーブル（各年に発生したフロー）
+    Returns:
+        pd.DataFrame: 同じスキーマの累積フローテーブル（各年に全てのsource, targetの組を含む）
+    """
+    if flows.empty:
+        return flows.copy()
+    keys = ["config", "run", "flow", "source", "target"]
+    totals = flows.groupby(keys + ["year"], as_index=False)["value"].sum()
+    # 各 (設定, 実行) の全ての年について、発生しなかった組を0で補完してから累積
+    years = flows[["config", "run", "year"]].drop_duplicates()
+    grid = totals[keys].drop_duplicates().merge(years, on=["config", "run"])
+    cumulative = grid.merge(totals, on=keys + ["year"], how="left").fillna({"value": 0.0})
+    cumulative = cumulative.sort_values(keys + ["year"]).reset_index(drop=True)
+    cumulative["value"] = cumulative.groupby(keys)["value"].cumsum()
+    return cumulative.sort_values(["config", "run", "year", "flow", "source", "target"])[FLOW_COLUMNS].reset_index(drop=True)
+
+def to_flow_histories(flows: pd.DataFrame, flow: str, runs: Sequence[int], cumulative: bool = False) -> List[pd.Series]:
+    """
+    フローテーブルから、実行ごとの年次フロー（source, target, valueのDataFrame）の履歴を作成
+
+    Args:
+        flows: フローテーブル
+        flow: フローの種類（material, financial）
+        runs: シミュレーションした実行ID（run_axisで指標テーブルから取得）。フローが発生しなかった
+            実行は空の履歴とするため、戻り値の長さは常に実行数と一致する
+        cumulative: Trueの場合、各年の値を年末時点の累積フローとする
+    Returns:
+        List[pd.Series]: 実行ごとの履歴（runsの順）
+    """
+    if cumulative:
+        flows = to_cumulative_flows(flows)
+    frame = flows[flows["flow"] == flow]
+    run_frames = dict(tuple(frame.groupby("run", sort=True)))
+    histories = []
+    for run_id in runs:
+        years = []
+        year_flows = []
+        run_frame = run_frames.get(run_id)
+        if run_frame is not None:
+            for year, year_frame in run_frame.groupby("year", sort=True):
+                years.append(int(year))
+                year_flows.append(year_frame[["source", "target", "value"]].reset_index(drop=True))
+        histories.append(pd.Series(year_flows, index=years, dtype=object))
+    return histories
+
+def to_flow_matrices(flows: pd.DataFrame, flow: str, nodes: List[str], runs: np.ndarray,
+                     num_of_years: int) -> np.ndarray:
+    """
+    フローテーブルから、実行×年×ノード×ノードのフロー行列を作成
+
+    Args:
+        flows: フローテーブル
+        flow: フローの種類（material, financial）
+        nodes: ノード名のリスト（行列のインデックス順）
+        runs: シミュレーションした昇順の実行ID（run_axisで指標テーブルから取得）
+        num_of_years: シミュレーションした年数（run_axisで指標テーブルから取得）
+    Returns:
+        np.ndarray: matrices[run, year, source, target] にフローの量を格納した配列
+            （フローが発生しなかった実行・年は0で、実行の軸の長さは常に実行数と一致する）
+    """
+    frame = flows[flows["flow"] == flow]
+    matrices = np.zeros((len(runs), num_of_years, len(nodes), len(nodes)), dtype=np.float64)
+    if frame.empty:
+        return matrices
+
+    node_index = {node: i for i, node in enumerate(nodes)}
+    unknown = (set(frame["source"]) | set(frame["target"])) - set(node_index)
+    if unknown:
+        raise ValueError(f"不明なノードです: {sorted(unknown)}")
+    if not np.isin(frame["run"].to_numpy(), runs).all() or int(frame["year"].max()) >= num_of_years:
+        raise ValueError("フローテーブルに指標テーブルにない実行または年が含まれています")
+    np.add.at(
+        matrices,
+        (
+            np.searchsorted(runs, frame["run"].to_numpy()),
+            frame["year"].to_numpy(),
+            frame["source"].map(node_index).to_numpy(),
+            frame["target"].map(node_index).to_numpy(),
+        ),
+        frame["value"].to_numpy()
+    )
+    return matrices
@@ -2,24 +2,38 @@ import sys
 import json
 import random
 import pandas as pd
-from config.config import Config
-from circular_ecosystem import CircularEcosystemType, create_circular_ecosystem
+from config.compiled_config import CompiledConfig, load_config
+from circular_ecosystem import create_circular_ecosystem
 from pathlib import Path
-from logger import logger
+from typing import List
+from logger import logger, configure_logging
 from visualization import Visualizer
 import glob
 import logging
 import copy
 from game import Game
 import numpy as np
+import argparse
+from checkpoint import CheckpointManager
+from instrumentation import Instrumentation, InstrumentationReport
+from result_sink import (
+    ResultSink, ResultSinkType, create_result_sink,
+    run_axis, to_metric_ledgers, to_matches_histories, to_flow_matrices
+)
+from enablers.flow_matrix import MATERIAL_NODES, FINANCIAL_NODES
 
-def main(config_dir: str = "config") -> None:
+def main(config_dir: str = "config", resume: bool = False, checkpoint_interval: int = 1,
+         sink_type: ResultSinkType = ResultSinkType.CSV, instrument: bool = False) -> None:
     """
     メイン実行関数
     
     Args:
         config_dir (str): 設定ファイルが格納されているディレクトリのパス
                          （例: "config/scenario1"）
+        resume (bool): 保存済みのチェックポイントから再開するかどうか
+        checkpoint_interval (int): チェックポイントの保存間隔（年数）
+        sink_type (ResultSinkType): 年次結果の出力先の種類
+        instrument (bool): 年次サイクルのフェーズごとの経過時間と処理件数を計測するかどうか
     """
     config_path = Path(config_dir)
     
@@ -43,6 +57,10 @@ def main(config_dir: str = "config") -> None:
     # 設定ファイルの一覧をログ出力
     for config_file in config_files:
         logger.debug(f"Found config file: {config_file}")
+
+    # 実行を始める前に全ての設定ファイルを検証
+    if not validate_config_files(config_files):
+        return
     
     # 結果保存用ディレクトリの作成
     result_dir = Path("results")
@@ -59,7 +77,7 @@ def main(config_dir: str = "config") -> None:
         
         try:
             # run_simulations関数を実行
-            result = run_simulations(config_path, setting_name)
+            result = run_simulations(config_path, setting_name, resume, checkpoint_interval, sink_type, instrument)
             all_results[setting_name] = result
             logging.info(f"Completed simulation for {setting_name}")
         except Exception as e:
@@ -68,117 +86,225 @@ def main(config_dir: str = "config") -> None:
     
     # 全結果の可視化
     visualizer = Visualizer(result_dir)
-    profit_histories_all = [result['profit_histories'] for result in all_results.values()]
-    visualizer.plot_business_metrics_all(profit_histories_all, config_files)
+    metric_ledgers_all = [result['metric_ledgers'] for result in all_results.values()]
+    visualizer.plot_business_metrics_all(metric_ledgers_all, config_files, 'profit')
     
-def run_simulations(config_path: Path, setting_name: str) -> pd.DataFrame:
+def validate_config_files(config_files: List[Path]) -> bool:
+    """
+    全ての設定ファイルを検証し、不正な設定ファイルをログに出力
+
+    Args:
+        config_files: 設定ファイルのパス
+    Returns:
+        bool: 全ての設定ファイルが正しい場合はTrue
+    """
+    invalid_files = []
+    for config_file in config_files:
+        try:
+            load_config(config_file)
+        except ValueError as e:
+            logger.error(str(e))
+            invalid_files.append(config_file)
+    if invalid_files:
+        logger.error(f"{len(invalid_files)} invalid config files found; no simulation was run")
+    return not invalid_files
+
+def seed_run(run_id: int, seed: int = 1) -> None:
+    """
+    実行の開始時に乱数シードを seed + run_id で設定
+
+    各実行の乱数は前の実行に依存しないため、シナリオツリーの枝（同じ方法でシードを設定する）の
+    結果は、その枝の設定をこの関数で実行した結果と一致する。
+
+    Args:
+        run_id: 実行番号
+        seed: 乱数シードの基準値
+    """
+    random.seed(seed + run_id)
+    np.random.seed(seed + run_id)
+
+def create_ecosystem(config: CompiledConfig):
+    """
+    設定からサーキュラーエコシステムを生成して初期化
+    
+    Args:
+        config: 検証済みのシミュレーション設定
+    """
+    # サーキュラーエコシステムの作成
+    ce = create_circular_ecosystem(config.entity)
+
+    # 設定の初期化
+    ce.initialize(
+        name=config.name,
+        entity=config.entity.value,
+        group=config.group,
+        consumer_attributes=config.consumer_attributes,
+        product_attributes=config.product_attributes,
+        num_of_simulation=config.num_of_simulation,
+        ecosystem_settings=config.ecosystem_settings,
+        policy_settings=config.policy_settings,
+        business_model_settings=config.business_model_settings,
+        engine_mode=config.engine_mode.value,
+        time_resolution=config.time_resolution.value,
+        consumer_mode=config.consumer_mode.value,
+        agent_weight=config.agent_weight
+    )
+    return ce
+
+def run_simulations(config_path: Path, setting_name: str, resume: bool = False, checkpoint_interval: int = 1,
+                    sink_type: ResultSinkType = ResultSinkType.CSV, instrument: bool = False) -> dict:
     """
     指定されたディレクトリ内の全ての設定ファイルに対してシミュレーションを実行
     
     Args:
         setting_name: 設定ファイル名
+        resume: 保存済みのチェックポイントから再開するかどうか
+        checkpoint_interval: チェックポイントの保存間隔（年数）
+        sink_type: 年次結果の出力先の種類
+        instrument: 年次サイクルのフェーズごとの経過時間と処理件数を計測するかどうか
+            （計測結果は戻り値の'instrumentation'に格納し、計測しない場合はNone）
     """
 
-    # 再現性のための乱数シード設定
-    random.seed(1)
-    np.random.seed(1)
-
-    # 設定ファイルの読み込み
-    with open(config_path / f"{setting_name}.json") as f:
-        setting_json = json.load(f)
-    config = Config(**setting_json)
+    # 設定ファイルの読み込みと検証
+    config = load_config(config_path / f"{setting_name}.json")
     
     # 結果保存用ディレクトリの作成
     result_dir = Path("results") / setting_name
     result_dir.mkdir(parents=True, exist_ok=True)
+
+    # 年次結果の出力先
+    if resume and sink_type == ResultSinkType.MEMORY:
+        raise ValueError("メモリ上の出力先ではチェックポイントから再開できません")
+    sink = create_result_sink(sink_type, result_dir)
+
+    # チェックポイントの準備（再開時は乱数の状態も復元される）
+    checkpoints = CheckpointManager(
+        result_dir / "checkpoints", setting_name, config.num_of_simulation, checkpoint_interval
+    )
+    resume_point = checkpoints.resume(lambda: create_ecosystem(config)) if resume else None
+    if resume_point is None:
+        checkpoints.clear()
+        sink.clear()
+    else:
+        # チェックポイント以降に出力された結果を削除
+        sink.discard_after(resume_point.run_id, resume_point.year - 1)
+
+    # 年次サイクルの計測（再開時は再開以降に実行した年のみを集計）
+    instrumentation = Instrumentation() if instrument else None
     
-    results = []
-    for run_id in range(config.num_of_run):
-        # サーキュラーエコシステムの作成
-        ecosystem_type = CircularEcosystemType[config.entity.upper()]
-        ce = create_circular_ecosystem(ecosystem_type)
-
-        # 設定の初期化
-        ce.initialize(
-            name=config.name,
-            entity=config.entity,
-            group=config.group,
-            consumer_attributes=config.consumer_attributes,
-            product_attributes=config.product_attributes,
-            num_of_simulation=config.num_of_simulation,
-            ecosystem_settings=config.ecosystem_settings,
-            policy_settings=config.policy_settings,
-            business_model_settings=config.business_model_settings
-        )
+    for run_id in range(resume_point.run_id if resume_point else 0, config.num_of_run):
+        if resume_point and resume_point.ecosystem is not None and resume_point.run_id == run_id:
+            # 実行途中のチェックポイントから再開
+            ce = resume_point.ecosystem
+            start_year = resume_point.year
+        else:
+            # 再現性のための乱数シード設定（実行ごとに設定し、各実行の乱数は実行番号のみで決まる）
+            seed_run(run_id)
+            ce = create_ecosystem(config)
+            start_year = 0
+        if instrumentation is not None:
+            instrumentation.begin_run(run_id)
+            ce.instrument(instrumentation)
         
         # シミュレーション実行
-        results_per_run = []
-        
-        for year in range(config.num_of_simulation):
+        for year in range(start_year, config.num_of_simulation):
 
             # シミュレーション実行
             result = ce.execute_yearly_cycle(year)
-            results_per_run.append(result)
+            sink.write(setting_name, run_id, result)
+            checkpoints.save_year(ce, run_id, year)
             
-        result = pd.concat(results_per_run, ignore_index=True)
-        if result is not None:  # Noneチェックを追加
-            results.append(result)    
-    revenue_histories = [result['revenue_history'] for result in results]
-    product_cost_histories = [result['product_cost_history'] for result in results]
-    repair_cost_histories = [result['repair_cost_history'] for result in results]
-    profit_histories = [result['profit_history'] for result in results]
-    matches_histories = [result['matches_history'] for result in results]
-    material_flow_histories = [result['material_flow_history'] for result in results]
-    financial_flow_histories = [result['financial_flow_history'] for result in results]
-    logger.debug(f"revenue_histories: {revenue_histories}")
-    logger.debug(f"product_cost_histories: {product_cost_histories}")
-    logger.debug(f"repair_cost_histories: {repair_cost_histories}")
-    logger.debug(f"profit_histories: {profit_histories}")
+        checkpoints.save_run(run_id)
+
+    sink.close()
+    simulation_results = summarize_results(sink, result_dir)
+    simulation_results['instrumentation'] = None
+    if instrumentation is not None:
+        report = instrumentation.report()
+        save_instrumentation_report(report, result_dir)
+        simulation_results['instrumentation'] = report
+    return simulation_results
+
+def save_instrumentation_report(report: InstrumentationReport, result_dir: Path) -> None:
+    """
+    計測結果をCSVに保存し、フェーズごとの合計をログに出力
+
+    Args:
+        report: 年次サイクルの計測結果
+        result_dir: 保存先ディレクトリ
+    """
+    report.phases.to_csv(result_dir / "instrumentation.csv", index=False)
+    for row in report.by_phase().itertuples(index=False):
+        logger.info(
+            f"{row.phase}: {row.wall_time:.3f}s ({row.share:.1%}), calls={row.calls}, "
+            f"consumers={row.consumers_created}, utilities={row.utility_evaluations}, "
+            f"scanned={row.products_scanned}, failures={row.failures_sampled}, "
+            f"flows={row.flows_recorded}, dataframes={row.dataframes_built}"
+        )
+
+def summarize_results(sink: ResultSink, result_dir: Path) -> dict:
+    """
+    出力先の結果を集計し、可視化を行う
+    
+    Args:
+        sink: 年次結果の出力先
+        result_dir: グラフの保存先ディレクトリ
+    Returns:
+        dict: 履歴データの種類ごとに実行結果をまとめた辞書
+    """
+    metrics = sink.read_metrics()
+    flows = sink.read_flows()
+    if metrics.empty:
+        raise ValueError("No simulation results were generated")
+
+    metric_ledgers = to_metric_ledgers(metrics)
+    matches_histories = to_matches_histories(metrics)
+    # 実行と年の軸は指標テーブルから決める（フローが発生しなかった実行も平均の分母に含める）
+    runs, num_of_years = run_axis(metrics)
+    material_flow_matrices = to_flow_matrices(flows, 'material', MATERIAL_NODES, runs, num_of_years)
+    financial_flow_matrices = to_flow_matrices(flows, 'financial', FINANCIAL_NODES, runs, num_of_years)
+    for matrices in (material_flow_matrices, financial_flow_matrices):
+        if matrices.shape[:2] != (len(metric_ledgers), num_of_years):
+            raise ValueError(
+                f"フロー行列の実行数・年数が指標と一致しません: {matrices.shape[:2]} != {(len(metric_ledgers), num_of_years)}"
+            )
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"metric_ledgers: {[ledger.to_frame() for ledger in metric_ledgers]}")
     # 各履歴データを辞書として収集
     simulation_results = {
-        'revenue_histories': revenue_histories,
-        'product_cost_histories': product_cost_histories,
-        'repair_cost_histories': repair_cost_histories,
-        'profit_histories': profit_histories,
+        'metric_ledgers': metric_ledgers,
         'matches_histories': matches_histories,
-        'material_flow_histories': material_flow_histories,
-        'financial_flow_histories': financial_flow_histories
+        'material_flow_matrices': material_flow_matrices,
+        'financial_flow_matrices': financial_flow_matrices
     }
     
     # 可視化
     visualizer = Visualizer(result_dir)
     # ビジネス指標のグラフを作成    
-    visualizer.plot_business_metrics(
-        revenue_histories,
-        product_cost_histories,
-        repair_cost_histories,
-        profit_histories
-    )
+    visualizer.plot_business_metrics(metric_ledgers)
     # マッチングのグラフを作成
     visualizer.plot_matches_percentage(matches_histories)
     # マテリアフローのグラフを作成
-    visualizer.plot_material_flow(material_flow_histories)
+    visualizer.plot_material_flow(material_flow_matrices)
     # 財務フローのグラフを作成
-    visualizer.plot_financial_flow(financial_flow_histories)
+    visualizer.plot_financial_flow(financial_flow_matrices)
 
-    # 結果の保存
-    if not results:
-        raise ValueError("No simulation results were generated")
-    
-    df = pd.concat(results, ignore_index=True)
-    output_file = f"{config.name}_{config.entity}_{config.group}.csv"
-    output_path = result_dir / output_file
-    df.to_csv(output_path, index=False)
-    logger.info(f"Results saved to {output_path}")
+    logger.info(f"Results saved to {result_dir}")
 
     return simulation_results
 
 if __name__ == "__main__":
-    logging.basicConfig(level=logging.INFO)
-    
-    if len(sys.argv) > 1:
-        # コマンドライン引数がある場合はそのディレクトリを使用
-        main(sys.argv[1])
-    else:
-        # 引数がない場合はデフォルトのconfigディレクトリを使用
-        main()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    # 引数がない場合はデフォルトのconfigディレクトリを使用
+    parser.add_argument("config_dir", nargs="?", default="config")
+    parser.add_argument("--resume", action="store_true", help="保存済みのチェックポイントから再開")
+    parser.add_argument("--checkpoint-interval", type=int, default=1, help="チェックポイントの保存間隔（年数）")
+    parser.add_argument("--sink", choices=[t.value for t in ResultSinkType], default=ResultSinkType.CSV.value,
+                        help="年次結果の出力先")
+    parser.add_argument("--instrument", action="store_true", help="年次サイクルのフェーズごとの経過時間と処理件数を計測")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO",
+                        help="コンソールに出力するログのレベル")
+    parser.add_argument("--log-file", default=None, help="DEBUGレベルのログを出力するファイル（指定した場合のみ出力）")
+    args = parser.parse_args()
+    configure_logging(getattr(logging, args.log_level), args.log_file)
+    main(args.config_dir, args.resume, args.checkpoint_interval, ResultSinkType(args.sink), args.instrument)
@@ -2,24 +2,34 @@ import sys
 import json
 import random
 import pandas as pd
-from config.config import Config
+from config.compiled_config import load_config
 from circular_ecosystem import CircularEcosystemType, create_circular_ecosystem
 from pathlib import Path
-from logger import logger
+from logger import logger, configure_logging
 from visualization import Visualizer
 import glob
 import logging
 import copy
 from game import Game
 import numpy as np
+import argparse
+from checkpoint import CheckpointManager
+from result_sink import ResultSinkType, create_result_sink
+from run import create_ecosystem, seed_run, summarize_results, validate_config_files, save_instrumentation_report
+from instrumentation import Instrumentation
 
-def main(config_dir: str = "config") -> None:
+def main(config_dir: str = "config", resume: bool = False, checkpoint_interval: int = 1,
+         sink_type: ResultSinkType = ResultSinkType.CSV, instrument: bool = False) -> None:
     """
     メイン実行関数
     
     Args:
         config_dir (str): 設定ファイルが格納されているディレクトリのパス
                          （例: "config/scenario1"）
+        resume (bool): 保存済みのチェックポイントから再開するかどうか
+        checkpoint_interval (int): チェックポイントの保存間隔（年数）
+        sink_type (ResultSinkType): 年次結果の出力先の種類
+        instrument (bool): 年次サイクルのフェーズごとの経過時間と処理件数を計測するかどうか
     """
     config_path = Path(config_dir)
     
@@ -43,6 +53,10 @@ def main(config_dir: str = "config") -> None:
     # 設定ファイルの一覧をログ出力
     for config_file in config_files:
         logger.debug(f"Found config file: {config_file}")
+
+    # 実行を始める前に全ての設定ファイルを検証
+    if not validate_config_files(config_files):
+        return
     
     # 結果保存用ディレクトリの作成
     result_dir = Path("results")
@@ -59,7 +73,7 @@ def main(config_dir: str = "config") -> None:
         
         try:
             # run_simulations関数を実行
-            result = run_simulations(config_path, setting_name)
+            result = run_simulations(config_path, setting_name, resume, checkpoint_interval, sink_type, instrument)
             all_results[setting_name] = result
             logging.info(f"Completed simulation for {setting_name}")
         except Exception as e:
@@ -68,123 +82,106 @@ def main(config_dir: str = "config") -> None:
     
     # 全結果の可視化
     visualizer = Visualizer(result_dir)
-    revenue_histories_all = [result['revenue_histories'] for result in all_results.values()]
-    visualizer.plot_business_metrics_all(revenue_histories_all)
+    metric_ledgers_all = [result['metric_ledgers'] for result in all_results.values()]
+    visualizer.plot_business_metrics_all(metric_ledgers_all, config_files, 'revenue')
     
-def run_simulations(config_path: Path, setting_name: str) -> pd.DataFrame:
+def run_simulations(config_path: Path, setting_name: str, resume: bool = False, checkpoint_interval: int = 1,
+                    sink_type: ResultSinkType = ResultSinkType.CSV, instrument: bool = False) -> dict:
     """
     指定されたディレクトリ内の全ての設定ファイルに対してシミュレーションを実行
     
     Args:
         setting_name: 設定ファイル名
+        resume: 保存済みのチェックポイントから再開するかどうか
+        checkpoint_interval: チェックポイントの保存間隔（年数）
+        sink_type: 年次結果の出力先の種類
+        instrument: 年次サイクルのフェーズごとの経過時間と処理件数を計測するかどうか
+            （計測結果は戻り値の'instrumentation'に格納し、計測しない場合はNone）
     """
 
-    # 再現性のための乱数シード設定
-    random.seed(1)
-    np.random.seed(1)
-
-    # 設定ファイルの読み込み
-    with open(config_path / f"{setting_name}.json") as f:
-        setting_json = json.load(f)
-    config = Config(**setting_json)
+    # 設定ファイルの読み込みと検証
+    config = load_config(config_path / f"{setting_name}.json")
     
     # 結果保存用ディレクトリの作成
     result_dir = Path("results") / setting_name
     result_dir.mkdir(parents=True, exist_ok=True)
-    
-    results = []
-    for run_id in range(config.num_of_run):
-        # サーキュラーエコシステムの作成
-        ecosystem_type = CircularEcosystemType[config.entity.upper()]
-        ce = create_circular_ecosystem(ecosystem_type)
 
-        # 設定の初期化
-        ce.initialize(
-            name=config.name,
-            entity=config.entity,
-            group=config.group,
-            consumer_attributes=config.consumer_attributes,
-            product_attributes=config.product_attributes,
-            num_of_simulation=config.num_of_simulation,
-            ecosystem_settings=config.ecosystem_settings,
-            policy_settings=config.policy_settings,
-            business_model_settings=config.business_model_settings
-        )
+    # 年次結果の出力先
+    if resume and sink_type == ResultSinkType.MEMORY:
+        raise ValueError("メモリ上の出力先ではチェックポイントから再開できません")
+    sink = create_result_sink(sink_type, result_dir)
+
+    # チェックポイントの準備（再開時は乱数の状態も復元される）
+    checkpoints = CheckpointManager(
+        result_dir / "checkpoints", setting_name, config.num_of_simulation, checkpoint_interval
+    )
+    resume_point = checkpoints.resume(lambda: create_ecosystem(config)) if resume else None
+    if resume_point is None:
+        checkpoints.clear()
+        sink.clear()
+    else:
+        # チェックポイント以降に出力された結果を削除
+        sink.discard_after(resume_point.run_id, resume_point.year - 1)
+
+    # 年次サイクルの計測（再開時は再開以降に実行した年のみを集計）
+    instrumentation = Instrumentation() if instrument else None
+    
+    for run_id in range(resume_point.run_id if resume_point else 0, config.num_of_run):
+        if resume_point and resume_point.ecosystem is not None and resume_point.run_id == run_id:
+            # 実行途中のチェックポイントから再開
+            ce = resume_point.ecosystem
+            start_year = resume_point.year
+        else:
+            # 再現性のための乱数シード設定（実行ごとに設定し、各実行の乱数は実行番号のみで決まる）
+            seed_run(run_id)
+            ce = create_ecosystem(config)
+            start_year = 0
+        if instrumentation is not None:
+            instrumentation.begin_run(run_id)
+            ce.instrument(instrumentation)
 
         # ゲームインスタンスの作成
         game = Game()
         
         # シミュレーション実行
-        results_per_run = []
-        
-        for year in range(config.num_of_simulation):
+        for year in range(start_year, config.num_of_simulation):
 
-            # CEインスタンスをコピー
+            # CEインスタンスをコピー（計測の集計先は複製せず、均衡解の探索は計測に含めない）
+            ce.instrument(None)
             ce_copy = copy.deepcopy(ce)
+            ce.instrument(instrumentation)
             # 均衡解の探索
             equilibrium = game.find_equilibrium(ce_copy, year)
             # 均衡価格の設定
             ce.set_equilibrium_prices(equilibrium)
             # シミュレーション実行
             result = ce.execute_yearly_cycle(year)
-            results_per_run.append(result)
+            sink.write(setting_name, run_id, result)
+            checkpoints.save_year(ce, run_id, year)
             
-        result = pd.concat(results_per_run, ignore_index=True)
-        if result is not None:  # Noneチェックを追加
-            results.append(result)    
-    
-    revenue_histories = [result['revenue_history'] for result in results]
-    product_cost_histories = [result['product_cost_history'] for result in results]
-    repair_cost_histories = [result['repair_cost_history'] for result in results]
-    matches_histories = [result['matches_history'] for result in results]
-    material_flow_histories = [result['material_flow_history'] for result in results]
-    financial_flow_histories = [result['financial_flow_history'] for result in results]
-    logger.debug(f"revenue_histories: {revenue_histories}")
-
-    # 各履歴データを辞書として収集
-    simulation_results = {
-        'revenue_histories': revenue_histories,
-        'product_cost_histories': product_cost_histories,
-        'repair_cost_histories': repair_cost_histories,
-        'matches_histories': matches_histories,
-        'material_flow_histories': material_flow_histories,
-        'financial_flow_histories': financial_flow_histories
-    }
-    
-    # 可視化
-    visualizer = Visualizer(result_dir)
-
-    # ビジネス指標のグラフを作成    
-    visualizer.plot_business_metrics(
-        revenue_histories,
-        product_cost_histories,
-        repair_cost_histories,
-    )
-    # マッチングのグラフを作成
-    visualizer.plot_matches_percentage(matches_histories)
-    # マテリアフローのグラフを作成
-    visualizer.plot_material_flow(material_flow_histories)
-    # 財務フローのグラフを作成
-    visualizer.plot_financial_flow(financial_flow_histories)
-
-    # 結果の保存
-    if not results:
-        raise ValueError("No simulation results were generated")
-    
-    df = pd.concat(results, ignore_index=True)
-    output_file = f"{config.name}_{config.entity}_{config.group}.csv"
-    output_path = result_dir / output_file
-    df.to_csv(output_path, index=False)
-    logger.info(f"Results saved to {output_path}")
+        checkpoints.save_run(run_id)
 
+    sink.close()
+    simulation_results = summarize_results(sink, result_dir)
+    simulation_results['instrumentation'] = None
+    if instrumentation is not None:
+        report = instrumentation.report()
+        save_instrumentation_report(report, result_dir)
+        simulation_results['instrumentation'] = report
     return simulation_results
 
 if __name__ == "__main__":
-    logging.basicConfig(level=logging.INFO)
-    
-    if len(sys.argv) > 1:
-        # コマンドライン引数がある場合はそのディレクトリを使用
-        main(sys.argv[1])
-    else:
-        # 引数がない場合はデフォルトのconfigディレクトリを使用
-        main()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    # 引数がない場合はデフォルトのconfigディレクトリを使用
+    parser.add_argument("config_dir", nargs="?", default="config")
+    parser.add_argument("--resume", action="store_true", help="保存済みのチェックポイントから再開")
+    parser.add_argument("--checkpoint-interval", type=int, default=1, help="チェックポイントの保存間隔（年数）")
+    parser.add_argument("--sink", choices=[t.value for t in ResultSinkType], default=ResultSinkType.CSV.value,
+                        help="年次結果の出力先")
+    parser.add_argument("--instrument", action="store_true", help="年次サイクルのフェーズごとの経過時間と処理件数を計測")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO",
+                        help="コンソールに出力するログのレベル")
+    parser.add_argument("--log-file", default=None, help="DEBUGレベルのログを出力するファイル（指定した場合のみ出力）")
+    args = parser.parse_args()
+    configure_logging(getattr(logging, args.log_level), args.log_file)
+    main(args.config_dir, args.resume, args.checkpoint_interval, ResultSinkType(args.sink), args.instrument)
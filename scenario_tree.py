@@ -0,0 +1,327 @@
+import sys
+import copy
+import json
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+import numpy as np
+from config.compiled_config import CompiledConfig, load_config, replace_setting
+from circular_ecosystem import create_circular_ecosystem
+from enablers.business_model import create_business_model
+from logger import logger, configure_logging
+from result_sink import ResultSink, InMemorySink, CsvSink, YearlyResult
+
+# プロバイダー属性名と、生成済みインスタンスが保持する属性名の対応
+PROVIDER_ATTRIBUTE_MAP = {
+    "base_price": "_price",
+    "reuse_cost": "_reuse_cost",
+}
+
+PROVIDER_KEYS = ["manufacturer", "paas_provider", "reuse_provider", "remanufacturer", "recycler"]
+
+@dataclass(frozen=True)
+class ParameterChange:
+    """
+    「パラメータXを年kから変更する」という宣言
+
+    Attributes:
+        year: 変更を適用する年（その年の年次サイクルの実行前に適用）
+        parameter: 設定JSON上のドット区切りのパス
+                   例: "ecosystem_settings.paas_provider.attributes.base_price"
+        value: 変更後の値
+    """
+    year: int
+    parameter: str
+    value: Any
+
+@dataclass
+class ScenarioBranch:
+    """シナリオツリーの枝（what-ifシナリオ）"""
+    name: str
+    changes: List[ParameterChange] = field(default_factory=list)
+
+    def changes_at(self, year: int) -> Tuple[ParameterChange, ...]:
+        """指定年に適用するパラメータ変更を取得"""
+        return tuple(sorted(
+            (change for change in self.changes if change.year == year),
+            key=lambda change: change.parameter
+        ))
+
+def load_scenario_branches(scenario_file: Path) -> List[ScenarioBranch]:
+    """
+    シナリオファイルから枝の一覧を読み込む
+
+    シナリオファイルの形式:
+        {
+            "branches": {
+                "baseline": [],
+                "late_price_cut": [
+                    {"year": 5, "parameter": "ecosystem_settings.paas_provider.attributes.base_price", "value": 0.7}
+                ]
+            }
+        }
+
+    Args:
+        scenario_file: シナリオファイルのパス
+    Returns:
+        List[ScenarioBranch]: 枝のリスト
+    """
+    with open(scenario_file) as f:
+        scenario_json = json.load(f)
+
+    return [
+        ScenarioBranch(
+            name=name,
+            changes=[ParameterChange(**change) for change in changes]
+        )
+        for name, changes in scenario_json["branches"].items()
+    ]
+
+def apply_parameter_change(ecosystem, change: ParameterChange) -> None:
+    """
+    実行中のエコシステムにパラメータ変更を適用する
+
+    エコシステムが保持する設定を変更後の値で置き換えた上で、生成済みのプロバイダー・
+    ビジネスモデル・制度にも反映する。消費者属性と製品属性の変更は、以降に生成される
+    消費者・製品に適用される。
+
+    Args:
+        ecosystem: 変更を適用するエコシステム
+        change: 適用するパラメータ変更
+    """
+    keys = change.parameter.split(".")
+    root = keys[0]
+
+    if root == "ecosystem_settings":
+        if len(keys) != 4 or keys[2] != "attributes" or keys[1] not in PROVIDER_KEYS:
+            raise ValueError(f"不明なパラメータです: {change.parameter}")
+        provider_key, attribute = keys[1], keys[3]
+        provider = getattr(ecosystem, provider_key, None)
+        if provider is None:
+            raise ValueError(f"エコシステムに存在しないプロバイダーです: {provider_key}")
+        attributes_name = f"{provider_key}_attributes"
+        setattr(ecosystem, attributes_name, replace_setting(getattr(ecosystem, attributes_name), [attribute], change.value))
+        instance_attribute = PROVIDER_ATTRIBUTE_MAP.get(attribute, attribute)
+        if hasattr(provider, instance_attribute):
+            setattr(provider, instance_attribute, change.value)
+
+    elif root == "business_model_settings":
+        if len(keys) != 3 or keys[1] != "attributes" or ecosystem.business_model is None:
+            raise ValueError(f"不明なパラメータです: {change.parameter}")
+        business_model = ecosystem.business_model
+        # 生成時にのみ参照される属性や、このビジネスモデルが持たない属性は変更しても反映されない
+        if not hasattr(business_model, keys[2]):
+            raise ValueError(f"不明なパラメータです: {change.parameter}")
+        business_model.attributes[keys[2]] = change.value
+        setattr(business_model, keys[2], type(getattr(business_model, keys[2]))(change.value))
+
+    elif root == "policy_settings":
+        if len(keys) != 2 or ecosystem.policy is None:
+            raise ValueError(f"不明なパラメータです: {change.parameter}")
+        setattr(ecosystem.policy.parameters, keys[1], change.value)
+
+    elif root in ("consumer_attributes", "product_attributes"):
+        if len(keys) < 3:
+            raise ValueError(f"不明なパラメータです: {change.parameter}")
+        settings = getattr(ecosystem, root)
+        if keys[1] not in settings:
+            raise ValueError(f"不明なパラメータです: {change.parameter}")
+        settings[keys[1]] = replace_setting(settings[keys[1]], keys[2:], change.value)
+
+    else:
+        raise ValueError(f"不明なパラメータです: {change.parameter}")
+
+    logger.debug(f"Applied {change.parameter}={change.value} at year {change.year}")
+
+class _ForkPoint:
+    """分岐時点のエコシステムと乱数状態のスナップショット"""
+
+    def __init__(self, ecosystem):
+        self.ecosystem = copy.deepcopy(ecosystem)
+        self.np_random_state = np.random.get_state()
+        self.random_state = random.getstate()
+
+    def restore(self, reuse: bool = False):
+        """
+        スナップショットからエコシステムを復元する
+
+        Args:
+            reuse: Trueの場合、スナップショット自体を返す（最後の枝で複製を省略する）
+        """
+        np.random.set_state(self.np_random_state)
+        random.setstate(self.random_state)
+        if reuse:
+            return self.ecosystem
+        return copy.deepcopy(self.ecosystem)
+
+class ScenarioTree:
+    """
+    共通の履歴を一度だけシミュレーションし、パラメータが分岐する年から枝ごとに実行するランナー
+
+    run_simulations と同様に各実行の開始時に乱数シードを seed + run_id で設定し、分岐時には乱数の
+    状態を復元するため、各枝の結果はその枝の設定を run_simulations で実行した結果と一致する。
+    各実行の乱数は実行番号のみで決まるため、全ての実行で枝は共通の履歴を共有する。
+    """
+
+    def __init__(
+        self,
+        config: CompiledConfig,
+        branches: List[ScenarioBranch],
+        seed: int = 1,
+        sink_factory: Callable[[str], ResultSink] = lambda branch_name: InMemorySink()
+    ):
+        """
+        Args:
+            config: 全枝に共通する検証済みの基本設定
+            branches: 枝のリスト
+            seed: 乱数シードの基準値（run_simulations と同じく各実行の開始時に seed + run_id で設定する）
+            sink_factory: 枝の名前から年次結果の出力先を生成する関数
+        """
+        names = [branch.name for branch in branches]
+        if len(set(names)) != len(names):
+            raise ValueError(f"枝の名前が重複しています: {names}")
+        # ビジネスモデルの変更先の属性を確認するための見本（乱数は使用しない）
+        business_model = create_business_model(
+            business_model_type=config.business_model_settings.business_model_type,
+            attributes=config.business_model_settings.attributes.model_dump(exclude_none=True)
+        )
+        for branch in branches:
+            for change in branch.changes:
+                if not 0 <= change.year < config.num_of_simulation:
+                    raise ValueError(f"シミュレーション期間外の変更です: {branch.name}, {change}")
+                # 実行前に変更後の値と、変更を反映できる属性であることを検証する
+                keys = change.parameter.split(".")
+                replace_setting(config, keys, change.value)
+                if keys[0] == "business_model_settings" and not hasattr(business_model, keys[-1]):
+                    raise ValueError(f"不明なパラメータです: {branch.name}, {change.parameter}")
+
+        self.config = config
+        self.branches = branches
+        self.seed = seed
+        self.sink_factory = sink_factory
+        self.num_of_forks = 0
+
+    def run(self) -> Dict[str, ResultSink]:
+        """
+        全枝のシミュレーションを実行
+
+        Returns:
+            Dict[str, ResultSink]: 枝ごとの年次結果の出力先
+        """
+        sinks = {branch.name: self.sink_factory(branch.name) for branch in self.branches}
+        for sink in sinks.values():
+            sink.clear()
+
+        for run_id in range(self.config.num_of_run):
+            random.seed(self.seed + run_id)
+            np.random.seed(self.seed + run_id)
+            ecosystem = self._create_ecosystem()
+            self._run_from(ecosystem, run_id, 0, self.branches, [], sinks)
+
+        for sink in sinks.values():
+            sink.close()
+        logger.info(f"Scenario tree finished: {len(self.branches)} branches, {self.num_of_forks} forks")
+        return sinks
+
+    def _run_from(
+        self,
+        ecosystem,
+        run_id: int,
+        year: int,
+        branches: List[ScenarioBranch],
+        prefix_results: List[YearlyResult],
+        sinks: Dict[str, ResultSink]
+    ) -> None:
+        """
+        指定年から枝の集合を実行し、変更内容が異なる年で分岐する
+
+        Args:
+            ecosystem: 実行を続けるエコシステム
+            run_id: 実行番号
+            year: 開始年
+            branches: この部分木に属する枝
+            prefix_results: 共通の履歴の年次結果
+            sinks: 枝ごとの年次結果の出力先
+        """
+        while year < self.config.num_of_simulation:
+            # 同じ変更を適用する枝ごとにグループ化
+            groups: Dict[Tuple[ParameterChange, ...], List[ScenarioBranch]] = {}
+            for branch in branches:
+                groups.setdefault(branch.changes_at(year), []).append(branch)
+
+            if len(groups) > 1:
+                # 分岐：状態を保存し、グループごとに残りの年を実行
+                self.num_of_forks += 1
+                logger.debug(f"Forking {len(groups)} branches at year {year}")
+                fork_point = _ForkPoint(ecosystem)
+                for i, group in enumerate(groups.values()):
+                    fork = fork_point.restore(reuse=(i == len(groups) - 1))
+                    self._run_from(fork, run_id, year, group, list(prefix_results), sinks)
+                return
+
+            for change in next(iter(groups)):
+                apply_parameter_change(ecosystem, change)
+            prefix_results.append(ecosystem.execute_yearly_cycle(year))
+            year += 1
+
+        for branch in branches:
+            for result in prefix_results:
+                sinks[branch.name].write(branch.name, run_id, result)
+
+    def _create_ecosystem(self):
+        """エコシステムを生成（設定は変更できないため、枝ごとの変更は置き換えで適用する）"""
+        config = self.config
+        ecosystem = create_circular_ecosystem(config.entity)
+        ecosystem.initialize(
+            name=config.name,
+            entity=config.entity.value,
+            group=config.group,
+            consumer_attributes=config.consumer_attributes,
+            product_attributes=config.product_attributes,
+            num_of_simulation=config.num_of_simulation,
+            ecosystem_settings=config.ecosystem_settings,
+            policy_settings=config.policy_settings,
+            business_model_settings=config.business_model_settings,
+            engine_mode=config.engine_mode.value,
+            time_resolution=config.time_resolution.value,
+            consumer_mode=config.consumer_mode.value,
+            agent_weight=config.agent_weight
+        )
+        return ecosystem
+
+def run_scenario_tree(config_path: Path, setting_name: str, scenario_file: Path) -> Dict[str, dict]:
+    """
+    設定ファイルとシナリオファイルからシナリオツリーを実行し、枝ごとに結果を保存する
+
+    Args:
+        config_path: 設定ファイルが格納されているディレクトリ
+        setting_name: 基本となる設定ファイル名
+        scenario_file: シナリオファイルのパス
+    Returns:
+        Dict[str, dict]: 枝ごとの履歴データ
+    """
+    from run import summarize_results
+
+    config = load_config(config_path / f"{setting_name}.json")
+
+    result_dir = Path("results") / setting_name
+    tree = ScenarioTree(
+        config,
+        load_scenario_branches(scenario_file),
+        sink_factory=lambda branch_name: CsvSink(result_dir / branch_name)
+    )
+    sinks = tree.run()
+
+    return {
+        branch_name: summarize_results(sink, result_dir / branch_name)
+        for branch_name, sink in sinks.items()
+    }
+
+if __name__ == "__main__":
+    configure_logging()
+
+    if len(sys.argv) != 4:
+        print("Usage: python scenario_tree.py <config_dir> <setting_name> <scenario_file>")
+        sys.exit(1)
+    run_scenario_tree(Path(sys.argv[1]), sys.argv[2], Path(sys.argv[3]))
@@ -3,6 +3,7 @@ from tkinter import ttk, filedialog, messagebox
 from pathlib import Path
 import json, os, glob
 import numpy as np
+from logger import configure_logging
 
 class SimulationGUI(tk.Frame):
     def __init__(self, master=None):
@@ -562,5 +563,6 @@ class SimulationGUI(tk.Frame):
             messagebox.showerror("エラー", f"シミュレーション実行中にエラーが発生しました:\n{str(e)}")
 
 if __name__ == "__main__":
+    configure_logging()
     app = SimulationGUI()
     app.master.mainloop()
\ No newline at end of file
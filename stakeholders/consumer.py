@@ -1,17 +1,19 @@
 from enum import Enum
 from typing import Dict, Type, List, Any
 import numpy as np
-from preference import Preference
+from preference import Preference, PART_WORTH_KEYS
 import logging
 from stakeholders.provider import Provider
 from stakeholders.paas_provider import PaasProvider
 from stakeholders.reuse_provider import ReuseProvider
+from enablers.time_resolution import StepClock
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from enablers.product import Product, ProductType
     from stakeholders.recycler import Recycler
     from product_category import ProductCategory
     from stakeholders.manufacturer import Manufacturer
+    from config.compiled_config import ConsumerSettings
 
 logger = logging.getLogger(__name__)
 
@@ -20,34 +22,67 @@ class ConsumerType(Enum):
 
 class Consumer:
     """消費者基底クラス"""
-    def __init__(self, name: str, attributes: Dict[str, Any]):
-        self.name = name
-        self.pref_dict = attributes["pref_dict"]
-        self.churn_rate = attributes["churn_rate"]
-        self.reuse_probability = attributes["reuse_probability"]
+
+    # 消費者は大量に生成されるため、インスタンス辞書を持たせない
+    __slots__ = (
+        "consumer_id", "segment", "year", "index", "clock", "pref_dict", "churn_rate", "reuse_probability",
+        "num_of_products", "matched_product", "matched_price", "matched_product_category",
+        "use_period", "start_step", "_plan_of_use_period", "preference",
+    )
+
+    # 表す消費者数（コホートの場合はメンバー数）
+    count = 1
+
+    def __init__(self, consumer_id: int, segment: str, year: int, index: int,
+                 attributes: 'ConsumerSettings', clock: StepClock = None):
+        """
+        Args:
+            consumer_id: エコシステム内で一意な消費者ID
+            segment: 消費者の種類名（消費者の属性のキー）
+            year: 生成した年
+            index: 同じ年・種類で生成した消費者の中での通し番号
+            attributes: 消費者の属性
+            clock: ステップと年の換算
+        """
+        self.consumer_id = consumer_id
+        # 消費者名は表示時にのみ生成する（segment_year_index）
+        self.segment = segment
+        self.year = year
+        self.index = index
+        self.clock = clock or StepClock()
+        self.pref_dict = attributes.pref_dict
+        self.churn_rate = self.clock.per_step_probability(attributes.churn_rate)  # ステップあたりのチャーン率
+        self.reuse_probability = attributes.reuse_probability
         self.num_of_products = int(np.random.normal(
-            attributes["num_of_products_mean"],
-            attributes["num_of_products_sd"]
+            attributes.num_of_products_mean,
+            attributes.num_of_products_sd
         ))
         self.matched_product = None
         self.matched_price = None
         self.use_period = 0
+        self.start_step = None  # 製品の使用を開始したステップ
         self._plan_of_use_period = 0
         self.preference = None
 
-    def set_use_period(self, attribute: Dict[str, Any]) -> None:
+    @property
+    def name(self) -> str:
+        """表示用の消費者名"""
+        return f"{self.segment}_{self.year}_{self.index}"
+
+    def set_use_period(self, attribute: 'ConsumerSettings') -> None:
         """使用期間の設定（ガンマ分布に従う）"""
         # ガンマ分布のパラメータ
-        shape = attribute["plan_of_use_shape"]  # 形状パラメータ（α）
-        scale = attribute["plan_of_use_scale"]  # 尺度パラメータ（β）
+        shape = attribute.plan_of_use_shape  # 形状パラメータ（α）
+        scale = attribute.plan_of_use_scale  # 尺度パラメータ（β）
         
         # ガンマ分布から月単位の使用期間をサンプリング
         months = np.random.gamma(shape, scale)
         
-        # 月を年に換算（四捨五入）し、最小値を1年に設定
-        self._plan_of_use_period = max(1, round(months / 12))
+        # 月をステップ数に換算（四捨五入）し、最小値を1ステップに設定
+        self._plan_of_use_period = self.clock.months_to_steps(months)
         
-        logger.debug(f"Consumer {self.name} planned use period: {months:.1f} months = {self._plan_of_use_period} years")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Consumer {self.name} planned use period: {months:.1f} months = {self._plan_of_use_period} steps")
 
     def set_preferences(self) -> None:
         """選好の設定"""
@@ -55,33 +90,9 @@ class Consumer:
         self.preference = Preference(part_worth_values, self)
 
     def _calculate_part_worth_values(self) -> Dict[str, float]:
-        """部分効用値の計算"""
-        return {
-            'ownership': np.random.normal(
-                self.pref_dict["ownership_part_worth_mean"],
-                self.pref_dict["ownership_part_worth_sd"]
-            ),
-            'subscription': np.random.normal(
-                self.pref_dict["subscription_part_worth_mean"],
-                self.pref_dict["subscription_part_worth_sd"]
-            ),
-            'reuse': np.random.normal(
-                self.pref_dict["reuse_part_worth_mean"],
-                self.pref_dict["reuse_part_worth_sd"]
-            ),
-            'remanufacture': np.random.normal(
-                self.pref_dict["remanufacture_part_worth_mean"],
-                self.pref_dict["remanufacture_part_worth_sd"]
-            ),
-            'price': np.random.normal(
-                self.pref_dict["price_part_worth_mean"],
-                self.pref_dict["price_part_worth_sd"]
-            ),
-            'spec': np.random.normal(
-                self.pref_dict["spec_part_worth_mean"],
-                self.pref_dict["spec_part_worth_sd"]
-            )
-        }
+        """部分効用値の計算（属性ごとの正規分布から、PART_WORTH_KEYSの順にサンプリング）"""
+        normal = np.random.normal
+        return {key: normal(mean, sd) for key, (mean, sd) in zip(PART_WORTH_KEYS, self.pref_dict.part_worth_params)}
 
     def add_matched_product_category(self, product_category: 'ProductCategory', price: float) -> None:
         """
@@ -94,24 +105,35 @@ class Consumer:
         self.matched_product_category = product_category
         self.matched_price = price
     
-    def set_possession(self, product: 'Product') -> None:
-        """製品の所有情報をセット"""
+    def set_possession(self, product: 'Product', step: int) -> None:
+        """
+        製品の所有情報をセット
+        
+        Args:
+            product: 割り当てられた製品
+            step: 使用を開始したステップ
+        """
         self.matched_product = product
+        self.start_step = step
+
+    def release(self, step: int) -> None:
+        """
+        計画使用期間の満了またはチャーンにより製品を解放
         
-    def update_use_period(self) -> None:
-        """使用年数を更新"""
+        Args:
+            step: 解放するステップ
+        """
         if self.matched_product is None:
             return
-            
-        self.use_period += 1
-        logger.debug(f"Consumer {self.name} uses product {self.matched_product.name} for {self.use_period}/{self._plan_of_use_period} years")
-        
-        # 計画使用期間に達した場合、または確率的にチャーンする場合
-        if (self.use_period >= self._plan_of_use_period or 
-            np.random.random() < self.churn_rate):
-            self.decide_EoL()
+
+        self.use_period = step - self.start_step + 1
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug(f"Consumer {self.name} uses product {self.matched_product.name} for {self.use_period}/{self._plan_of_use_period} steps")
+        self.decide_EoL()
+        if debug:
             logger.debug(f"Consumer {self.name} released product {self.matched_product.name}")
-            self.release_product()
+        self.release_product()
 
     def decide_EoL(self) -> None:
         """製品の使用終了後の返却先を決定する"""
@@ -161,20 +183,29 @@ class Consumer:
     
     @property
     def plan_of_use_period(self) -> int:
-        """計画使用期間"""
+        """計画使用期間（ステップ数）"""
         return self._plan_of_use_period
 
+    @property
+    def release_step(self) -> int:
+        """計画使用期間に達して製品を解放するステップ"""
+        return self.start_step + self._plan_of_use_period - 1
+
 class StandardConsumer(Consumer):
     """標準的な消費者"""
-    def __init__(self, name: str, attributes: Dict[str, Any]):
-        super().__init__(name, attributes)
+    __slots__ = ()
+
+    def __init__(self, consumer_id: int, segment: str, year: int, index: int,
+                 attributes: 'ConsumerSettings', clock: StepClock = None):
+        super().__init__(consumer_id, segment, year, index, attributes, clock)
         self.set_use_period(attributes)
         self.set_preferences()
 
 
-def create_consumer(consumer_type: ConsumerType, name: str, attributes: Dict[str, Any]) -> Consumer:
+def create_consumer(consumer_type: ConsumerType, consumer_id: int, segment: str, year: int, index: int,
+                    attributes: 'ConsumerSettings', clock: StepClock = None) -> Consumer:
     """消費者クラスのファクトリー関数"""
     consumer_map = {
         ConsumerType.STANDARD: StandardConsumer,
     }
-    return consumer_map[consumer_type](name, attributes)
\ No newline at end of file
+    return consumer_map[consumer_type](consumer_id, segment, year, index, attributes, clock)
\ No newline at end of file
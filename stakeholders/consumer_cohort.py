@@ -0,0 +1,235 @@
+from enum import Enum
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Any, TYPE_CHECKING
+import numpy as np
+from preference import Preference, PART_WORTH_KEYS, calculate_utility
+from stakeholders.consumer import Consumer
+from stakeholders.manufacturer import Manufacturer
+from enablers.time_resolution import StepClock
+if TYPE_CHECKING:
+    from enablers.product import Product
+    from product_category import ProductCategory
+    from config.compiled_config import ConsumerSettings
+
+class ConsumerMode(Enum):
+    """消費者の表現方式"""
+    INDIVIDUAL = "individual"  # 消費者を1人ずつ生成する
+    COHORT = "cohort"  # 選ぶ製品カテゴリと計画使用期間が同じ消費者をコホートにまとめ、人数で扱う
+
+class ConsumerCohort(Consumer):
+    """
+    同じ製品カテゴリを選び、計画使用期間が同じ消費者の集団
+
+    同じステップに生成された同じ種類の消費者のうち、マッチングで選ぶ製品カテゴリと計画使用期間が
+    同じ消費者は、同じステップに計画使用期間が満了する。そのため人数（count）のみを保持して
+    1つのエージェントとしてマッチングする。メンバーが使用する製品は、状態が同じものを1つの製品
+    オブジェクトにまとめて数量（Product.count）で保持する。チャーンは使用中のメンバー数に対する
+    二項分布で判定する（CohortReleaseQueue）。
+    """
+
+    __slots__ = ("count", "products")
+
+    def __init__(self, consumer_id: int, segment: str, year: int, index: int, attributes: 'ConsumerSettings',
+                 part_worth_values: Dict[str, float], plan_of_use_period: int, count: int,
+                 clock: StepClock = None):
+        """
+        Args:
+            consumer_id: エコシステム内で一意な消費者ID
+            segment: 消費者の種類名（消費者の属性のキー）
+            year: 生成した年
+            index: 同じステップ・種類で生成したコホートの中での通し番号
+            attributes: 消費者の属性
+            part_worth_values: メンバーの部分効用値の平均
+            plan_of_use_period: 計画使用期間（ステップ数）
+            count: メンバー数
+            clock: ステップと年の換算
+        """
+        self.consumer_id = consumer_id
+        self.segment = segment
+        self.year = year
+        self.index = index
+        self.clock = clock or StepClock()
+        self.pref_dict = attributes.pref_dict
+        self.churn_rate = self.clock.per_step_probability(attributes.churn_rate)  # メンバーごとのステップあたりのチャーン率
+        self.reuse_probability = attributes.reuse_probability
+        self.num_of_products = 1  # メンバーごとに使用する製品数
+        self.matched_product = None  # 解放処理中のメンバーの製品
+        self.matched_price = None
+        self.use_period = 0
+        self.start_step = None
+        self._plan_of_use_period = plan_of_use_period
+        self.preference = Preference(part_worth_values, self)
+        self.count = count
+        self.products: List['Product'] = []  # 使用中のメンバーの製品（状態が同じ製品はまとめる）
+
+    @property
+    def name(self) -> str:
+        """表示用のコホート名"""
+        return f"{self.segment}_{self.year}_cohort{self.index}"
+
+    @property
+    def active(self) -> int:
+        """製品を使用中のメンバー数"""
+        return sum(product.count for product in self.products)
+
+    def assign(self, products: List['Product'], step: int) -> None:
+        """
+        メンバーに製品を1つずつ割り当てる
+
+        Args:
+            products: 割り当てる製品（数量の合計がメンバー数と同じ）
+            step: 使用を開始したステップ
+        """
+        self.products = list(products)
+        self.start_step = step
+        for product in self.products:
+            product.add_consumer(step, self.consumer_id)
+
+    def release(self, step: int, split: Callable[['Product', int], 'Product'], n: int = None) -> List['Product']:
+        """
+        計画使用期間の満了またはチャーンにより、n人のメンバーの製品を解放
+
+        解放するメンバーは使用中のメンバーから非復元抽出し（製品ごとの人数は多変量超幾何分布）、
+        メーカーの製品のリユースとリサイクルの振り分けはメンバーごとの判定を二項分布でまとめて行う。
+        まとめた製品の一部のみを解放する場合や返却先が分かれる場合は、製品を分割する。
+
+        Args:
+            step: 解放するステップ
+            split: まとめた製品から指定した数量を別の製品に分割する関数
+            n: 解放するメンバー数（Noneの場合は使用中の全メンバー）
+        Returns:
+            List[Product]: 解放した製品
+        """
+        active = self.active
+        n = active if n is None else min(n, active)
+        released = []
+        if n == active:
+            released, self.products = self.products, []
+        else:
+            kept = []
+            for product in self.products:
+                active -= product.count
+                k = np.random.hypergeometric(product.count, active, n) if n > 0 else 0
+                n -= k
+                if k == product.count:
+                    released.append(product)
+                else:
+                    if k > 0:
+                        released.append(split(product, k))
+                    kept.append(product)
+            self.products = kept
+        self.use_period = step - self.start_step + 1
+        for product in list(released):
+            if isinstance(product.provider, Manufacturer):
+                # メンバーごとにリユースするかどうかを判定し、リサイクルする分を分割する
+                reused = np.random.binomial(product.count, self.reuse_probability)
+                if 0 < reused < product.count:
+                    released.append(self._release(split(product, product.count - reused), reuse=False))
+                self._release(product, reuse=reused > 0)
+            else:
+                self._release(product)
+        return released
+
+    def _release(self, product: 'Product', reuse: bool = None) -> 'Product':
+        """
+        メンバーの製品の返却先を設定して解放
+
+        Args:
+            product: 解放する製品
+            reuse: メーカーの製品をリユースするかどうか（それ以外の製品はNone）
+        Returns:
+            Product: 解放した製品
+        """
+        self.matched_product = product
+        if reuse is None:
+            self.decide_EoL()
+        elif reuse:
+            product.set_next_provider("reuse_provider")
+        else:
+            product.set_next_provider("recycler")
+            product.dispose()
+        self.release_product()
+        return product
+
+def create_cohorts(segment: str, attributes: 'ConsumerSettings', n: int, year: int, consumer_id: int,
+                   product_categories: List['ProductCategory'], clock: StepClock = None) -> List[ConsumerCohort]:
+    """
+    n人の消費者の部分効用値と計画使用期間をまとめてサンプリングし、コホートにまとめる
+
+    消費者ごとに製品カテゴリの効用をまとめて計算し、マッチングと同じ規則（効用が最大で正の製品
+    カテゴリ、同じ効用の場合は先の製品カテゴリ）で選ぶ製品カテゴリを求める。選ぶ製品カテゴリ
+    （選ばない場合を含む）と計画使用期間が同じ消費者を1つのコホートにし、部分効用値はメンバーの
+    平均とする。効用は部分効用値の1次式であるため、同じ製品カテゴリを選ぶ消費者の部分効用値の
+    集合は凸であり、平均の部分効用値のコホートもメンバーと同じ製品カテゴリを選ぶ。コホートの数は
+    ステップ・種類ごとに高々（計画使用期間の種類数）×（製品カテゴリ数+1）になる。
+
+    精度とのトレードオフ: マッチング、計画使用期間による解放、チャーン、故障、返却先の判定は
+    消費者を個別に扱う場合と同じ分布になるが、個々の消費者の部分効用値は保持しない。そのため、
+    生成したステップの価格での選択のみがメンバーと一致し、部分効用値の非線形な関数や生成後の
+    価格での効用はメンバーの平均とは一致しない。計画使用期間は丸めないため、1年未満の時間の
+    刻みではコホート数が計画使用期間のステップ数の種類に比例して増える。
+
+    Args:
+        segment: 消費者の種類名
+        attributes: 消費者の属性
+        n: 消費者数
+        year: 生成した年
+        consumer_id: 最初のコホートに割り当てる消費者ID（以降は連番）
+        product_categories: マッチングの対象の製品カテゴリ（当ステップの価格で効用を計算する）
+        clock: ステップと年の換算
+    Returns:
+        List[ConsumerCohort]: コホート（計画使用期間と選ぶ製品カテゴリの順）
+    """
+    if n <= 0:
+        return []
+    clock = clock or StepClock()
+    pref_dict = attributes.pref_dict
+    # 属性ごとにn人分をサンプリング（行が属性、列が消費者）して転置する
+    part_worths = np.random.normal(
+        pref_dict.means[:, np.newaxis], pref_dict.sds[:, np.newaxis], (len(PART_WORTH_KEYS), n)
+    ).T
+    plans = clock.months_to_steps_array(
+        np.random.gamma(attributes.plan_of_use_shape, attributes.plan_of_use_scale, n)
+    )
+
+    # 製品カテゴリごとの効用（行が消費者、列が製品カテゴリ）から選ぶ製品カテゴリを求める（選ばない場合は-1）
+    choices = np.full(n, -1, dtype=np.int64)
+    if product_categories:
+        unique_plans, plan_index = np.unique(plans, return_inverse=True)
+        members = SimpleNamespace(**dict(zip(PART_WORTH_KEYS, part_worths.T)))
+        utilities = np.column_stack([
+            calculate_utility(
+                members,
+                product_category,
+                np.array([product_category.provider.calculate_price(product_category, int(plan))
+                          for plan in unique_plans])[plan_index],
+                plans,
+                clock
+            )
+            for product_category in product_categories
+        ])
+        best = np.argmax(utilities, axis=1)  # 同じ効用の場合は先の製品カテゴリ
+        matched = utilities[np.arange(n), best] > 0
+        choices[matched] = best[matched]
+
+    keys = np.column_stack([plans, choices])
+    unique_keys, inverse, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+    inverse = inverse.reshape(-1)
+    # コホートごとのメンバーの部分効用値の平均
+    means = np.column_stack([
+        np.bincount(inverse, weights=part_worths[:, i], minlength=len(counts)) for i in range(len(PART_WORTH_KEYS))
+    ]) / counts[:, np.newaxis]
+    return [
+        ConsumerCohort(
+            consumer_id=consumer_id + i,
+            segment=segment,
+            year=year,
+            index=i,
+            attributes=attributes,
+            part_worth_values=dict(zip(PART_WORTH_KEYS, mean)),
+            plan_of_use_period=int(key[0]),
+            count=int(count),
+            clock=clock
+        )
+        for i, (key, mean, count) in enumerate(zip(unique_keys, means, counts))
+    ]
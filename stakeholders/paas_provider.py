@@ -1,9 +1,10 @@
+import logging
 from typing import Dict, List, Any, TYPE_CHECKING
 from stakeholders.provider import Provider
 from enum import Enum
 from logger import logger
-from product_factory import create_product
 if TYPE_CHECKING:
+    from config.compiled_config import PaasProviderAttributes, ProductSettings
     from enablers.product import Product, ProductType
     from product_category import ProductCategory
 class PaasProviderType(Enum):
@@ -16,24 +17,16 @@ class PaasProvider(Provider):
         super().__init__(product_type, attributes)
         self.name = "paas_base"
 
-    def provide_products(self, product_attributes: Dict[str, Dict[str, Any]], year: int) -> List['Product']:
+    def provide_products(self, product_attributes: Dict[str, 'ProductSettings'], year: int) -> List['Product']:
         """製品の提供（サブクラスで実装）"""
         new_products = self.create_new_products(product_attributes, year)
-        available_products = [
-            product for product in self.products 
-            if product.is_available()
-        ]
-        new_products.extend(available_products)
+        new_products.extend(self.available_products)
         return new_products
 
-    def create_new_products(self, product_attributes: Dict[str, Dict[str, Any]], year: int) -> List['Product']:
+    def create_new_products(self, product_attributes: Dict[str, 'ProductSettings'], year: int) -> List['Product']:
         """製品の生成（サブクラスで実装）"""
         raise NotImplementedError
 
-    def _create_base_product(self, name: str, year: int, attribute: Dict[str, Any]) -> 'Product':
-        """基本的な製品インスタンスの作成（サブクラスで実装）"""
-        raise NotImplementedError
-
     def calculate_price(self, product: 'Product', plan_of_use_period: int) -> float:
         """サブスクリプション価格の計算（サブクラスで実装）"""
         raise NotImplementedError
@@ -41,71 +34,48 @@ class PaasProvider(Provider):
 class StandardPaasProvider(PaasProvider):
     """標準的なパッケージ"""
 
-    def __init__(self, attributes: Dict[str, Any], product_type: 'ProductType'):
+    def __init__(self, attributes: 'PaasProviderAttributes', product_type: 'ProductType'):
         super().__init__(product_type, attributes)
         self.name = "pas"
-        self.procurement_cost = attributes["procurement_cost"]
-        self.repair_cost = attributes["repair_cost"]
-        self.products: List[Product] = []
-        self._price = attributes["base_price"]
-        self.production_volume = attributes["production_volume"]
+        self.procurement_cost = attributes.procurement_cost
+        self.repair_cost = attributes.repair_cost
+        self._price = attributes.base_price
+        self.production_volume = attributes.production_volume
 
-    def provide_products(self, product_attributes: Dict[str, Dict[str, Any]], year: int) -> List['Product']:
+    def provide_products(self, product_attributes: Dict[str, 'ProductSettings'], year: int) -> List['Product']:
         """製品の提供"""
-        logger.debug(f"---PaaS provider providing products for year {year}---")
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug(f"---PaaS provider providing products for year {year}---")
         
         # 新製品の作成
         new_products = self.create_products(product_attributes, year)
-        for product in new_products:
-            logger.debug(f"New product: {product.name}")
+        if debug:
+            for product in new_products:
+                logger.debug(f"New product: {product.name}")
         
-        # 利用可能な製品のみをフィルタリング
-        available_products = [
-            product for product in self.products 
-            if product.is_available()
-        ]
-        for product in available_products:
-            logger.debug(f"Used product: {product.name}")
+        # 利用可能な製品のプールから取得
+        available_products = list(self.available_products)
+        if debug:
+            for product in available_products:
+                logger.debug(f"Used product: {product.name}")
         
         # 新製品と利用可能な製品を結合
         new_products.extend(available_products)
         return new_products
 
-    def create_products(self, product_attributes: Dict[str, Dict[str, Any]], year: int, production_volume: int) -> List['Product']:
+    def create_products(self, product_attributes: Dict[str, 'ProductSettings'], year: int, production_volume: int) -> List['Product']:
         """製品の生成"""
-        logger.debug(f"---PaaS provider creating products for year {year}---")
-        new_products = []  # 製品リストの初期化
-        
-        for name, attribute in product_attributes.items():
-            # 指定された数の製品を生産
-            for i in range(production_volume):
-                product = self._create_base_product(
-                    name=f"{name}_{year}_{i}_{self.name}",
-                    year=year,
-                    attribute=attribute
-                )
-                self._register_as_provider(product, year)
-                new_products.append(product)
-        
-        return new_products
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"---PaaS provider creating products for year {year}---")
+        return self.create_products_batch(product_attributes, year, production_volume)
 
-    def _create_base_product(self, name: str, year: int, attribute: Dict[str, Any]) -> 'Product':
-        """基本的な製品インスタンスの作成"""
-        product_attributes = {
-            "name": name,
-            "price": attribute["price"],
-            "lifetime": attribute["lifetime"],
-            "weibull_alpha": attribute["weibull_alpha"],
-            "weibull_beta": attribute["weibull_beta"]
-        }
-        return create_product(self.product_type, product_attributes)
-    
     def calculate_price(self, product_category: 'ProductCategory', plan_of_use_period: int) -> float:
         """新品の価格計算"""
         # TODO: 新品の価格計算
         return self._price
     
-def create_paas_provider(paas_provider_type: PaasProviderType, attributes: Dict[str, Any], product_type: 'ProductType') -> PaasProvider:
+def create_paas_provider(paas_provider_type: PaasProviderType, attributes: 'PaasProviderAttributes', product_type: 'ProductType') -> PaasProvider:
     """PaaSプロバイダーファクトリー関数"""
     paas_provider_map = {
         PaasProviderType.STANDARD: StandardPaasProvider,
@@ -1,25 +1,48 @@
-from typing import List, Dict, Any, TYPE_CHECKING
+from typing import Dict, List, Any, TYPE_CHECKING
+from enablers.product_registry import ProductRegistry
+from enablers.idle_inventory import IdleInventory
+from product_factory import create_products_batch
 if TYPE_CHECKING:
     from enablers.product import Product, ProductType
     from product_category import ProductCategory
+    from config.compiled_config import ProductSettings
+# 製品の生成に使用する属性
+PRODUCT_ATTRIBUTE_KEYS = ("price", "lifetime", "weibull_alpha", "weibull_beta")
+
 class Provider:
     """プロバイダー基底クラス"""
     
     def __init__(self, product_type: 'ProductType', attributes: Dict[str, Any]):
         self.product_type = product_type
         self.name = "base"
-        self.products: List['Product'] = []
+        self.products = ProductRegistry()  # 管理下の製品（登録した順）
+        # 利用可能な製品の在庫（製品IDの順、種類と生成ステップの同値類ごとに管理）
+        self.available_products = IdleInventory()
 
     def add_product(self, product: 'Product') -> None:
         """製品をプロバイダーの管理下に追加"""
-        if product not in self.products:
-            self.products.append(product)
+        self.products.add(product)
     
     def remove_product(self, product: 'Product') -> None:
         """製品をプロバイダーの管理から削除"""
-        if product in self.products:
-            self.products.remove(product)
+        self.products.remove(product)
         
+    def update_availability(self, product: 'Product') -> None:
+        """
+        製品の状態の変化に応じて、利用可能な製品のプールに追加または削除
+
+        Args:
+            product: 状態が変化した製品
+        """
+        if product.is_available():
+            self.available_products.add(product)
+        else:
+            self.available_products.discard(product)
+
+    def withdraw_available(self, product: 'Product') -> None:
+        """製品を利用可能な製品のプールから削除（移管時）"""
+        self.available_products.discard(product)
+
     def repair_product(self, product: 'Product') -> None:
         """製品の修理"""
         if product.calculate_remaining_lifetime() > 0:
@@ -29,6 +52,29 @@ class Provider:
             if product.matched:
                 product.remove_consumer()
     
+    def create_products_batch(self, product_attributes: Dict[str, 'ProductSettings'], year: int, n: int) -> List['Product']:
+        """
+        製品の種類ごとにn個の製品をまとめて生成し、提供者として登録
+
+        Args:
+            product_attributes: 製品名をキーとした製品の属性
+            year: 生成した年（ステップ）
+            n: 製品の種類ごとの生成数
+        Returns:
+            List[Product]: 生成した製品
+        """
+        new_products = []
+        for name, attribute in product_attributes.items():
+            products = create_products_batch(
+                self.product_type,
+                dict(attribute.creation_attributes, kind=name, origin=self.name, created_step=year),
+                n
+            )
+            for product in products:
+                self._register_as_provider(product, year)
+            new_products.extend(products)
+        return new_products
+
     def _register_as_provider(self, product: 'Product', year: int) -> None:
         """製品の提供者として登録"""
         product.add_provider(year, self)
@@ -1,9 +1,11 @@
 from logger import logger
 from enum import Enum
-from typing import Dict, List, Any
+from typing import Dict, List, Any, TYPE_CHECKING
 from enablers.product import Product, ProductType
 from stakeholders.provider import Provider
 from product_category import ProductCategory
+if TYPE_CHECKING:
+    from config.compiled_config import RecyclerAttributes
 class RecyclerType(Enum):
     STANDARD = "standard"
 
@@ -21,17 +23,17 @@ class Recycler(Provider):
 class StandardRecycler(Recycler):
     """標準的なリサイクルプロバイダー"""
 
-    def __init__(self, attributes: Dict[str, Any], product_type: ProductType):
+    def __init__(self, attributes: 'RecyclerAttributes', product_type: ProductType):
         super().__init__(product_type, attributes)
         self.name = "rec"
-        self._price = attributes["base_price"]
+        self._price = attributes.base_price
     
     def calculate_price(self, product_category: 'ProductCategory', plan_of_use_period: int) -> float:
         """リサイクル品の価格計算"""
         # TODO: リサイクル品の価格計算
         return self._price
 
-def create_recycler(recycler_type: RecyclerType, attributes: Dict[str, Any], product_type: ProductType) -> Recycler:
+def create_recycler(recycler_type: RecyclerType, attributes: 'RecyclerAttributes', product_type: ProductType) -> Recycler:
     """
     リサイクルプロバイダーファクトリー関数
     
@@ -3,6 +3,7 @@ from enum import Enum
 from typing import Dict, List, Any, TYPE_CHECKING
 from stakeholders.provider import Provider
 if TYPE_CHECKING:
+    from config.compiled_config import RemanufacturerAttributes
     from enablers.product import Product, ProductType
     from product_category import ProductCategory
 class RemanufacturerType(Enum):
@@ -32,11 +33,11 @@ class Remanufacturer(Provider):
 class StandardRemanufacturer(Remanufacturer):
     """標準的なリマンプロバイダー"""
 
-    def __init__(self, attributes: Dict[str, Any], product_type: 'ProductType'):
+    def __init__(self, attributes: 'RemanufacturerAttributes', product_type: 'ProductType'):
         super().__init__(product_type, attributes)
         self.name = "standard"
-        self._price = attributes["base_price"]
-        self.remanufacturing_cost = attributes["remanufacturing_cost"]
+        self._price = attributes.base_price
+        self.remanufacturing_cost = attributes.remanufacturing_cost
 
     def calculate_price(self, product_category: 'ProductCategory', plan_of_use_period: int) -> float:
         """
@@ -52,17 +53,7 @@ class StandardRemanufacturer(Remanufacturer):
         # TODO: リマニュファクチャリング品の価格計算
         return self._price
 
-    def add_product(self, product: 'Product') -> None:
-        """製品をプロバイダーの管理下に追加"""
-        if product not in self.products:
-            self.products.append(product)
-    
-    def remove_product(self, product: 'Product') -> None:
-        """製品をプロバイダーの管理から削除"""
-        if product in self.products:
-            self.products.remove(product)
-
-def create_remanufacturer(remanufacturer_type: RemanufacturerType, attributes: Dict[str, Any], product_type: 'ProductType') -> Remanufacturer:
+def create_remanufacturer(remanufacturer_type: RemanufacturerType, attributes: 'RemanufacturerAttributes', product_type: 'ProductType') -> Remanufacturer:
     """
     リマンプロバイダーファクトリー関数
     
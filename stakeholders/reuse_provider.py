@@ -4,6 +4,7 @@ from stakeholders.provider import Provider
 import logging
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
+    from config.compiled_config import ReuseProviderAttributes, ProductSettings
     from enablers.product import Product, ProductType
     from product_category import ProductCategory
 logger = logging.getLogger(__name__)
@@ -14,18 +15,16 @@ class ReuseProviderType(Enum):
 class ReuseProvider(Provider):
     """リユースプロバイダー基底クラス"""
     
-    def __init__(self, attributes: Dict[str, Any], product_type: 'ProductType'):
+    def __init__(self, attributes: 'ReuseProviderAttributes', product_type: 'ProductType'):
         super().__init__(product_type, attributes)
 
-    def provide_products(self, product_attributes: Dict[str, Dict[str, Any]], year: int) -> List['Product']:
+    def provide_products(self, product_attributes: Dict[str, 'ProductSettings'], year: int) -> List['Product']:
         """製品の提供"""        
-        available_products = [
-            product for product in self.products 
-            if product.is_available()
-        ]
-        logger.debug(f"---Reuse provider providing products for year {year}---")
-        for product in available_products:
-            logger.debug(f"Available product: {product.name}")
+        available_products = list(self.available_products)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"---Reuse provider providing products for year {year}---")
+            for product in available_products:
+                logger.debug(f"Available product: {product.name}")
         return available_products
 
     def calculate_price(self, product_category: 'ProductCategory', plan_of_use_period: int) -> float:
@@ -36,12 +35,12 @@ class ReuseProvider(Provider):
 class StandardReuseProvider(ReuseProvider):
     """標準的なリユースプロバイダー"""
     
-    def __init__(self, attributes: Dict[str, Any], product_type: 'ProductType'):
+    def __init__(self, attributes: 'ReuseProviderAttributes', product_type: 'ProductType'):
         super().__init__(product_type, attributes)
         self.name = "reu"
-        self._reuse_cost = attributes["reuse_cost"]
-        self.repair_cost = attributes["repair_cost"]
-        self._price = attributes["base_price"]
+        self._reuse_cost = attributes.reuse_cost
+        self.repair_cost = attributes.repair_cost
+        self._price = attributes.base_price
 
     def calculate_price(self, product_category: 'ProductCategory', plan_of_use_period: int) -> float:
         """リユース品の価格計算"""
@@ -53,7 +52,7 @@ class StandardReuseProvider(ReuseProvider):
         """リユースコスト"""
         return self._reuse_cost
 
-def create_reuse_provider(reuse_provider_type: ReuseProviderType, attributes: Dict[str, Any], product_type: 'ProductType') -> ReuseProvider:
+def create_reuse_provider(reuse_provider_type: ReuseProviderType, attributes: 'ReuseProviderAttributes', product_type: 'ProductType') -> ReuseProvider:
     """リユースプロバイダーファクトリー関数"""
     reuse_provider_map = {
         ReuseProviderType.STANDARD: StandardReuseProvider,
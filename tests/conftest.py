@@ -0,0 +1,79 @@
+import json
+from pathlib import Path
+from typing import Optional
+import numpy as np
+import pandas as pd
+import pytest
+import run
+from config.config import Config
+from config.compiled_config import compile_config
+
+# テストの基本設定（リポジトリに含まれるレベニューシェアの設定）
+BASE_CONFIG_FILE = Path(__file__).resolve().parent.parent / "config" / "revenue_share" / "config_paas_0.8_manu_1.8_proc_2.0_rev_0.2.json"
+
+def sort_rows(frame: pd.DataFrame) -> pd.DataFrame:
+    """出力順に依存せずに比較できるよう、全列で行を並べ替える"""
+    return frame.sort_values(list(frame.columns)).reset_index(drop=True)
+
+@pytest.fixture
+def write_config(tmp_path, monkeypatch):
+    """
+    基本設定の一部を置き換えた設定ファイルを作成する関数
+
+    作業ディレクトリを一時ディレクトリに移動するため、結果とチェックポイントも一時ディレクトリに出力される。
+    """
+    monkeypatch.chdir(tmp_path)
+    config_dir = tmp_path / "config"
+    config_dir.mkdir()
+
+    def write(setting_name: str = "test", **overrides) -> Path:
+        settings = json.loads(BASE_CONFIG_FILE.read_text())
+        settings.update(num_of_run=2, num_of_simulation=6)
+        settings.update(overrides)
+        (config_dir / f"{setting_name}.json").write_text(json.dumps(settings))
+        return config_dir
+
+    return write
+
+@pytest.fixture
+def capture_results(monkeypatch):
+    """run_simulations の集計と可視化を、出力先の指標とフローの取得に置き換える"""
+    def summarize(sink, result_dir):
+        return {"metrics": sort_rows(sink.read_metrics()), "flows": sort_rows(sink.read_flows())}
+
+    monkeypatch.setattr(run, "summarize_results", summarize)
+
+@pytest.fixture
+def simulate_totals():
+    """
+    基本設定の一部を置き換えて run_simulations と同じシードで実行し、実行ごとの
+    プロバイダー別の指標の合計（実行×プロバイダーの配列）を返す関数
+    """
+    def simulate(num_of_run: int, metric: str = "revenue", consumer_overrides: Optional[dict] = None,
+                 **overrides) -> np.ndarray:
+        settings = json.loads(BASE_CONFIG_FILE.read_text())
+        settings.update(num_of_simulation=6)
+        settings.update(overrides)
+        for attribute in settings["consumer_attributes"].values():
+            attribute.update(consumer_overrides or {})
+        config = compile_config(Config(**settings))
+        totals = []
+        for run_id in range(num_of_run):
+            run.seed_run(run_id)
+            ecosystem = run.create_ecosystem(config)
+            for year in range(config.num_of_simulation):
+                ecosystem.execute_yearly_cycle(year)
+            totals.append(ecosystem.business_model.metrics.metric(metric).sum(axis=0))
+        return np.array(totals)
+
+    return simulate
+
+@pytest.fixture
+def assert_same_mean():
+    """2つの方式の実行ごとの値の平均が、標準誤差の max_z 倍以内で一致することを確認する関数"""
+    def check(expected: np.ndarray, actual: np.ndarray, max_z: float = 4.0) -> None:
+        se = np.sqrt(expected.var(axis=0, ddof=1) / len(expected) + actual.var(axis=0, ddof=1) / len(actual))
+        difference = np.abs(expected.mean(axis=0) - actual.mean(axis=0))
+        assert np.all(difference <= max_z * se + 1e-9), (expected.mean(axis=0), actual.mean(axis=0), se)
+
+    return check
@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+import run
+from circular_ecosystem import CircularEcosystemBase
+
+# 実行方式ごとの設定の置き換え
+MODES = {
+    "yearly": {},
+    "event": {"engine_mode": "event"},
+    "quarterly": {"time_resolution": "quarterly"},
+    "cohort": {"consumer_mode": "cohort"},
+    "weighted": {"agent_weight": 2},
+}
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("interrupt_year", [1, 11])
+def test_resume_matches_uninterrupted_run(write_config, capture_results, monkeypatch, mode, interrupt_year):
+    """中断したシミュレーションをチェックポイントから再開した結果が、中断しない場合と一致する"""
+    # 復元した状態の違いが後年の廃棄・リユースのフローに現れるよう、10年間実行する
+    config_dir = write_config(num_of_simulation=10, **MODES[mode])
+    expected = run.run_simulations(config_dir, "test")
+
+    # interrupt_year 番目（0始まり、実行をまたいで数える）の年次サイクルで中断
+    execute_yearly_cycle = CircularEcosystemBase.execute_yearly_cycle
+    calls = {"count": 0}
+
+    def interrupted(self, year):
+        if calls["count"] == interrupt_year:
+            raise KeyboardInterrupt
+        calls["count"] += 1
+        return execute_yearly_cycle(self, year)
+
+    monkeypatch.setattr(CircularEcosystemBase, "execute_yearly_cycle", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        run.run_simulations(config_dir, "test")
+    monkeypatch.setattr(CircularEcosystemBase, "execute_yearly_cycle", execute_yearly_cycle)
+
+    resumed = run.run_simulations(config_dir, "test", resume=True)
+    pd.testing.assert_frame_equal(resumed["metrics"], expected["metrics"])
+    pd.testing.assert_frame_equal(resumed["flows"], expected["flows"])
+
+def test_resume_restores_tracking_of_products_created_at_step_0(write_config, capture_results):
+    """ステップ0に生成した在庫の製品（反映済みステップが-1）も、遅延評価中のまま復元される"""
+    write_config()
+    config = run.load_config(run.Path("config") / "test.json")
+    ecosystem = run.create_ecosystem(config)
+    ecosystem.execute_yearly_cycle(0)
+    tracked = [product for product in ecosystem.products if product._synced_step == -1]
+    assert tracked, "ステップ0から遅延評価している製品がありません"
+
+    from checkpoint import capture_ecosystem_state, restore_ecosystem_state
+    restored = run.create_ecosystem(config)
+    restore_ecosystem_state(restored, capture_ecosystem_state(ecosystem))
+    assert [product._synced_step for product in restored.products] == [product._synced_step for product in ecosystem.products]
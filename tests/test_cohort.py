@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from config.compiled_config import load_config
+import run
+from stakeholders.consumer_cohort import create_cohorts
+
+# チャーン、返却先の振り分け、故障と修理のすべてでまとめた製品を分割する設定
+CONSUMER_OVERRIDES = {"num_of_players": 40, "churn_rate": 0.2, "reuse_probability": 0.5}
+
+@pytest.mark.parametrize("metric", ["revenue", "product_cost", "repair_cost"])
+def test_cohorts_match_individual_consumers(simulate_totals, assert_same_mean, metric):
+    """コホート方式の指標の平均が、消費者を個別に扱う場合と一致する"""
+    individual = simulate_totals(30, metric, CONSUMER_OVERRIDES)
+    cohort = simulate_totals(30, metric, CONSUMER_OVERRIDES, consumer_mode="cohort")
+    assert_same_mean(individual, cohort)
+
+def test_cohorts_aggregate_consumers_by_choice_and_plan(write_config):
+    """コホートは選ぶ製品カテゴリと計画使用期間ごとにまとまり、メンバーと同じ製品カテゴリを選ぶ"""
+    config = load_config(write_config(consumer_mode="cohort") / "test.json")
+    ecosystem = run.create_ecosystem(config)
+    segment, attributes = next(iter(config.consumer_attributes.items()))
+    np.random.seed(0)
+    cohorts = create_cohorts(segment, attributes, 10000, 0, 0, ecosystem.product_categories, ecosystem.clock)
+
+    assert sum(cohort.count for cohort in cohorts) == 10000
+    plans = {cohort.plan_of_use_period for cohort in cohorts}
+    assert len(cohorts) <= len(plans) * (len(ecosystem.product_categories) + 1)
+    matches = ecosystem.matching.match(0, cohorts, ecosystem.product_categories)
+    for plan in plans:
+        # 計画使用期間が同じコホートは、それぞれ異なる製品カテゴリを選ぶ（選ばない場合を含む）
+        chosen = [matches.get(cohort) for cohort in cohorts if cohort.plan_of_use_period == plan]
+        assert len(chosen) == len(set(chosen))
@@ -0,0 +1,12 @@
+import pytest
+
+# チャーンと返却先の振り分けでイベントが発生する設定
+CONSUMER_OVERRIDES = {"num_of_players": 40, "churn_rate": 0.2, "reuse_probability": 0.5}
+
+@pytest.mark.parametrize("time_resolution", ["yearly", "quarterly"])
+@pytest.mark.parametrize("metric", ["revenue", "product_cost", "repair_cost"])
+def test_event_engine_matches_yearly_engine(simulate_totals, assert_same_mean, metric, time_resolution):
+    """イベント方式の指標の平均が、毎ステップ全製品を更新する年次方式と一致する"""
+    yearly = simulate_totals(30, metric, CONSUMER_OVERRIDES, time_resolution=time_resolution)
+    event = simulate_totals(30, metric, CONSUMER_OVERRIDES, time_resolution=time_resolution, engine_mode="event")
+    assert_same_mean(yearly, event)
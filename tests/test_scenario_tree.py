@@ -0,0 +1,57 @@
+import json
+import pytest
+import run
+from config.compiled_config import load_config
+from scenario_tree import ScenarioTree, ParameterChange, ScenarioBranch, run_scenario_tree
+
+PRICE = "ecosystem_settings.paas_provider.attributes.base_price"
+
+def write_scenario(path, branches):
+    """シナリオファイルを作成"""
+    path.write_text(json.dumps({"branches": branches}))
+    return path
+
+def without_config(frame):
+    """出力先の設定名の列（run_simulations は設定名、シナリオツリーは枝の名前）を除く"""
+    return frame.drop(columns="config").reset_index(drop=True)
+
+def test_branches_match_run_simulations(write_config, capture_results, tmp_path):
+    """年0から変更する枝と変更しない枝の結果が、同じ設定を run_simulations で実行した結果と一致する"""
+    config_dir = write_config()
+    scenario_file = write_scenario(tmp_path / "scenario.json", {
+        "baseline": [],
+        "price_cut": [{"year": 0, "parameter": PRICE, "value": 0.6}],
+        "late_price_cut": [{"year": 3, "parameter": PRICE, "value": 0.6}],
+    })
+    results = run_scenario_tree(config_dir, "test", scenario_file)
+
+    baseline = run.run_simulations(config_dir, "test")
+    settings = json.loads((config_dir / "test.json").read_text())
+    settings["ecosystem_settings"]["paas_provider"]["attributes"]["base_price"] = 0.6
+    (config_dir / "price_cut.json").write_text(json.dumps(settings))
+    price_cut = run.run_simulations(config_dir, "price_cut")
+
+    for branch_name, expected in [("baseline", baseline), ("price_cut", price_cut)]:
+        for key in ("metrics", "flows"):
+            assert without_config(results[branch_name][key]).equals(without_config(expected[key])), (branch_name, key)
+    assert not without_config(results["late_price_cut"]["metrics"]).equals(without_config(baseline["metrics"]))
+
+def test_branches_share_prefix_in_every_run(write_config):
+    """各実行の乱数は実行番号のみで決まるため、全ての実行で共通の履歴から分岐する"""
+    config = load_config(write_config(num_of_run=3) / "test.json")
+    late_price_cut = ScenarioBranch("late_price_cut", [ParameterChange(3, PRICE, 0.6)])
+    tree = ScenarioTree(config, [ScenarioBranch("baseline"), late_price_cut])
+    sinks = tree.run()
+    assert tree.num_of_forks == config.num_of_run
+
+    # 分岐した枝の結果は、その枝だけを実行した結果と一致する
+    alone = ScenarioTree(config, [late_price_cut]).run()["late_price_cut"]
+    assert without_config(sinks["late_price_cut"].read_metrics()).equals(without_config(alone.read_metrics()))
+
+def test_business_model_change_without_attribute_is_rejected(write_config):
+    """ビジネスモデルが持たない属性の変更は、実行前に不明なパラメータとして拒否する"""
+    config_dir = write_config(business_model_settings={"business_model_type": "standard", "attributes": {}})
+    config = load_config(config_dir / "test.json")
+    branch = ScenarioBranch("revenue_share", [ParameterChange(2, "business_model_settings.attributes.revenue_share", 0.3)])
+    with pytest.raises(ValueError, match="不明なパラメータです"):
+        ScenarioTree(config, [branch])
@@ -0,0 +1,14 @@
+import pytest
+from config.compiled_config import load_config
+
+def test_weighted_agents_match_individual_agents(simulate_totals, assert_same_mean):
+    """重み付きエージェントの収益の平均（実際の規模に換算）が、1人1エージェントの場合と一致する"""
+    individual = simulate_totals(30, consumer_overrides={"num_of_players": 40})
+    weighted = simulate_totals(30, consumer_overrides={"num_of_players": 40}, agent_weight=2)
+    assert_same_mean(individual, weighted)
+
+def test_indivisible_volume_is_rejected(write_config):
+    """重みで割り切れない人数は、エージェント数への丸めで実際の規模からずれるため設定の検証で拒否する"""
+    config_dir = write_config(agent_weight=4)
+    with pytest.raises(ValueError, match="割り切れません"):
+        load_config(config_dir / "test.json")
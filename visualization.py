@@ -10,50 +10,44 @@ from pathlib import Path
 # フォント関連の警告を抑制
 import warnings
 warnings.filterwarnings('ignore', category=UserWarning, module='matplotlib')
-from collections import defaultdict
 import seaborn as sns
+from enablers.flow_matrix import MATERIAL_NODES, FINANCIAL_NODES, matrix_to_frame
+from enablers.metric_ledger import MetricLedger
 
 class Visualizer:
     def __init__(self, result_dir: Path):
         self.result_dir = result_dir
 
-    def calculate_statistics(self, histories: list[pd.Series]):
+    def calculate_statistics(self, metric_ledgers: list[MetricLedger], metric: str):
         """
-        複数の履歴データから統計データを計算してseaborn用のDataFrameを作成
+        複数の実行の指標台帳から統計データを計算してseaborn用のDataFrameを作成
         
         Args:
-            histories: 履歴データのリスト
+            metric_ledgers: 実行ごとの指標台帳のリスト
+            metric: 指標名
         
         Returns:
             統計データを含むDataFrame
         """
-        # 時間軸とプロバイダーの取得
-        time_steps = sorted(histories[0].index)
-        providers = histories[0].values[0].keys()
-        
-        data = []
-        for t in time_steps:
-            for provider in providers:
-                # 全実験からこの時点のこのプロバイダーの値を収集
-                values = [history[t][provider] for history in histories]
-                
-                data.append({
-                    'Time Step': t,
-                    'Provider': provider,
-                    'Value': np.mean(values),
-                    'Std': np.std(values),
-                    'Lower': np.mean(values) - np.std(values),
-                    'Upper': np.mean(values) + np.std(values)
-                })
-        
-        stats_df = pd.DataFrame(data)
+        # 実行×年×プロバイダーの配列として、実行方向に平均と標準偏差を計算
+        values = np.stack([ledger.metric(metric) for ledger in metric_ledgers])
+        mean = values.mean(axis=0)
+        std = values.std(axis=0)
+        num_of_years, num_of_providers = mean.shape
+        providers = metric_ledgers[0].providers
+        
+        stats_df = pd.DataFrame({
+            'Time Step': np.repeat(np.arange(num_of_years), num_of_providers),
+            'Provider': np.tile(np.array(providers, dtype=object), num_of_years),
+            'Value': mean.ravel(),
+            'Std': std.ravel(),
+            'Lower': (mean - std).ravel(),
+            'Upper': (mean + std).ravel()
+        })
         logger.debug(f"stats_df: {stats_df}")
         return stats_df
 
-    def plot_business_metrics(self, revenue_histories: list[pd.Series], 
-                            product_cost_histories: list[pd.Series], 
-                            repair_cost_histories: list[pd.Series],
-                            profit_histories: list[pd.Series]):
+    def plot_business_metrics(self, metric_ledgers: list[MetricLedger]):
         """ビジネス指標の折れ線グラフを作成（seabornを使用）"""
         import seaborn as sns
         
@@ -91,14 +85,14 @@ class Visualizer:
         }
         
         # 統計データの計算
-        revenue_stats = self.calculate_statistics(revenue_histories)
-        product_cost_stats = self.calculate_statistics(product_cost_histories)
-        repair_cost_stats = self.calculate_statistics(repair_cost_histories)
-        profit_stats = self.calculate_statistics(profit_histories)
+        revenue_stats = self.calculate_statistics(metric_ledgers, 'revenue')
+        product_cost_stats = self.calculate_statistics(metric_ledgers, 'product_cost')
+        repair_cost_stats = self.calculate_statistics(metric_ledgers, 'repair_cost')
+        profit_stats = self.calculate_statistics(metric_ledgers, 'profit')
         logger.debug(f"revenue_stats: {revenue_stats}")
         
-        # 最初の要素から提供者のリストを取得
-        providers = revenue_histories[0].values[0].keys()
+        # 最初の台帳から提供者のリストを取得
+        providers = metric_ledgers[0].providers
         num_providers = len(providers)
         
         # プロバイダー名の日本語マッピング
@@ -209,18 +203,15 @@ class Visualizer:
         all_providers = set()
         for history in matches_histories:
             for t in time_steps:
-                data = history[t]
-                providers = data[max(data.keys())].keys()
-                all_providers.update(providers)
+                all_providers.update(history[t].keys())
         
         for t in time_steps:
             provider_sums = {provider: 0.0 for provider in all_providers}  # 全プロバイダーで初期化
             
             for history in matches_histories:
                 data = history[t]
-                latest_data = data[max(data.keys())]
                 for provider in all_providers:
-                    provider_sums[provider] += latest_data.get(provider, 0)  # 存在しない場合は0
+                    provider_sums[provider] += data.get(provider, 0)  # 存在しない場合は0
             
             num_histories = len(matches_histories)
             provider_means = {provider: sum_val / num_histories 
@@ -365,41 +356,28 @@ class Visualizer:
         )
         plt.close()
 
-    def plot_material_flow(self, material_flow_histories: list[list[pd.Series]]):
+    def plot_material_flow(self, material_flow_matrices: np.ndarray):
         """
         マテリアルフローの平均値を計算してサンキーダイアグラムを作成
         
         Args:
-            material_flow_histories: マテリアルフロー情報を持つSeriesのリストのリスト
+            material_flow_matrices: 実行×年×ノード×ノードのマテリアルフロー行列
+                                  （ノードの順序はMATERIAL_NODES）
         """
-        # 全てのフローデータを一つのリストに集約
-        all_flows = []
-        for history in material_flow_histories:
-            for history_annual in history:
-                # Seriesをディクショナリのリストとして追加
-                if not history_annual.empty:
-                    all_flows.extend(history_annual.to_dict('records'))
-        
-        # リストからDataFrameを作成
-        combined_df = pd.DataFrame(all_flows)
+        # 全ての年のフローを合計し、実行数（フローが発生しなかった実行を含む）で割って平均値を計算
+        num_experiments = len(material_flow_matrices)
+        if num_experiments == 0:
+            logger.debug("Warning: No valid flow data found")
+            return
+        average_matrix = material_flow_matrices.sum(axis=(0, 1)) / num_experiments
         
-        # 値が0より大きい行のみを保持
-        combined_df = combined_df[combined_df['value'] > 0]
+        # 値が0より大きいフローのみを保持
+        average_matrix[average_matrix < 0] = 0
+        average_flow = matrix_to_frame(average_matrix, MATERIAL_NODES)
         
-        if combined_df.empty:
+        if average_flow.empty:
             logger.debug("Warning: No valid flow data found")
             return
-            
-        # sourceとtargetでグループ化して合計値を計算
-        sum_flow = combined_df.groupby(
-            ['source', 'target'],
-            as_index=False
-        )['value'].sum()
-
-        # 実験回数で割って平均値を計算
-        num_experiments = len(material_flow_histories)
-        average_flow = sum_flow.copy()
-        average_flow['value'] = sum_flow['value'] / num_experiments
         
         # ノードの順序と列の位置を定義
         node_columns = {
@@ -480,41 +458,28 @@ class Visualizer:
             
         fig.write_html(self.result_dir / "average_material_flow_sankey.html")
 
-    def plot_financial_flow(self, financial_flow_histories: list[list[pd.Series]]):
+    def plot_financial_flow(self, financial_flow_matrices: np.ndarray):
         """
         財務フローの平均値を計算してサンキーダイアグラムを作成
         
         Args:
-            financial_flow_histories: 財務フロー情報を持つSeriesのリストのリスト
+            financial_flow_matrices: 実行×年×ノード×ノードの財務フロー行列
+                                  （ノードの順序はFINANCIAL_NODES）
         """
-        # 全てのフローデータを一つのリストに集約
-        all_flows = []
-        for history in financial_flow_histories:
-            for history_annual in history:
-                # Seriesをディクショナリのリストとして追加
-                if not history_annual.empty:
-                    all_flows.extend(history_annual.to_dict('records'))
-        
-        # リストからDataFrameを作成
-        combined_df = pd.DataFrame(all_flows)
+        # 全ての年のフローを合計し、実行数（フローが発生しなかった実行を含む）で割って平均値を計算
+        num_experiments = len(financial_flow_matrices)
+        if num_experiments == 0:
+            logger.debug("Warning: No valid flow data found")
+            return
+        average_matrix = financial_flow_matrices.sum(axis=(0, 1)) / num_experiments
         
-        # 値が0より大きい行のみを保持
-        combined_df = combined_df[combined_df['value'] > 0]
+        # 値が0より大きいフローのみを保持
+        average_matrix[average_matrix < 0] = 0
+        average_flow = matrix_to_frame(average_matrix, FINANCIAL_NODES)
         
-        if combined_df.empty:
+        if average_flow.empty:
             logger.debug("Warning: No valid flow data found")
             return
-            
-        # sourceとtargetでグループ化して合計値を計算
-        sum_flow = combined_df.groupby(
-            ['source', 'target'],
-            as_index=False
-        )['value'].sum()
-
-        # 実験回数で割って平均値を計算
-        num_experiments = len(financial_flow_histories)
-        average_flow = sum_flow.copy()
-        average_flow['value'] = sum_flow['value'] / num_experiments
         
         # ノードの順序と列の位置を定義
         node_columns = {
@@ -522,6 +487,7 @@ class Visualizer:
             'paas_provider': 1,     # 2列目
             'manufacturer': 2,      # 3列目
             'reuse_provider': 3,    # 4列目
+            'remanufacturer': 3,
             'recycler': 4,          # 5列目
             'disposal': 5           # 6列目
         }
@@ -532,6 +498,7 @@ class Visualizer:
             'paas_provider': 0.5,   # 2列目中央
             'manufacturer': 0.5,    # 3列目中央
             'reuse_provider': 0.5,  # 4列目中央
+            'remanufacturer': 0.8,  # 4列目下部
             'recycler': 0.3,        # 5列目上部
             'disposal': 0.7         # 5列目下部
         }
@@ -541,6 +508,7 @@ class Visualizer:
             'paas_provider': '#1f77b4',     # 青
             'manufacturer': '#ff7f0e',     # オレンジ
             'reuse_provider': '#d62728', # 赤
+            'remanufacturer': '#17becf', # 水色
             'recycler': '#9467bd',   # 紫
             'disposal': '#8c564b'  # 茶
         }
@@ -592,39 +560,28 @@ class Visualizer:
             
         fig.write_html(self.result_dir / "average_financial_flow_sankey.html")
     
-    def plot_business_metrics_all(self, histories_all: list[list[pd.Series]], config_files: list[Path]):
+    def plot_business_metrics_all(self, metric_ledgers_all: list[list[MetricLedger]], config_files: list[Path],
+                                  metric: str = 'profit'):
         """
         全設定のビジネスメトリクスを可視化
         
         Args:
-            revenue_histories_all: 全設定の収益履歴データのリスト
+            metric_ledgers_all: 全設定の指標台帳のリスト
                 [
-                    [pd.Series(...), pd.Series(...), ...],  # setting1の実験結果
-                    [pd.Series(...), pd.Series(...), ...],  # setting2の実験結果
+                    [MetricLedger(...), MetricLedger(...), ...],  # setting1の実験結果
+                    [MetricLedger(...), MetricLedger(...), ...],  # setting2の実験結果
                     ...
                 ]
+            config_files: 設定ファイルのリスト
+            metric: 比較する指標名
         """
-        # 設定ごとのプロバイダー別平均収益を計算
+        # 設定ごとのプロバイダー別平均値（実行と年の全体の平均）を計算
         setting_averages = []
         
-        for setting_histories in histories_all:
-            # プロバイダーごとの時系列データを収集
-            provider_timeseries = defaultdict(lambda: defaultdict(list))
-            
-            # 各実験、各タイムステップのデータを収集
-            for experiment in setting_histories:
-                for timestep, revenues in experiment.items():
-                    for provider, value in revenues.items():
-                        provider_timeseries[provider][timestep].append(value)
-            
-            # 各プロバイダーの全期間平均を計算
-            provider_averages = {
-                provider: np.mean([
-                    np.mean(values) for values in timeseries.values()
-                ])
-                for provider, timeseries in provider_timeseries.items()
-            }
-            
+        for setting_ledgers in metric_ledgers_all:
+            values = np.stack([ledger.metric(metric) for ledger in setting_ledgers])
+            averages = values.mean(axis=(0, 1))
+            provider_averages = dict(zip(setting_ledgers[0].providers, averages))
             setting_averages.append(provider_averages)
         
         # 利益の比較